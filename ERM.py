@@ -1,177 +1,16 @@
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-
-def generate_province_seat_pdf(provincial_results_df, output_path="ripartizioneSeggi_finale.pdf", seats_per_province_df=None, votes_df=None):
+def generate_province_seat_pdf(provincial_results_df, output_path="ripartizioneSeggi_finale.pdf", seats_per_province_df=None, votes_df=None,
+                               coal_seats=None, grp_seats=None):
     """
     Generates a PDF report with the same structure as RipartizioneSeggi finale.pdf, including provincial quota and formula.
+    To render several formats of the same allocation, build the recap once with build_report() and call render_pdf().
     Args:
         provincial_results_df (pd.DataFrame): DataFrame with columns ['province', 'list', 'votes', 'int_seats', 'rest_pct', 'final_seats']
         output_path (str): Path to output PDF file
         seats_per_province_df (pd.DataFrame): DataFrame with columns ['province', 'seats']
+        votes_df (pd.DataFrame): cleaned votes, for the coalition/president/list recaps
+        coal_seats, grp_seats (pd.DataFrame): coalition and group seats from run_allocation (tables omitted if None)
     """
-    doc = SimpleDocTemplate(output_path, pagesize=A4)
-    styles = getSampleStyleSheet()
-    elements = []
-
-    # --- Spiegazione della ripartizione dei seggi regionale ---
-    if votes_df is not None and 'coalition' in votes_df.columns and 'votes' in votes_df.columns:
-        reg_votes = votes_df.groupby('coalition')['votes'].sum().reset_index()
-        total_reg_votes = reg_votes['votes'].sum()
-        elements.append(Paragraph("<b>Ripartizione seggi tra coalizioni (regionale)</b>", styles['Heading1']))
-        recap_data = [["Coalizione", "Voti", "%"]]
-        for _, row in reg_votes.sort_values('votes', ascending=False).iterrows():
-            pct = 100 * row['votes'] / total_reg_votes if total_reg_votes > 0 else 0
-            recap_data.append([row['coalition'], int(row['votes']), f"{pct:.2f}%"])
-        recap_table = Table(recap_data, repeatRows=1)
-        recap_table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.black),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0,0), (-1,0), 8),
-        ]))
-        elements.append(recap_table)
-        elements.append(Spacer(1, 18))
-        # Seggi assegnati (se disponibili)
-        try:
-            coal_seats = pd.read_csv("coalition_seats.csv")
-            seat_data = [["Coalizione", "Seggi assegnati"]]
-            for _, row in coal_seats.iterrows():
-                seat_data.append([row['coalition'], int(row['seats'])])
-            seat_table = Table(seat_data, repeatRows=1)
-            seat_table.setStyle(TableStyle([
-                ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-                ('TEXTCOLOR', (0,0), (-1,0), colors.black),
-                ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-                ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-                ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0,0), (-1,0), 8),
-            ]))
-            elements.append(seat_table)
-            elements.append(Spacer(1, 18))
-        except Exception:
-            pass
-        # Ripartizione seggi tra liste
-        try:
-            grp_seats = pd.read_csv("group_seats.csv")
-            list_data = [["Lista", "Coalizione", "Seggi assegnati"]]
-            for _, row in grp_seats.iterrows():
-                list_data.append([row['list'], row['coalition'], int(row['group_seats'])])
-            list_table = Table(list_data, repeatRows=1)
-            list_table.setStyle(TableStyle([
-                ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-                ('TEXTCOLOR', (0,0), (-1,0), colors.black),
-                ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-                ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-                ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0,0), (-1,0), 8),
-            ]))
-            elements.append(list_table)
-            elements.append(Spacer(1, 18))
-        except Exception:
-            pass
-
-    # --- President recap ---
-    if votes_df is not None and 'president' in votes_df.columns:
-        pres_votes = votes_df.groupby('president')['votes'].sum().reset_index()
-        total_votes = pres_votes['votes'].sum()
-        recap_data = [["Presidente", "Voti", "%"]]
-        for _, row in pres_votes.sort_values('votes', ascending=False).iterrows():
-            pct = 100 * row['votes'] / total_votes if total_votes > 0 else 0
-            recap_data.append([row['president'], int(row['votes']), f"{pct:.2f}%"])
-        recap_table = Table(recap_data, repeatRows=1)
-        recap_table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.black),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0,0), (-1,0), 8),
-        ]))
-        elements.append(Paragraph("<b>Riepilogo percentuali Presidenti</b>", styles['Heading1']))
-        elements.append(recap_table)
-        elements.append(Spacer(1, 18))
-        # --- Party recap ---
-        party_votes = votes_df.groupby('list')['votes'].sum().reset_index()
-        total_party_votes = party_votes['votes'].sum()
-        party_data = [["Partito/Lista", "Voti", "%"]]
-        for _, row in party_votes.sort_values('votes', ascending=False).iterrows():
-            pct = 100 * row['votes'] / total_party_votes if total_party_votes > 0 else 0
-            party_data.append([row['list'], int(row['votes']), f"{pct:.2f}%"])
-        party_table = Table(party_data, repeatRows=1)
-        party_table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.black),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0,0), (-1,0), 8),
-        ]))
-        elements.append(Paragraph("<b>Riepilogo voti e percentuali per lista/partito</b>", styles['Heading1']))
-        elements.append(party_table)
-        elements.append(Spacer(1, 18))
-    provinces = provincial_results_df['province'].unique()
-    for province in provinces:
-        elements.append(Paragraph(f"<b>Provincia di {province}</b>", styles['Heading2']))
-        df = provincial_results_df[provincial_results_df['province'] == province]
-        # Use only admitted coalition votes for quota calculation
-        admitted_coalitions = ["Centrodestra", "Centrosinistra"]
-        admitted_votes = votes_df[(votes_df["province"] == province) & 
-                                 (votes_df["coalition"].isin(admitted_coalitions))]["votes"].sum()
-        if seats_per_province_df is not None:
-            row = seats_per_province_df.loc[seats_per_province_df['province'] == province, 'seats']
-            if not row.empty:
-                seats = int(row.iloc[0])
-                q_circ = admitted_votes // (seats + 1) if seats > 0 else 0
-                elements.append(Paragraph(
-                    f"Quoziente provinciale: <b>{q_circ}</b> = {admitted_votes} voti / ({seats} + 1)",
-                    styles['Normal']
-                ))
-                elements.append(Spacer(1, 6))
-            else:
-                elements.append(Paragraph("Province not found in seats data.", styles['Normal']))
-                elements.append(Spacer(1, 6))
-        data = [["Lista", "Voti", "Seggi Interi", "Resto assoluto", "Resto %", "Rank regionale resti %", "Seggi Finali"]]
-        for _, row in df.iterrows():
-            if seats_per_province_df is not None:
-                row_seats = seats_per_province_df.loc[seats_per_province_df['province'] == province, 'seats']
-                if not row_seats.empty:
-                    seats = int(row_seats.iloc[0])
-                    q_circ = admitted_votes // (seats + 1) if seats > 0 else 0
-                    rest_abs = int(row['votes'] - row['int_seats'] * q_circ) if q_circ > 0 else 0
-                else:
-                    rest_abs = 0
-                    q_circ = 0
-                rest_pct = row['rest_pct'] if 'rest_pct' in row else 0
-                rank = row['regional_rest_rank'] if 'regional_rest_rank' in row else ''
-            else:
-                rest_abs = int(row['votes'] - row['int_seats'] * 0)
-                rest_pct = 0
-                rank = ''
-            data.append([
-                row['list'],
-                int(row['votes']),
-                int(row['int_seats']),
-                rest_abs,
-                f"{rest_pct:.2f}%",
-                rank,
-                int(row['final_seats'])
-            ])
-        table = Table(data, repeatRows=1)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.black),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0,0), (-1,0), 8),
-        ]))
-        elements.append(table)
-        elements.append(Spacer(1, 12))
-    doc.build(elements)
+    render_pdf(build_report(provincial_results_df, coal_seats, grp_seats, votes_df, seats_per_province_df), output_path)
 def generate_province_seat_heatmap(provincial_results_df, output_path="province_seat_heatmap.md"):
     """
     Generates a Markdown heatmap-style table of seat distribution by party and province.
@@ -187,86 +26,26 @@ def generate_province_seat_heatmap(provincial_results_df, output_path="province_
 def calculate_provincial_quota(votes_df, seats_per_province_df):
     """
     Returns a DataFrame with columns ['province', 'quota'] where quota = total votes / (seats + 1) for each province.
+    Accepts an ElectionData in place of votes_df (seats_per_province_df may then be None).
     """
+    if isinstance(votes_df, ElectionData):
+        seats = votes_df.seats_for(seats_per_province_df)
+        return pd.DataFrame({"province":list(votes_df.provinces),
+                             "quota":votes_df.votes.sum(axis=1).astype(float)/(seats+1)})
     total_votes = votes_df.groupby('province')['votes'].sum().reset_index()
     merged = pd.merge(total_votes, seats_per_province_df, on='province')
     merged['quota'] = merged['votes'] / (merged['seats'] + 1)
     return merged[['province', 'quota']]
-def generate_province_seat_markdown(votes_df, provincial_results_df, quota_df, seats_per_province_df, output_path="province_seat_report.md"):
+def generate_province_seat_markdown(votes_df, provincial_results_df, quota_df, seats_per_province_df, output_path="province_seat_report.md",
+                                    coal_seats=None, grp_seats=None):
     """
     Generates a Markdown report for each province: quota, parties elected, votes per elected seat.
+    quota_df is no longer read (the quota of the admitted coalitions is computed by build_report) and is kept for
+    compatibility; coal_seats and grp_seats are the run_allocation outputs (tables omitted if None).
     """
-    md = "# Provincial Seat Allocation Report\n\n"
-    # --- Spiegazione della ripartizione dei seggi regionale ---
-    if 'coalition' in votes_df.columns and 'votes' in votes_df.columns:
-        reg_votes = votes_df.groupby('coalition')['votes'].sum().reset_index()
-        total_reg_votes = reg_votes['votes'].sum()
-        md += "## Ripartizione seggi tra coalizioni (regionale)\n\n"
-        md += "| Coalizione | Voti | % |\n|---|---|---|\n"
-        for _, row in reg_votes.sort_values('votes', ascending=False).iterrows():
-            pct = 100 * row['votes'] / total_reg_votes if total_reg_votes > 0 else 0
-            md += f"| {row['coalition']} | {int(row['votes'])} | {pct:.2f}% |\n"
-        # Seggi assegnati (se disponibili)
-        try:
-            coal_seats = pd.read_csv("coalition_seats.csv")
-            md += "\n| Coalizione | Seggi assegnati |\n|---|---|\n"
-            for _, row in coal_seats.iterrows():
-                md += f"| {row['coalition']} | {row['seats']} |\n"
-        except Exception:
-            pass
-        # Ripartizione seggi tra liste
-        try:
-            grp_seats = pd.read_csv("group_seats.csv")
-            md += "\n## Ripartizione seggi tra liste (regionale)\n\n"
-            md += "| Lista | Coalizione | Seggi assegnati |\n|---|---|---|\n"
-            for _, row in grp_seats.iterrows():
-                md += f"| {row['list']} | {row['coalition']} | {row['group_seats']} |\n"
-        except Exception:
-            pass
-    # --- President recap ---
-    if 'president' in votes_df.columns:
-        pres_votes = votes_df.groupby('president')['votes'].sum().reset_index()
-        total_votes = pres_votes['votes'].sum()
-        md += "## Riepilogo percentuali Presidenti\n\n"
-        md += "| Presidente | Voti | % |\n|---|---|---|\n"
-        for _, row in pres_votes.sort_values('votes', ascending=False).iterrows():
-            pct = 100 * row['votes'] / total_votes if total_votes > 0 else 0
-            md += f"| {row['president']} | {int(row['votes'])} | {pct:.2f}% |\n"
-        md += "\n"
-        # --- Party recap ---
-        party_votes = votes_df.groupby('list')['votes'].sum().reset_index()
-        total_party_votes = party_votes['votes'].sum()
-        md += "## Riepilogo voti e percentuali per lista/partito\n\n"
-        md += "| Lista/Partito | Voti | % |\n|---|---|---|\n"
-        for _, row in party_votes.sort_values('votes', ascending=False).iterrows():
-            pct = 100 * row['votes'] / total_party_votes if total_party_votes > 0 else 0
-            md += f"| {row['list']} | {int(row['votes'])} | {pct:.2f}% |\n"
-        md += "\n"
-    for province in quota_df['province']:
-        # Use only admitted coalition votes for quota calculation
-        admitted_coalitions = ["Centrodestra", "Centrosinistra"]
-        admitted_votes = votes_df[(votes_df["province"] == province) & 
-                                 (votes_df["coalition"].isin(admitted_coalitions))]["votes"].sum()
-        row = seats_per_province_df.loc[seats_per_province_df["province"]==province, "seats"]
-        seats = int(row.iloc[0]) if not row.empty else 0
-        q_circ = admitted_votes // (seats + 1) if seats > 0 else 0
-        md += f"## {province}\n"
-        md += f"**Quota (votes per seat):** {q_circ} = {admitted_votes} voti / ({seats} + 1)\n\n"
-        # Get parties that elected at least one seat
-        elected = provincial_results_df[(provincial_results_df['province'] == province) & (provincial_results_df['final_seats'] > 0)]
-        if not elected.empty:
-            md += "| Party/List | Seats | Votes per Seat | Total Votes | Resto assoluto | Resto % | Rank regionale resti % |\n|---|---|---|---|---|---|---|\n"
-            for _, row in elected.iterrows():
-                votes_per_seat = row['votes'] / row['final_seats'] if row['final_seats'] > 0 else 0
-                rest_abs = int(row['votes'] - row['int_seats'] * q_circ) if q_circ > 0 else 0
-                rest_pct = row['rest_pct'] if 'rest_pct' in row else 0
-                rank = row['regional_rest_rank'] if 'regional_rest_rank' in row else ''
-                md += f"| {row['list']} | {row['final_seats']} | {votes_per_seat:.2f} | {row['votes']} | {rest_abs} | {rest_pct:.2f}% | {rank} |\n"
-        else:
-            md += "No seats elected in this province.\n"
-        md += "\n"
+    report = build_report(provincial_results_df, coal_seats, grp_seats, votes_df, seats_per_province_df)
     with open(output_path, "w", encoding="utf-8") as f:
-        f.write(md)
+        f.write(render_markdown(report))
 # -*- coding: utf-8 -*-
 """
 Created on Sat Aug 30 23:22:15 2025
@@ -288,32 +67,588 @@ Created on Sat Aug 30 23:22:15 2025
 
 import pandas as pd
 import numpy as np
-from math import floor
+import contextlib
+import functools
+import hashlib
+import io
+import json
+import os
+import signal
+import time
+import traceback
+import tracemalloc
+from collections import OrderedDict, namedtuple
+from dataclasses import asdict, dataclass, replace
+from types import SimpleNamespace
 
 # ---------- util ----------
+# params.csv: chiave -> argomento delle funzioni di allocazione, con i valori della L.R. 27/2004 come default
+PARAMS_KEYS = {"TOTAL_LIST_SEATS":"total_list_seats", "BONUS_TARGET_PCT_19":"pct19", "BONUS_TARGET_PCT_18":"pct18",
+               "BONUS_SEATS_19":"seats19", "BONUS_SEATS_18":"seats18",
+               "COALITION_THRESHOLD_PCT":"coal_threshold", "LIST_THRESHOLD_PCT":"list_threshold"}
+DEFAULT_PARAMS = {"total_list_seats":30, "pct19":0.43, "pct18":0.40, "seats19":19, "seats18":18,
+                  "coal_threshold":0.05, "list_threshold":0.03}
+_DHONDT_CHUNK = 4096  # righe per blocco nel D'Hondt vettoriale (limita la memoria dei quozienti)
+
 def dhondt(values, seats):
     # Art. 19, comma 1: D'Hondt method for proportional seat allocation
-    if seats <= 0 or sum(values.values()) <= 0:
-        return {k:0 for k in values}
-    qs=[]
-    for k,v in values.items():
-        for d in range(1,seats+1):
-            qs.append((k, v/d))
-    qs.sort(key=lambda x:x[1], reverse=True)
-    win=[k[0] for k in qs[:seats]]  # Fix: extract party name from tuple
-    return {k:win.count(k) for k in values}
+    if not values:
+        return {}
+    won = dhondt_batch([list(values.values())], seats)[0]
+    return {k:int(s) for k,s in zip(values, won)}
+
+def dhondt_batch(votes, seats):
+    """
+    D'Hondt allocation for a whole batch of scenarios in one call.
+    Instead of sorting every quotient, the seats-th largest quotient of each row is found with a
+    partition and the seats go to the quotients above it; ties on that last quotient are broken
+    in column order (first party wins), exactly as dhondt() does.
+    Args:
+        votes (array-like): matrix (scenarios x parties) of votes; a 1-D vector is treated as one scenario
+        seats (int or array-like): seats to allocate, a scalar or one value per scenario
+    Returns:
+        np.ndarray: int64 matrix (scenarios x parties) with the seats won by each party
+    """
+    v = np.asarray(votes, dtype=float)
+    if v.ndim == 1:
+        v = v[None, :]
+    n, k = v.shape
+    s = np.broadcast_to(np.asarray(seats, dtype=np.int64), (n,))
+    out = np.zeros((n, k), dtype=np.int64)
+    live = (s > 0) & (v.sum(axis=1) > 0)
+    for m in np.unique(s[live]):
+        rows = np.flatnonzero(live & (s == m))
+        div = np.arange(1, m + 1)
+        for lo in range(0, len(rows), _DHONDT_CHUNK):
+            r = rows[lo:lo + _DHONDT_CHUNK]
+            # quozienti in ordine partito-divisore, come la lista dell'algoritmo originale
+            q = (v[r, :, None] / div).reshape(len(r), k * m)
+            last = -np.partition(-q, m - 1, axis=1)[:, m - 1:m]
+            above = q > last
+            tie = q == last
+            need = m - above.sum(axis=1, keepdims=True)
+            win = above | (tie & (np.cumsum(tie, axis=1) <= need))
+            out[r] = win.reshape(len(r), k, m).sum(axis=2)
+    return out
+
+# ---------- strumentazione per stadio ----------
+_PROFILE = None  # StageProfile attivo nel processo (None = strumentazione spenta)
+
+@dataclass(frozen=True)
+class StageRecord:
+    """
+    One instrumented stage call.
+    Attributes:
+        stage (str): stage name
+        start (float): seconds from the start of the profile
+        wall (float): wall time in seconds
+        rows (int): rows of the stage output table (scenarios for the batched engine, -1 if not a table)
+        peak (int): peak traced memory above the level at entry, in bytes (-1 without memory=True)
+        depth (int): nesting level (0 = outermost instrumented call, e.g. run_allocation)
+    """
+    stage: str
+    start: float
+    wall: float
+    rows: int
+    peak: int
+    depth: int
+
+class StageProfile:
+    """
+    Opt-in per-stage instrumentation of the allocation. Inside `with StageProfile() as prof:` every call
+    to run_allocation, its five stages, the batched engine (one call per Monte Carlo block) and
+    ElectionModel.allocate is recorded with wall time, output rows and, with memory=True, peak memory;
+    records accumulate across calls, so one profile can span a whole projection. With no active
+    profile the stages only pay one global lookup per call. One profile is active per process at a time
+    (nested profiles shadow the outer one).
+    Args:
+        memory (bool): trace peak memory per stage with tracemalloc (slows the run down)
+        callback (callable): called with every StageRecord as soon as its stage returns
+    """
+    def __init__(self, memory=False, callback=None):
+        self.memory, self.callback = memory, callback
+        self.records = []
+        self._stack = []
+        self._prev, self._t0, self._tracing = None, time.perf_counter(), False
+
+    def __enter__(self):
+        global _PROFILE
+        self._prev, _PROFILE = _PROFILE, self
+        self._t0 = time.perf_counter()
+        self._tracing = self.memory and not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc):
+        global _PROFILE
+        if self._tracing:
+            tracemalloc.stop()
+        _PROFILE = self._prev
+        return False
+
+    def _call(self, name, fn, args, kwargs, rows):
+        # picco assoluto per livello: reset_peak nei figli cancellerebbe quello del padre, che va salvato prima
+        frame = [0]
+        if self.memory:
+            if self._stack:
+                self._stack[-1][0] = max(self._stack[-1][0], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        self._stack.append(frame)
+        t0 = time.perf_counter()
+        try:
+            out = fn(*args, **kwargs)
+        finally:
+            wall = time.perf_counter() - t0
+            self._stack.pop()
+        peak = -1
+        if self.memory:
+            top = max(tracemalloc.get_traced_memory()[1], frame[0])
+            peak = top - base
+            if self._stack:
+                self._stack[-1][0] = max(self._stack[-1][0], top)
+        rec = StageRecord(name, t0 - self._t0, wall, rows(out, args), peak, len(self._stack))
+        self.records.append(rec)
+        if self.callback is not None:
+            self.callback(rec)
+        return out
+
+    def summary(self):
+        """
+        Per-stage aggregates, in order of first call.
+        Returns:
+            pd.DataFrame: stage, calls, wall_s (total), mean_ms, max_ms, rows (total), peak_mb (largest)
+        """
+        cols = ["stage", "calls", "wall_s", "mean_ms", "max_ms", "rows", "peak_mb"]
+        if not self.records:
+            return pd.DataFrame(columns=cols)
+        r = pd.DataFrame([asdict(x) for x in self.records]).sort_values("start", kind="stable")
+        g = r.groupby("stage", sort=False)
+        out = pd.DataFrame({"calls":g.size(), "wall_s":g["wall"].sum(), "mean_ms":1e3*g["wall"].mean(),
+                            "max_ms":1e3*g["wall"].max(), "rows":g["rows"].sum(), "peak_mb":g["peak"].max()/1e6})
+        if not self.memory:
+            out["peak_mb"] = np.nan
+        return out.reset_index()[cols]
+
+    def to_json(self, path=None):
+        """
+        JSON export: the per-stage summary plus every record (times in seconds, memory in bytes).
+        Args:
+            path (str): file to write (None = only return the string)
+        Returns:
+            str: the JSON document
+        """
+        doc = {"memory":self.memory, "stages":json.loads(self.summary().to_json(orient="records")),
+               "records":[asdict(x) for x in self.records]}
+        text = json.dumps(doc, indent=1)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def to_chrome_trace(self, path=None):
+        """
+        Chrome trace export (chrome://tracing, Perfetto): one complete event per stage call, nested
+        stages drawn inside run_allocation.
+        Args:
+            path (str): file to write (None = only return the document)
+        Returns:
+            dict: {"traceEvents": [...], "displayTimeUnit": "ms"}
+        """
+        pid = os.getpid()
+        events = [{"name":x.stage, "cat":"allocation", "ph":"X", "ts":x.start*1e6, "dur":x.wall*1e6,
+                   "pid":pid, "tid":0, "args":{"rows":x.rows, "peak_bytes":x.peak}} for x in self.records]
+        doc = {"traceEvents":events, "displayTimeUnit":"ms"}
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(doc, f)
+        return doc
+
+def _output_rows(out, args):
+    # righe della tabella di uscita dello stadio (primo elemento se restituisce una tupla)
+    first = out[0] if isinstance(out, tuple) and out else out
+    return len(first) if isinstance(first, pd.DataFrame) else -1
+
+def _instrumented(name, rows=_output_rows):
+    # registra la chiamata nel StageProfile attivo; a strumentazione spenta costa un solo controllo
+    def wrap(fn):
+        @functools.wraps(fn)
+        def stage(*args, **kwargs):
+            if _PROFILE is None:
+                return fn(*args, **kwargs)
+            return _PROFILE._call(name, fn, args, kwargs, rows)
+        return stage
+    return wrap
+
+# ---------- traccia delle decisioni ----------
+_TRACE = None  # DecisionTrace attivo nel processo (None = nessuna traccia)
+
+# eventi per stadio e loro colonne (oltre a run, stage, event)
+TRACE_EVENTS = {
+    "admission": ["coalition", "total_coal_votes", "coal_share", "max_list_share", "admitted", "reason"],
+    "bonus": ["coalition", "coal_share", "need", "base_seats", "seats", "applied", "reason"],
+    "coalition_seats": ["coalition", "seats"],
+    "group_seats": ["list", "coalition", "coalition_seats", "quotient", "quotient_seats", "remainder",
+                    "remainder_seat", "group_seats", "mode"],
+    "integer_seats": ["province", "list", "coalition", "votes", "q_circ", "int_seats", "rest_pct"],
+    "cap_trim": ["province", "list", "coalition", "cap"],
+    "residual_seat": ["province", "list", "coalition", "ranking", "value", "position"],
+    "residual_skipped": ["province", "list", "coalition", "ranking", "value", "blocked_by"],
+    "runner_up": ["coalition", "status", "province", "list", "seats"],
+}
+
+class DecisionTrace:
+    """
+    Opt-in structured log of the allocation decisions. Inside `with DecisionTrace() as trace:`
+    run_allocation and the stage functions record, per run:
+    - admission: every coalition, admitted or not and why (coalition_threshold, list_threshold,
+      below_thresholds, no_votes)
+    - bonus: leader share, seats due, D'Hondt seats before the bonus and whether it was applied
+    - coalition_seats / group_seats: seats per coalition and the quotient/remainder split per list
+    - integer_seats: provincial quota, integer seats and remainder of every row
+    - cap_trim, residual_seat, residual_skipped: integer seats cut by a group cap, each residual seat
+      granted (ranking and position) and each candidate skipped with what blocked it
+      (province_full or list_cap)
+    - runner_up: runner-up coalition, already represented or the seat removed for it
+    Stages hand over whole columns, which are kept as they are and turned into tables only when the
+    log is queried; with no active trace the stages only check a module global. The batched engine and
+    ElectionModel are not traced. One trace is active per process at a time.
+    """
+    def __init__(self):
+        self.runs = 0
+        self._events = []
+        self._prev = None
+
+    def __enter__(self):
+        global _TRACE
+        self._prev, _TRACE = _TRACE, self
+        return self
+
+    def __exit__(self, *exc):
+        global _TRACE
+        _TRACE = self._prev
+        return False
+
+    def _emit(self, stage, event, columns):
+        self._events.append((self.runs, stage, event, columns))
+
+    def frame(self, event):
+        """
+        All records of one event kind.
+        Args:
+            event (str): a key of TRACE_EVENTS
+        Returns:
+            pd.DataFrame: run, stage and the columns of the event, in emission order
+        """
+        if event not in TRACE_EVENTS:
+            raise ValueError(f"unknown trace event: {event}")
+        parts = [pd.DataFrame(cols).assign(run=run, stage=stage)
+                 for run, stage, ev, cols in self._events if ev == event]
+        if not parts:
+            return pd.DataFrame(columns=["run", "stage"] + TRACE_EVENTS[event])
+        return pd.concat(parts, ignore_index=True)[["run", "stage"] + TRACE_EVENTS[event]]
+
+    def events(self, event=None, **where):
+        """
+        Long table of the log, one row per decision in emission order, optionally filtered.
+        Args:
+            event (str or list): event kinds to keep (None = all)
+            **where: column equalities, e.g. province="Fermo", list="Lega", run=1
+        Returns:
+            pd.DataFrame: seq, run, stage, event and the union of the event columns (NaN where not applicable)
+        """
+        kinds = [event] if isinstance(event, str) else (event or list(TRACE_EVENTS))
+        parts, seq = [], 0
+        for run, stage, ev, cols in self._events:
+            part = pd.DataFrame(cols)
+            if ev in kinds:
+                parts.append(part.assign(seq=np.arange(seq, seq + len(part)), run=run, stage=stage, event=ev))
+            seq += len(part)
+        if not parts:
+            return pd.DataFrame(columns=["seq", "run", "stage", "event"])
+        out = pd.concat(parts, ignore_index=True)
+        for col, value in where.items():
+            out = out[out[col] == value] if col in out.columns else out.iloc[:0]
+        return _trace_columns(out)
+
+    def explain(self, province, list_name, run=None):
+        """
+        Every decision that bears on one seat cell: the admission, bonus and seats of its coalition,
+        the group cap of the list, the integer, cap and residual events of the cell and the runner-up outcome.
+        Args:
+            province (str): province
+            list_name (str): list
+            run (int): run to explain (None = last run)
+        Returns:
+            pd.DataFrame: the matching rows of events(), in emission order
+        """
+        log = self.events()
+        if log.empty:
+            return log
+        log = log[log["run"] == (self.runs if run is None else run)]
+        lists = log["list"] if "list" in log.columns else pd.Series(None, index=log.index)
+        provs = log["province"] if "province" in log.columns else pd.Series(None, index=log.index)
+        coal = log.loc[(lists == list_name) & log["coalition"].notna(), "coalition"]
+        coal = coal.iloc[0] if len(coal) else None
+        cell = (lists == list_name) & ((provs == province) | provs.isna())
+        coalition_level = lists.isna() & (log["coalition"] == coal)
+        return _trace_columns(log[cell | coalition_level | (log["event"] == "runner_up")])
+
+    def to_json(self, path=None):
+        """
+        JSON export of events() as a list of records.
+        Args:
+            path (str): file to write (None = only return the string)
+        Returns:
+            str: the JSON document
+        """
+        text = self.events().to_json(orient="records", indent=1)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+def _trace_columns(log):
+    # colonne fisse in testa, poi solo le colonne usate dagli eventi selezionati
+    front = ["seq", "run", "stage", "event"]
+    rest = [c for c in log.columns if c not in front and log[c].notna().any()]
+    return log[front + rest].reset_index(drop=True)
+
+def _trace_coalitions(coal, seats, leader, need, bonus, total_list_seats, coal_threshold, list_threshold):
+    # admission, premio e seggi per coalizione (stadio A)
+    names = coal["coalition"].to_numpy()
+    cv = coal["total_coal_votes"].to_numpy(dtype=float)
+    share = np.broadcast_to(coal["coal_share"].to_numpy(dtype=float), cv.shape)
+    mx = coal["max_list_share"].to_numpy(dtype=float)
+    adm = coal["admitted"].to_numpy(dtype=bool)
+    reason = np.select([cv<=0, share>=coal_threshold, mx>list_threshold],
+                       ["no_votes", "coalition_threshold", "list_threshold"], "below_thresholds")
+    _TRACE._emit("coalitions", "admission", {"coalition":names, "total_coal_votes":cv, "coal_share":share,
+                                             "max_list_share":mx, "admitted":adm, "reason":reason})
+    l = leader[0]
+    if l >= 0:
+        base = dhondt_batch(np.where(adm, cv, 0.0)[None, :], total_list_seats)[0]
+        why = "applied" if bonus[0] else ("below_bonus_thresholds" if need[0] == 0 else "minimum_already_reached")
+        _TRACE._emit("coalitions", "bonus", {"coalition":[names[l]], "coal_share":[share[l]], "need":[need[0]],
+                                             "base_seats":[base[l]], "seats":[seats[0, l]],
+                                             "applied":[bool(bonus[0])], "reason":[why]})
+    _TRACE._emit("coalitions", "coalition_seats", {"coalition":names[adm], "seats":seats[0, adm]})
+
+# ---------- dati codificati ----------
+def _province_seats(province_seats_df, provinces):
+    # seggi di ogni provincia nell'ordine di provinces; per una provincia ripetuta vale l'ultima riga
+    seats = province_seats_df.drop_duplicates("province", keep="last").set_index("province")["seats"].reindex(list(provinces))
+    if seats.isna().any():
+        raise ValueError(f"no seats for provinces: {seats.index[seats.isna()].tolist()}")
+    return seats.to_numpy()
+
+@dataclass(frozen=True)
+class ElectionData:
+    """
+    Integer-coded election shared by all stages. Provinces, lists, coalitions and presidents are encoded
+    once (alphabetical codes, the same order as the groupby of the DataFrame stages) and votes are a
+    contiguous province x list int64 matrix; arrays are read-only.
+    Attributes:
+        provinces, lists, coalitions, presidents (tuple): labels of the codes
+        votes (np.ndarray): int64 votes, shape (provinces, lists)
+        present (np.ndarray): True for the province x list entries present in the input
+        cell_order (np.ndarray): flat index (province*lists + list) of the present entries in input row order;
+            the rankings of stages C–D break ties in this order, as the DataFrame stages do
+        list_coalition (np.ndarray): coalition code of each list
+        list_president (np.ndarray): president code of each list (-1 if unknown)
+        province_seats (np.ndarray): seats of each province
+        pres_votes (np.ndarray): presidential votes added to each coalition total
+    """
+    provinces: tuple
+    lists: tuple
+    coalitions: tuple
+    presidents: tuple
+    votes: np.ndarray
+    present: np.ndarray
+    cell_order: np.ndarray
+    list_coalition: np.ndarray
+    list_president: np.ndarray
+    province_seats: np.ndarray
+    pres_votes: np.ndarray
+
+    def __post_init__(self):
+        for name, dtype in (("votes", np.int64), ("present", bool), ("cell_order", np.int64), ("list_coalition", np.int64),
+                            ("list_president", np.int64), ("province_seats", np.int64), ("pres_votes", float)):
+            arr = np.array(getattr(self, name), dtype=dtype)
+            arr.setflags(write=False)
+            object.__setattr__(self, name, arr)
+
+    @classmethod
+    def from_frames(cls, votes_df, province_seats_df):
+        """
+        Encodes a cleaned votes DataFrame (as prepared by run_allocation) and the seats per province.
+        Args:
+            votes_df (pd.DataFrame): columns ['province', 'list', 'coalition', 'votes'] plus optional 'president', 'pres_votes'
+            province_seats_df (pd.DataFrame): columns ['province', 'seats']
+        Returns:
+            ElectionData
+        """
+        provinces = tuple(sorted(votes_df["province"].unique()))
+        lists = tuple(sorted(votes_df["list"].unique()))
+        coalitions = tuple(sorted(votes_df["coalition"].unique()))
+        v = votes_df["votes"].to_numpy(dtype=float)
+        if not np.isfinite(v).all() or (v!=np.round(v)).any():
+            raise ValueError("votes must be whole numbers")
+        pi = pd.Index(provinces).get_indexer(votes_df["province"])
+        li = pd.Index(lists).get_indexer(votes_df["list"])
+        ci = pd.Index(coalitions).get_indexer(votes_df["coalition"])
+        votes = np.zeros((len(provinces), len(lists)), dtype=np.int64)
+        np.add.at(votes, (pi, li), v.astype(np.int64))
+        present = np.zeros(votes.shape, dtype=bool)
+        present[pi, li] = True
+        flat = pi*len(lists)+li
+        _, first = np.unique(flat, return_index=True)
+        list_coalition = np.zeros(len(lists), dtype=np.int64)
+        list_coalition[li[::-1]] = ci[::-1]  # prima coalizione incontrata per lista
+        presidents, list_president = (), np.full(len(lists), -1)
+        if "president" in votes_df.columns:
+            presidents = tuple(sorted(votes_df["president"].dropna().unique()))
+            pres_code = pd.Index(presidents).get_indexer(votes_df["president"])
+            list_president[li[::-1]] = pres_code[::-1]
+        pres = np.zeros(len(coalitions))
+        if "pres_votes" in votes_df.columns:
+            np.add.at(pres, ci, votes_df["pres_votes"].fillna(0).to_numpy(dtype=float))
+        return cls(provinces, lists, coalitions, presidents, votes, present, flat[np.sort(first)], list_coalition,
+                   list_president, _province_seats(province_seats_df, provinces), pres)
+
+    def with_votes(self, votes):
+        """Same structure with a different province x list vote matrix."""
+        return replace(self, votes=votes)
+
+    def seats_for(self, province_seats_df=None):
+        # seggi per codice provincia: dalla struttura o da un DataFrame ['province', 'seats']
+        if province_seats_df is None:
+            return self.province_seats
+        return _province_seats(province_seats_df, self.provinces)
+
+    @property
+    def cells(self):
+        """(province codes, list codes) of the present entries, in input row order."""
+        return np.divmod(self.cell_order, len(self.lists))
+
+    def cells_frame(self, pi=None, li=None):
+        """
+        Long DataFrame ['province', 'list', 'coalition', ('president',) 'votes'] of the given cells
+        (all present cells, in input row order, by default).
+        """
+        if pi is None:
+            pi, li = self.cells
+        lc = self.list_coalition[li]
+        out = {"province":np.array(self.provinces, dtype=object)[pi],
+               "list":np.array(self.lists, dtype=object)[li],
+               "coalition":np.array(self.coalitions, dtype=object)[lc]}
+        if self.presidents:
+            pc = self.list_president[li]
+            out["president"] = np.where(pc>=0, np.array(self.presidents+("",), dtype=object)[pc], None)
+        out["votes"] = self.votes[pi, li].astype(float)
+        return pd.DataFrame(out)
 
 # ---------- A) coalizioni: soglia + seggi + premio minimo ----------
-def coalitions_stage(votes_df, total_list_seats, pct19, pct18):
-    # Art. 18, comma 5–6: Coalition/list admission thresholds
-    # Art. 19, comma 1–2: D'Hondt allocation, minimum seat bonus for leading coalition
+def _coalition_arrays(list_votes, list_coalition, pres_votes, coal_threshold=0.05, list_threshold=0.03):
+    # voti di coalizione, quote e ammissione (Art. 18, comma 5–6) per ogni scenario; list_votes (scenari, liste).
+    # Le soglie possono essere scalari o una per scenario
+    lc = np.asarray(list_coalition)
+    C = len(pres_votes)
+    LV = np.asarray(list_votes, dtype=float)
+    onehot = np.zeros((len(lc), C))
+    onehot[np.arange(len(lc)), lc] = 1.0
+    list_coal_votes = LV @ onehot
+    CV = list_coal_votes + pres_votes
+    tot = CV.sum(axis=1, keepdims=True)
+    share = np.divide(CV, tot, out=np.zeros_like(CV), where=tot>0)
+    tl = LV.sum(axis=1, keepdims=True)
+    lshare = np.divide(LV, tl, out=np.zeros_like(LV), where=tl>0)
+    mx = np.zeros_like(CV)
+    for c in range(C):
+        if (lc==c).any():
+            mx[:, c] = lshare[:, lc==c].max(axis=1)
+    return list_coal_votes, CV, share, mx, _admitted(CV, share, mx, coal_threshold, list_threshold)
+
+def _admitted(coal_votes, share, max_list_share, coal_threshold, list_threshold):
+    # soglie scalari o una per scenario (colonna), confrontate su tutta la matrice scenari x coalizioni
+    ct = np.reshape(np.asarray(coal_threshold, dtype=float), (-1, 1))
+    lt = np.reshape(np.asarray(list_threshold, dtype=float), (-1, 1))
+    return ((share>=ct) | (max_list_share>lt)) & (coal_votes>0)
+
+def coalition_seats_batch(coal_votes, admitted, total_list_seats, pct19, pct18, seats19=19, seats18=18):
+    """
+    Batched coalition seats: D'Hondt among the admitted coalitions plus the 19/18 minimum-seat bonus.
+    Args:
+        coal_votes (array-like): matrix (scenarios x coalitions) of total coalition votes
+        admitted (array-like): boolean matrix of the same shape, True for admitted coalitions
+        total_list_seats (int or array-like): seats to allocate, scalar or one value per scenario
+        pct19 (float or array-like): leader share that guarantees 19 seats
+        pct18 (float or array-like): leader share that guarantees 18 seats
+        seats19, seats18 (int or array-like): minimum seats guaranteed at the pct19 and pct18 shares
+    Returns:
+        tuple: (seats, leader, need, bonus) -- int64 seats (scenarios x coalitions), index of the leading
+        admitted coalition (-1 if none), minimum seats due to the leader (seats19, seats18 or 0) and a bool flag set
+        where the bonus re-allocation was applied
+    """
+    cv = np.asarray(coal_votes, dtype=float)
+    adm = np.asarray(admitted, dtype=bool)
+    if cv.ndim == 1:
+        cv, adm = cv[None, :], adm[None, :]
+    n = cv.shape[0]
+    rows = np.arange(n)
+    tot = cv.sum(axis=1, keepdims=True)
+    share = np.divide(cv, tot, out=np.zeros_like(cv), where=tot > 0)
+    av = np.where(adm, cv, 0.0)
+    seats = dhondt_batch(av, total_list_seats)
+
+    # premio minimo 19/18 al primo per voti fra gli ammessi (a parità vince il primo in ordine)
+    any_adm = adm.any(axis=1)
+    leader = np.where(any_adm, np.where(adm, cv, -np.inf).argmax(axis=1), -1)
+    lshare = np.where(any_adm, share[rows, leader], 0.0)
+    need = np.where(lshare >= pct19, seats19, np.where(lshare >= pct18, seats18, 0)).astype(np.int64)
+    need[~any_adm] = 0
+    got = seats[rows, leader]
+    bonus = any_adm & (need > 0) & (got < need)
+    if bonus.any():
+        b = np.flatnonzero(bonus)
+        others = av[b].copy()
+        others[np.arange(len(b)), leader[b]] = 0.0
+        seats[b] = dhondt_batch(others, np.broadcast_to(np.asarray(total_list_seats), (n,))[b] - need[b])
+        seats[b, leader[b]] = need[b]
+    return seats, leader, need, bonus
+
+def coalitions_batch(coal_votes, max_list_share=None, total_list_seats=30, pct19=0.43, pct18=0.40, seats19=19,
+                     seats18=18, coal_threshold=0.05, list_threshold=0.03):
+    """
+    Batched stage A on coalition vote vectors: admission test, leader detection, bonus need and the
+    D'Hondt re-run among the other coalitions, all evaluated on the (scenarios x coalitions) matrix.
+    Every parameter is a scalar or one value per scenario, with the params.csv names.
+    Args:
+        coal_votes (array-like): matrix (scenarios x coalitions) of total coalition votes
+        max_list_share (array-like): same shape, regional share of the best list of each coalition;
+            None = only the coalition threshold applies
+        total_list_seats, pct19, pct18, seats19, seats18, coal_threshold, list_threshold: see run_allocation
+    Returns:
+        dict: coal_share, admitted, leader (-1 if none), need (0 if no bonus tier is reached),
+        bonus (re-allocation applied) and seats (int64 scenarios x coalitions)
+    """
+    cv = np.atleast_2d(np.asarray(coal_votes, dtype=float))
+    tot = cv.sum(axis=1, keepdims=True)
+    share = np.divide(cv, tot, out=np.zeros_like(cv), where=tot > 0)
+    mx = np.zeros_like(cv) if max_list_share is None else np.atleast_2d(np.asarray(max_list_share, dtype=float))
+    admitted = _admitted(cv, share, mx, coal_threshold, list_threshold)
+    seats, leader, need, bonus = coalition_seats_batch(cv, admitted, total_list_seats, pct19, pct18, seats19, seats18)
+    return {"coal_share":share, "admitted":admitted, "leader":leader, "need":need, "bonus":bonus, "seats":seats}
+
+def _coalitions_table(votes_df, coal_threshold=0.05, list_threshold=0.03):
     # voti liste regionali per gruppo-lista
     list_reg = votes_df.groupby(["list","coalition"], as_index=False)["votes"].sum()
     # voti coalizione = somma liste (+ eventuali voti presidenziali se presenti)
     coal = list_reg.groupby("coalition", as_index=False)["votes"].sum().rename(columns={"votes":"list_votes"})
     if "pres_votes" in votes_df.columns:
-        pres = votes_df.groupby("coalition", as_index=False)["pres_votes"].sum()
-        coal = coal.merge(pres, on="coalition", how="left").fillna({"pres_votes":0})
+        pres = votes_df.groupby("coalition")["pres_votes"].sum()
+        coal["pres_votes"] = coal["coalition"].map(pres).fillna(0)
     else:
         coal["pres_votes"]=0
     coal["total_coal_votes"]=coal["list_votes"]+coal["pres_votes"]
@@ -322,186 +657,2715 @@ def coalitions_stage(votes_df, total_list_seats, pct19, pct18):
     coal["coal_share"]=coal["total_coal_votes"]/tot_coal if tot_coal>0 else 0
 
     tot_list = list_reg["votes"].sum()
-    mx = list_reg.assign(list_share=list_reg["votes"]/tot_list if tot_list>0 else 0)\
-                 .groupby("coalition")["list_share"].max().reset_index().rename(columns={"list_share":"max_list_share"})
-    coal = coal.merge(mx, on="coalition", how="left")
-    coal["admitted"] = (coal["coal_share"]>=0.05) | (coal["max_list_share"]>0.03)
+    share = list_reg["votes"]/tot_list if tot_list>0 else pd.Series(0.0, index=list_reg.index)
+    coal["max_list_share"] = coal["coalition"].map(share.groupby(list_reg["coalition"]).max())
+    coal["admitted"] = (coal["coal_share"]>=coal_threshold) | (coal["max_list_share"]>list_threshold)
     coal.loc[coal["total_coal_votes"]<=0,"admitted"]=False
+    return coal
+
+def _coalitions_frame(data, coal_threshold=0.05, list_threshold=0.03):
+    # stessa tabella da ElectionData: riduzioni su array, nessun groupby/merge
+    lv, cv, share, mx, adm = _coalition_arrays(data.votes.sum(axis=0)[None, :], data.list_coalition, data.pres_votes,
+                                               coal_threshold, list_threshold)
+    return pd.DataFrame({"coalition":list(data.coalitions), "list_votes":lv[0], "pres_votes":data.pres_votes,
+                         "total_coal_votes":cv[0], "coal_share":share[0], "max_list_share":mx[0], "admitted":adm[0]})
+
+@_instrumented("coalitions_stage")
+def coalitions_stage(votes_df, total_list_seats, pct19, pct18, seats19=19, seats18=18,
+                     coal_threshold=0.05, list_threshold=0.03):
+    # Art. 18, comma 5–6: Coalition/list admission thresholds (coal_threshold, list_threshold)
+    # Art. 19, comma 1–2: D'Hondt allocation, minimum seat bonus for leading coalition (seats19/seats18)
+    thresholds = (coal_threshold, list_threshold)
+    coal = _coalitions_frame(votes_df, *thresholds) if isinstance(votes_df, ElectionData) else \
+           _coalitions_table(votes_df, *thresholds)
 
-    adm = coal[coal["admitted"]].copy()
-    base = dhondt(dict(zip(adm["coalition"], adm["total_coal_votes"])), total_list_seats)
-    coal_seats = pd.DataFrame({"coalition":list(base.keys()), "seats":list(base.values())})
-
-    # premio minimo 19/18
-    if not coal_seats.empty:
-        leader = adm.sort_values("total_coal_votes", ascending=False)["coalition"].iloc[0]
-        lshare = float(adm.loc[adm["coalition"]==leader,"coal_share"])
-        need = 19 if lshare>=pct19 else (18 if lshare>=pct18 else 0)
-        got = int(coal_seats.loc[coal_seats["coalition"]==leader,"seats"])
-        if need>0 and got<need:
-            remaining = total_list_seats-need
-            others = adm[adm["coalition"]!=leader]
-            other_counts = dhondt(dict(zip(others["coalition"], others["total_coal_votes"])), remaining)
-            coal_seats = pd.concat([
-                pd.DataFrame({"coalition":[leader], "seats":[need]}),
-                pd.DataFrame({"coalition":list(other_counts.keys()), "seats":list(other_counts.values())})
-            ], ignore_index=True)
+    # D'Hondt + premio minimo 19/18 sul motore vettoriale (una sola riga-scenario)
+    adm = coal["admitted"].to_numpy(dtype=bool)
+    seats, leader, need, bonus = coalition_seats_batch(coal["total_coal_votes"].to_numpy(dtype=float)[None, :],
+                                                       adm[None, :], total_list_seats, pct19, pct18,
+                                                       seats19, seats18)
+    order = np.flatnonzero(adm)
+    if bonus[0]:
+        # il leader premiato va in testa, poi gli altri nell'ordine originale
+        order = np.r_[leader[0], order[order!=leader[0]]]
+    coal_seats = pd.DataFrame({"coalition":coal["coalition"].to_numpy()[order].tolist(),
+                               "seats":seats[0, order].tolist()})
+    if _TRACE is not None:
+        _trace_coalitions(coal, seats, leader, need, bonus, total_list_seats, *thresholds)
     return coal, coal_seats
 
 # ---------- B) seggi ai gruppi di liste dentro le coalizioni ----------
+def _segment_rank(lc, start, *keys):
+    # posizione di ogni lista dentro la sua coalizione secondo le chiavi (la prima conta di più), parità per indice;
+    # un solo ordinamento per scenario sull'array di segmenti, niente confronti lista x lista
+    n, L = keys[0].shape
+    idx = np.broadcast_to(np.arange(L), (n, L))
+    order = np.lexsort((idx,) + tuple(-k for k in reversed(keys)) + (np.broadcast_to(lc, (n, L)),), axis=-1)
+    rank = np.empty((n, L), dtype=np.int64)
+    np.put_along_axis(rank, order, np.arange(L) - start[lc[order]], axis=-1)
+    return rank
+
+def _group_seats_arrays(list_votes, list_coalition, coal_seats, admitted):
+    # Art. 19, comma 3 su array: quoziente intero floor(V/(S+1)) + resti più alti (rem_abs desc, voti desc)
+    # dentro ogni coalizione; a quoziente nullo giro a rotazione in ordine di voti.
+    # Restituisce i seggi per lista (scenari, liste) e la posizione della lista nella tabella di uscita
+    LV = np.asarray(list_votes, dtype=float)
+    lc = np.asarray(list_coalition)
+    n, L = LV.shape
+    C = coal_seats.shape[1]
+    size = np.bincount(lc, minlength=C)
+    start = np.concatenate(([0], np.cumsum(size)[:-1]))
+    onehot = np.zeros((L, C), dtype=np.int64)
+    onehot[np.arange(L), lc] = 1
+    adm_l = admitted[:, lc]
+    S = coal_seats[:, lc]
+    Vc = (LV @ onehot)[:, lc]
+    q = np.floor(Vc/(S+1))
+    live = adm_l & (S>0) & (Vc>0)
+    quota = live & (q>0)
+    qi = np.where(quota, np.floor_divide(LV, np.where(quota, q, 1)), 0).astype(np.int64)
+    rem = (coal_seats - qi @ onehot)[:, lc]
+    rank = _segment_rank(lc, start, LV - qi*q, LV)
+    group = qi + (quota & (rank<rem))
+    pos = np.where(quota & (rem>0), rank, _segment_rank(lc, start, np.zeros((1, L)))[0])
+    rr = live & (q<=0)
+    if rr.any():
+        vrank = _segment_rank(lc, start, LV)
+        group = np.where(rr, S//size[lc] + (vrank < S%size[lc]), group)
+        pos = np.where(rr, vrank, pos)
+    return group*adm_l, pos
+
+def group_seats_batch(list_votes, list_coalition, coal_seats, admitted=None):
+    """
+    Batched list seats within coalitions (Art. 19, comma 3): integer quotient floor(V/(S+1)) plus
+    largest remainders (rem_abs desc, then votes desc, then list order), for all coalitions and
+    scenarios at once on a segment-indexed array; round robin by votes where the quotient is zero.
+    Args:
+        list_votes (array-like): matrix (scenarios x lists) of regional list votes
+        list_coalition (array-like): coalition index of every list
+        coal_seats (array-like): matrix (scenarios x coalitions) of coalition seats
+        admitted (array-like): boolean matrix (scenarios x coalitions); None = coalitions with seats
+    Returns:
+        np.ndarray: int64 seats per list (scenarios x lists), the group caps of stage D
+    """
+    LV = np.atleast_2d(np.asarray(list_votes, dtype=float))
+    cs = np.atleast_2d(np.asarray(coal_seats, dtype=np.int64))
+    adm = cs > 0 if admitted is None else np.atleast_2d(np.asarray(admitted, dtype=bool))
+    return _group_seats_arrays(LV, list_coalition, cs, adm)[0]
+
+def _group_seats_table(list_votes, list_coalition, coal_seats, admitted, lists, coalitions):
+    # tabella [list, coalition, group_seats] come l'ha sempre data group_seats_stage: coalizioni nell'ordine
+    # di coal_seats, liste in ordine di resto se la coalizione ha avuto resti, altrimenti in ordine di riga
+    group, pos = _group_seats_arrays(list_votes[None, :], list_coalition, coal_seats[None, :], admitted[None, :])
+    keep = np.flatnonzero(admitted[list_coalition])
+    keep = keep[np.lexsort((pos[0, keep], list_coalition[keep]))]
+    out = pd.DataFrame({"list":np.asarray(lists, dtype=object)[keep],
+                        "coalition":np.asarray(coalitions, dtype=object)[list_coalition[keep]],
+                        "group_seats":group[0, keep]})
+    if _TRACE is not None:
+        # quoziente di coalizione, seggi interi e resto di ogni lista, ricostruiti come in _group_seats_arrays
+        lv, lc = np.asarray(list_votes, dtype=float)[keep], list_coalition[keep]
+        S = coal_seats[lc]
+        Vc = np.bincount(list_coalition, weights=list_votes, minlength=len(coal_seats))[lc]
+        q = np.floor(Vc/(S+1))
+        quota = (S>0) & (Vc>0) & (q>0)
+        qi = np.where(quota, np.floor_divide(lv, np.where(quota, q, 1)), 0).astype(np.int64)
+        mode = np.where(quota, "quotient", np.where((S>0) & (Vc>0), "round_robin", "no_seats"))
+        _TRACE._emit("group_seats", "group_seats", {"list":out["list"].to_numpy(), "coalition":out["coalition"].to_numpy(),
+                                                    "coalition_seats":S, "quotient":q, "quotient_seats":qi,
+                                                    "remainder":np.where(quota, lv - qi*q, 0.0),
+                                                    "remainder_seat":quota & (group[0, keep] > qi),
+                                                    "group_seats":group[0, keep], "mode":mode})
+    return out
+
+@_instrumented("group_seats_stage")
 def group_seats_stage(votes_df, coal_seats_df):
     # Art. 19, comma 3: Distribution of coalition seats to lists/groups
-    reg = votes_df.groupby(["list","coalition"], as_index=False)["votes"].sum()
-    out=[]
-    for _,r in coal_seats_df.iterrows():
-        c, S = r["coalition"], int(r["seats"])
-        sub = reg[reg["coalition"]==c].copy()
-        if S<=0 or sub["votes"].sum()<=0:
-            out.append(sub.assign(group_seats=0)[["list","coalition","group_seats"]]); continue
-        q = floor(sub["votes"].sum()/(S+1))
-        if q<=0:
-            sub=sub.sort_values("votes", ascending=False).reset_index(drop=True)
-            sub["group_seats"]=0
-            for i in range(S): sub.loc[i%len(sub),"group_seats"]+=1
-            out.append(sub[["list","coalition","group_seats"]]); continue
-        sub["qi"]=(sub["votes"]//q).astype(int)
-        rem=S-sub["qi"].sum()
-        sub["group_seats"]=sub["qi"]
-        if rem>0:
-            sub["rem_abs"]=sub["votes"]-sub["qi"]*q
-            sub=sub.sort_values(["rem_abs","votes"], ascending=[False,False]).reset_index(drop=True)
-            for i in range(rem): sub.loc[i,"group_seats"]+=1
-        out.append(sub[["list","coalition","group_seats"]])
-    return pd.concat(out, ignore_index=True)
+    # coalizioni codificate nell'ordine di coal_seats_df, così la tabella ne segue l'ordine
+    coals = pd.Index(coal_seats_df["coalition"])
+    seats = np.zeros(len(coals) + 1, dtype=np.int64)
+    adm = np.zeros(len(coals) + 1, dtype=bool)
+    seats[:-1], adm[:-1] = coal_seats_df["seats"].to_numpy().astype(int), True
+    if isinstance(votes_df, ElectionData):
+        d = votes_df
+        lv, lists, lc = d.votes.sum(axis=0), d.lists, coals.get_indexer(np.asarray(d.coalitions, dtype=object))
+        lc = lc[d.list_coalition]
+    else:
+        reg = votes_df.groupby(["list","coalition"], as_index=False)["votes"].sum()
+        lv, lists, lc = reg["votes"].to_numpy(dtype=float), reg["list"].to_numpy(), coals.get_indexer(reg["coalition"])
+    lc = np.where(lc>=0, lc, len(coals))  # coalizioni fuori da coal_seats: segmento in coda, non ammesso
+    return _group_seats_table(lv, lc, seats, adm, lists, list(coals) + [None])
 
 # ---------- C) seggi interi provinciali + resti percentuali ----------
+def _quota_split(votes, q_circ, prov_total):
+    # seggi interi = voti // quoziente (0 se quoziente nullo); resto % sul totale provinciale (0 se totale nullo)
+    qs = np.where(q_circ>0, q_circ, 1)
+    int_seats = np.where(q_circ>0, np.floor_divide(votes, qs), 0).astype(np.int64)
+    ts = np.where(prov_total>0, prov_total, 1)
+    rest_pct = np.where(prov_total>0, 100*(votes-int_seats*q_circ)/ts, 0.0)
+    return int_seats, rest_pct
+
+@_instrumented("provincial_integers")
 def provincial_integers(votes_df, province_seats_df, admitted_coalitions):
     # Art. 19, comma 4: Provincial seat allocation (integer quotas and residuals)
-    v = votes_df[votes_df["coalition"].isin(admitted_coalitions)].copy()
-    prov = v.groupby("province", as_index=False)["votes"].sum().rename(columns={"votes":"prov_total"})
-    prov = prov.merge(province_seats_df, on="province", how="left")
-    prov["q_circ"] = (prov["prov_total"]//(prov["seats"]+1)).astype(int)
-    x = v.merge(prov[["province","seats","q_circ","prov_total"]], on="province", how="left")
-    x["int_seats"]=x.apply(lambda r: int(r["votes"]//r["q_circ"]) if r["q_circ"]>0 else 0, axis=1)
-    x["rest_pct"]=x.apply(lambda r: 100*(r["votes"]-r["int_seats"]*r["q_circ"])/r["prov_total"] if r["prov_total"]>0 else 0.0, axis=1)
+    if isinstance(votes_df, ElectionData):
+        x, prov = _provincial_integers_data(votes_df, province_seats_df, admitted_coalitions)
+    else:
+        x, prov = _provincial_integers_frame(votes_df, province_seats_df, admitted_coalitions)
+    if _TRACE is not None:
+        _TRACE._emit("provincial_integers", "integer_seats", {c:x[c].to_numpy() for c in TRACE_EVENTS["integer_seats"]})
+    return x, prov
+
+def _provincial_integers_frame(votes_df, province_seats_df, admitted_coalitions):
+    # un'unica tabella di uscita: righe delle coalizioni ammesse, colonne provinciali per indice di provincia
+    x = votes_df.take(np.flatnonzero(votes_df["coalition"].isin(admitted_coalitions).to_numpy()))
+    x.index = pd.RangeIndex(len(x))
+    pc, provs = pd.factorize(x["province"], sort=True)
+    votes = x["votes"].to_numpy()
+    prov_total = np.bincount(pc, weights=votes, minlength=len(provs)).astype(votes.dtype)  # tipo dei voti, come groupby
+    seats = _province_seats(province_seats_df, provs)
+    q_circ = (prov_total//(seats+1)).astype(int)
+    prov = pd.DataFrame({"province":provs, "prov_total":prov_total, "seats":seats, "q_circ":q_circ})
+    x["seats"], x["q_circ"], x["prov_total"] = seats[pc], q_circ[pc], prov_total[pc]
+    x["int_seats"], x["rest_pct"] = _quota_split(votes, q_circ[pc], prov_total[pc])
     return x, prov
 
+def _provincial_integers_data(data, province_seats_df, admitted_coalitions):
+    # come provincial_integers, da ElectionData; province_seats_df=None usa i seggi della struttura
+    seats = data.seats_for(province_seats_df)
+    adm = np.isin(np.array(data.coalitions, dtype=object), list(admitted_coalitions))[data.list_coalition]
+    pi, li = data.cells
+    pi, li = pi[adm[li]], li[adm[li]]
+    int_seats, rest_pct, q_circ, prov_total = provincial_integers_batch(data.votes[pi, li], pi, seats)
+    has = np.flatnonzero(np.bincount(pi, minlength=len(data.provinces)))
+    prov = pd.DataFrame({"province":[data.provinces[i] for i in has], "prov_total":prov_total[0, has],
+                         "seats":seats[has], "q_circ":q_circ[0, has]})
+    x = data.cells_frame(pi, li)
+    x["seats"], x["q_circ"], x["prov_total"] = seats[pi], q_circ[0, pi], prov_total[0, pi]
+    x["int_seats"], x["rest_pct"] = int_seats[0], rest_pct[0]
+    return x, prov
+
+def provincial_integers_batch(votes, row_province, province_seats):
+    """
+    Batched provincial integers: quota, integer seats and percentage remainders for many scenarios,
+    straight on arrays. Rows are the province x list entries of the admitted coalitions (zero votes
+    for rows that must not count).
+    Args:
+        votes (array-like): matrix (scenarios x rows) of votes
+        row_province (array-like): province code (0..P-1) of each row
+        province_seats (array-like): seats of each province
+    Returns:
+        tuple: (int_seats, rest_pct, q_circ, prov_total) -- int_seats and rest_pct are (scenarios x rows),
+        q_circ and prov_total are (scenarios x provinces)
+    """
+    v = np.asarray(votes, dtype=float)
+    if v.ndim == 1:
+        v = v[None, :]
+    rp = np.asarray(row_province)
+    seats = np.asarray(province_seats)
+    onehot = np.zeros((len(rp), len(seats)))
+    onehot[np.arange(len(rp)), rp] = 1.0
+    prov_total = v @ onehot
+    q_circ = (prov_total//(seats+1)).astype(np.int64)
+    int_seats, rest_pct = _quota_split(v, q_circ[:, rp], prov_total[:, rp])
+    return int_seats, rest_pct, q_circ, prov_total
+
 # ---------- D) applica tetti di gruppo + assegna resti in graduatoria unica ----------
-def assign_residuals(df_step, prov_meta, group_caps):
-    # Art. 19, comma 5–6: Group/list seat caps and unique residual ranking
-    df=df_step.copy()
-    caps = dict(zip(group_caps["list"], group_caps["group_seats"]))
-    
-    # Calculate regional rest ranking first
-    df["regional_rest_rank"] = df["rest_pct"].rank(method="min", ascending=False).astype(int)
-    
-    # Calculate absolute rest for reporting
-    df["rest"] = df["votes"] - df["int_seats"] * df["q_circ"]
-    
-    # riduci eccedenze
-    current = df.groupby("list")["int_seats"].sum().to_dict()
-    df["final_seats"]=df["int_seats"].astype(int)
-    for lst,cap in caps.items():
-        overflow=max(0, current.get(lst,0)-int(cap))
-        if overflow<=0: continue
-        idxs = df[df["list"]==lst].sort_values(["int_seats","votes"], ascending=[False,True]).index
-        for i in idxs:
-            if overflow<=0: break
-            if df.at[i,"final_seats"]>0:
-                df.at[i,"final_seats"]-=1
-                overflow-=1
+def assign_residuals_arrays(prov_code, list_code, int_seats, votes, rest_pct, prov_seats, list_caps, events=None):
+    """
+    Array residual engine behind assign_residuals. Capacities live in integer arrays indexed by
+    province/list code and each row is reached through a precomputed (province, list) -> position index,
+    so cap trimming, the remainder ranking and the absolute-votes fallback are one ordered sweep each.
+    Ties are broken by row order.
+    Args:
+        prov_code, list_code (array-like): province and list code of each row
+        int_seats, votes, rest_pct (array-like): integer seats, votes and percentage remainder of each row
+        prov_seats (array-like): seats of each province code (negative = province without seat data)
+        list_caps (array-like): group seats of each list code (negative = list without a cap)
+        events (list): if given, decisions are appended as (event, row, ranking, detail) tuples:
+            cap_trim, residual_seat (detail = position) and residual_skipped (detail = province_full or list_cap)
+    Returns:
+        tuple: (final_seats, order) -- int64 seats per row and the rows that won a residual seat, in order
+    """
+    pc, lc = np.asarray(prov_code), np.asarray(list_code)
+    seats_p, caps = np.asarray(prov_seats, dtype=np.int64), np.asarray(list_caps, dtype=np.int64)
+    ints, votes = np.asarray(int_seats, dtype=np.int64), np.asarray(votes, dtype=float)
+    # indice (provincia, lista) -> prima riga con quella coppia
+    _, first, inv = np.unique(pc*len(caps)+lc, return_index=True, return_inverse=True)
+    target = first[inv.ravel()]
+
+    # riduci eccedenze: dentro ogni lista (seggi interi desc, voti asc), un seggio per riga
+    final = ints.copy()
+    over = np.zeros(len(caps), dtype=np.int64)
+    np.add.at(over, lc, ints)
+    over = np.where(caps>=0, np.maximum(over-caps, 0), 0)
+    if over.any():
+        for i in np.lexsort((votes, -ints, lc)):
+            l = lc[i]
+            if over[l]>0 and final[i]>0:
+                final[i]-=1; over[l]-=1
+                if events is not None:
+                    events.append(("cap_trim", i, None, None))
+
     # capacità residua provincia e lista
-    prov_left = (prov_meta[["province","seats"]]
-                 .merge(df.groupby("province",as_index=False)["final_seats"].sum().rename(columns={"final_seats":"assigned"}),
-                        on="province", how="left").fillna({"assigned":0}))
-    prov_left["left"]=prov_left["seats"]-prov_left["assigned"]
-    prov_left=dict(zip(prov_left["province"], prov_left["left"]))
-    lst_left = group_caps.merge(df.groupby("list",as_index=False)["final_seats"].sum().rename(columns={"final_seats":"assigned"}),
-                                on="list", how="left").fillna({"assigned":0})
-    lst_left["left"]=lst_left["group_seats"]-lst_left["assigned"]
-    lst_left=dict(zip(lst_left["list"], lst_left["left"]))
+    used_p = np.zeros(len(seats_p), dtype=np.int64); np.add.at(used_p, pc, final)
+    used_l = np.zeros(len(caps), dtype=np.int64); np.add.at(used_l, lc, final)
+    prov_left = np.where(seats_p>=0, seats_p-used_p, 0).tolist()
+    lst_left = np.where(caps>=0, caps-used_l, 0).tolist()
+    open_p = sum(v>0 for v in prov_left)
 
     order=[]
-    # graduatoria unica per resti percentuali
-    cand=df[["province","list","coalition","votes","rest_pct"]].sort_values("rest_pct", ascending=False)
-    for _,r in cand.iterrows():
-        p,l=r["province"], r["list"]
-        if prov_left.get(p,0)>0 and lst_left.get(l,0)>0:
-            i = df[(df["province"]==p)&(df["list"]==l)].index[0]
-            df.at[i,"final_seats"]+=1
-            prov_left[p]-=1; lst_left[l]-=1; order.append((p,l))
-    # se rimane capacità, usa voti assoluti
-    if any(v>0 for v in prov_left.values()) and any(v>0 for v in lst_left.values()):
-        pool=df.copy()
-        pool["prov_left"]=pool["province"].map(prov_left)
-        pool["lst_left"]=pool["list"].map(lst_left)
-        pool=pool[(pool["prov_left"]>0)&(pool["lst_left"]>0)].sort_values("votes", ascending=False)
-        for _,r in pool.iterrows():
-            p,l=r["province"], r["list"]
+    pcl, lcl, tl = pc.tolist(), lc.tolist(), target.tolist()
+    # graduatoria unica per resti percentuali, poi (se rimane capacità) voti assoluti
+    for ranking, key in (("rest_pct", rest_pct), ("votes", votes)):
+        if open_p<=0 or not any(v>0 for v in lst_left): break
+        for i in np.argsort(-np.asarray(key, dtype=float), kind="stable").tolist():
+            p, l = pcl[i], lcl[i]
             if prov_left[p]>0 and lst_left[l]>0:
-                i = df[(df["province"]==p)&(df["list"]==l)].index[0]
-                df.at[i,"final_seats"]+=1
-                prov_left[p]-=1; lst_left[l]-=1; order.append((p,l))
-            if all(v<=0 for v in prov_left.values()): break
+                final[tl[i]]+=1
+                prov_left[p]-=1; lst_left[l]-=1; order.append(i)
+                if events is not None:
+                    events.append(("residual_seat", i, ranking, len(order)))
+                if prov_left[p]==0:
+                    open_p-=1
+                    if open_p==0: break
+            elif events is not None:
+                events.append(("residual_skipped", i, ranking, "province_full" if prov_left[p]<=0 else "list_cap"))
+    return final, order
+
+def _rest_columns(rest_pct, votes, int_seats, q_circ):
+    # colonne di rendiconto: posizione nella graduatoria regionale dei resti % (rank 'min', decrescente) e resto assoluto
+    rest_pct = np.asarray(rest_pct, dtype=float)
+    rank = np.searchsorted(np.sort(-rest_pct), -rest_pct) + 1
+    return rank, np.asarray(votes) - np.asarray(int_seats) * np.asarray(q_circ)
+
+@_instrumented("assign_residuals")
+def assign_residuals(df_step, prov_meta, group_caps, copy=True):
+    # Art. 19, comma 5–6: Group/list seat caps and unique residual ranking
+    # copy=False scrive le colonne direttamente in df_step (modalità pipeline di run_allocation)
+    df = df_step.copy() if copy else df_step
+
+    # Calculate regional rest ranking first, and the absolute rest for reporting
+    df["regional_rest_rank"], df["rest"] = _rest_columns(df["rest_pct"], df["votes"], df["int_seats"], df["q_circ"])
+
+    # codici interi per provincia e lista; capacità mancanti = -1
+    pc, provs = pd.factorize(df["province"])
+    lc, lists = pd.factorize(df["list"])
+    seats = prov_meta.drop_duplicates("province", keep="last").set_index("province")["seats"]
+    caps = group_caps.drop_duplicates("list", keep="last").set_index("list")["group_seats"]
+    events = [] if _TRACE is not None else None
+    list_caps = caps.reindex(lists).fillna(-1).to_numpy()
+    final, rows = assign_residuals_arrays(pc, lc, df["int_seats"].to_numpy(), df["votes"].to_numpy(dtype=float),
+                                          df["rest_pct"].to_numpy(dtype=float),
+                                          seats.reindex(provs).fillna(-1).to_numpy(), list_caps, events)
+    df["final_seats"]=final
+    order=[(provs[pc[i]], lists[lc[i]]) for i in rows]
+    if events:
+        _trace_residuals(df, events, list_caps[lc])
     return df, order
 
+def _trace_residuals(df, events, row_caps):
+    # eventi dello stadio D per kind, con provincia/lista/coalizione della riga
+    ev = pd.DataFrame(events, columns=["event", "row", "ranking", "detail"])
+    for kind, g in ev.groupby("event", sort=False):
+        r = g["row"].to_numpy()
+        cols = {"province":df["province"].to_numpy()[r], "list":df["list"].to_numpy()[r],
+                "coalition":df["coalition"].to_numpy()[r]}
+        if kind == "cap_trim":
+            cols["cap"] = row_caps[r]
+        else:
+            cols["ranking"] = g["ranking"].to_numpy()
+            cols["value"] = np.where(cols["ranking"] == "rest_pct", df["rest_pct"].to_numpy()[r],
+                                     df["votes"].to_numpy()[r])
+            cols["position" if kind == "residual_seat" else "blocked_by"] = g["detail"].to_numpy()
+        _TRACE._emit("residuals", kind, cols)
+
 # ---------- E) seggio riservato al 2° presidente ----------
-def reserve_runner_up(df_alloc, residual_order, votes_df, coal_votes, coal_seats):
+@_instrumented("reserve_runner_up")
+def reserve_runner_up(df_alloc, residual_order, votes_df, coal_votes, coal_seats, copy=True):
     # Art. 19, comma 7: Reserved seat for runner-up presidential candidate
     # However, we must respect the provincial seat allocation requirements
+    # copy=False toglie il seggio direttamente in df_alloc (modalità pipeline di run_allocation)
     adm = coal_seats["coalition"].tolist()
-    cv = coal_votes[coal_votes["coalition"].isin(adm)].sort_values("total_coal_votes", ascending=False)
-    if len(cv)<2: return df_alloc, None
+    # a pari voti vale l'ordine delle righe, come leader e secondo del motore vettoriale
+    cv = coal_votes[coal_votes["coalition"].isin(adm)].sort_values("total_coal_votes", ascending=False, kind="stable")
+    if len(cv)<2:
+        if _TRACE is not None:
+            _trace_runner_up(None, "no_runner_up")
+        return df_alloc, None
     
     second=cv.iloc[1]["coalition"]
-    lists_second=set(votes_df[votes_df["coalition"]==second]["list"].unique())
+    if isinstance(votes_df, ElectionData):
+        code = votes_df.coalitions.index(second)
+        lists_second={votes_df.lists[l] for l in np.flatnonzero(votes_df.list_coalition==code)}
+    else:
+        lists_second=set(votes_df[votes_df["coalition"]==second]["list"].unique())
     
     # Check if runner-up coalition already has seats
     runner_up_seats = df_alloc[df_alloc["coalition"] == second]["final_seats"].sum()
     if runner_up_seats > 0:
         # Runner-up already has representation, no need to remove seats
-        return df_alloc, {"reason": "runner_up_already_represented", "seats": int(runner_up_seats)}
+        if _TRACE is not None:
+            _trace_runner_up(second, "already_represented", seats=int(runner_up_seats))
+        return df_alloc, _runner_up_removed(RUNNER_UP_REPRESENTED, runner_up_seats)
     
     # Only remove seats if runner-up has no representation
-    out=df_alloc.copy()
+    out = df_alloc.copy() if copy else df_alloc
     # togli l'ultimo seggio assegnato via resti a una lista del secondo
     for p,l in reversed(residual_order):
         if l in lists_second:
             m=(out["province"]==p)&(out["list"]==l)
             out.loc[m,"final_seats"]=out.loc[m,"final_seats"]-1
+            if _TRACE is not None:
+                _trace_runner_up(second, "residual_seat_removed", p, l)
             return out, {"province":p,"list":l,"reason":"runner_up"}
     # altrimenti togli alla lista del secondo con meno voti fra quelle con almeno 1 seggio
-    sub=out[out["list"] in lists_second]
+    sub=out[out["list"].isin(lists_second)]
     sub=sub[sub["final_seats"]>0]
-    if sub.empty: return out, None
+    if sub.empty:
+        if _TRACE is not None:
+            _trace_runner_up(second, "no_seat_to_remove")
+        return out, None
     v=sub.sort_values(["final_seats","votes"], ascending=[True,True]).iloc[0]
     m=(out["province"]==v["province"])&(out["list"]==v["list"])
     out.loc[m,"final_seats"]=out.loc[m,"final_seats"]-1
+    if _TRACE is not None:
+        _trace_runner_up(second, "fallback_seat_removed", v["province"], v["list"])
     return out, {"province":v["province"],"list":v["list"],"reason":"runner_up_fallback"}
 
+def _runner_up_removed(runner_up, second_seats):
+    # 'removed' di reserve_runner_up dallo stato RUNNER_UP_* dei motori ad array: se la seconda coalizione non ha
+    # seggi non c'è nessun seggio suo da togliere, quindi None come con meno di due coalizioni ammesse
+    if runner_up == RUNNER_UP_REPRESENTED:
+        return {"reason": "runner_up_already_represented", "seats": int(second_seats)}
+    return None
+
+def _trace_runner_up(coalition, status, province=None, list_name=None, seats=None):
+    _TRACE._emit("runner_up", "runner_up", {"coalition":[coalition], "status":[status], "province":[province],
+                                            "list":[list_name], "seats":[seats]})
+
+# ---------- caricamento dati di sezione/comune ----------
+VOTES_KEYS = ["province", "list", "coalition", "president"]
+VOTES_COLUMNS = ["province", "list", "coalition", "votes"]  # colonne obbligatorie del file dei voti
+_CHUNK_ROWS = 500_000  # righe per blocco nel caricamento di file di sezione
+
+def _parse_votes(col, strict=False):
+    # voti come stringhe tipo " 13,800 " -> numeri (separatore delle migliaia rimosso, non numerici = 0);
+    # strict=True (richieste del servizio): voti non numerici, negativi o frazionari sono un errore
+    if not pd.api.types.is_numeric_dtype(col.dtype):
+        col = col.astype(str).str.strip().str.replace(",", "")
+    col = pd.to_numeric(col, errors="coerce")
+    if strict and not (np.isfinite(col) & (col >= 0) & (col == np.round(col))).all():
+        raise ValueError("votes must be non-negative whole numbers")
+    return col.fillna(0)
+
+def read_votes_chunked(path, chunksize=_CHUNK_ROWS, **read_csv_kwargs):
+    """
+    Reads a section- or comune-level vote file in chunks and aggregates it on the fly to the
+    province x list x coalition (x president) level used by the pipeline. Key columns are read as
+    categoricals and the votes as numbers with thousands separators removed, so peak memory depends on
+    the chunk size and the number of distinct keys, not on the file size. Extra columns (section,
+    comune, ...) are ignored; stray spaces in the header are stripped.
+    Args:
+        path (str or file-like): CSV file (optionally compressed) with columns
+            ['province', 'list', 'coalition', ('president',) 'votes']
+        chunksize (int): rows per chunk
+        **read_csv_kwargs: passed to pd.read_csv (e.g. sep, encoding)
+    Returns:
+        pd.DataFrame: columns ['province', 'list', 'coalition', ('president',) 'votes'], one row per key in
+        order of first appearance, votes as float
+    """
+    header = pd.read_csv(path, nrows=0, **read_csv_kwargs).columns
+    if hasattr(path, "seek"):
+        path.seek(0)
+    raw = {c.strip():c for c in header}
+    missing = [c for c in VOTES_COLUMNS if c not in raw]
+    if missing:
+        raise ValueError(f"missing columns in {getattr(path, 'name', path)}: {missing}")
+    keys = [k for k in VOTES_KEYS if k in raw]
+    # voti letti dal parser C con il separatore delle migliaia; i blocchi con valori non numerici
+    # restano stringhe e passano dalla pulizia di _parse_votes
+    read_csv_kwargs.setdefault("thousands", ",")
+    totals = {}  # chiave -> voti, in ordine di prima apparizione
+    for chunk in pd.read_csv(path, usecols=[raw[c] for c in keys + ["votes"]], dtype={raw[k]:"category" for k in keys},
+                             chunksize=chunksize, **read_csv_kwargs):
+        chunk.columns = chunk.columns.str.strip()
+        chunk["votes"] = _parse_votes(chunk["votes"])
+        agg = chunk.groupby(keys, observed=True, sort=False, dropna=False)["votes"].sum()
+        for key, v in zip(agg.index, agg.to_numpy()):
+            totals[key] = totals.get(key, 0.0) + v
+    out = pd.DataFrame(list(totals), columns=keys) if totals else pd.DataFrame(columns=keys)
+    for k in keys:
+        out[k] = out[k].astype(object).str.strip()
+    out["votes"] = np.fromiter(totals.values(), dtype=float, count=len(totals))
+    return out
+
+_CACHE_VERSION = 1  # da incrementare se cambia il formato della cache
+
+def _file_digest(path):
+    # hash del contenuto del file, a blocchi
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return f"{_CACHE_VERSION}:{h.hexdigest()}"
+
+def _parse_votes_csv(path):
+    # nomi colonna ripuliti, chiavi come stringhe, voti letti come float dal parser C (separatore delle migliaia)
+    header = pd.read_csv(path, nrows=0).columns
+    raw = {c.strip():c for c in header}
+    if "votes" not in raw:
+        return pd.read_csv(path, dtype=str).rename(columns=lambda x: x.strip())
+    dtype = {c:str for c in header if c != raw["votes"]}
+    try:
+        df = pd.read_csv(path, thousands=",", dtype={**dtype, raw["votes"]:np.float64})
+    except ValueError:
+        # valori non numerici: stessa pulizia del resto del codice (non numerici = 0)
+        df = pd.read_csv(path, thousands=",", dtype=dtype)
+    df.columns = df.columns.str.strip()
+    df["votes"] = _parse_votes(df["votes"])
+    return df
+
+def load_votes(path="votes_marche_2025_all_provinces.csv", cache=True):
+    """
+    Single loader for the votes file: stray spaces in the header are stripped and votes stored as
+    quoted strings like " 13,800 " are parsed as float64 by the CSV reader, with no object-column pass.
+    With cache=True a binary copy (<file>.npz: coded key columns plus the votes array) is written next
+    to the CSV and keyed on a hash of the file content, so later loads of the same content skip CSV
+    parsing; any change to the file invalidates it. If the cache cannot be written the CSV result is
+    returned as is.
+    Args:
+        path (str): votes CSV with columns ['province', 'list', 'coalition', ('president',) 'votes']
+        cache (bool): read and write the binary cache
+    Returns:
+        pd.DataFrame: cleaned votes, ready for run_allocation
+    """
+    if not cache:
+        return _parse_votes_csv(path)
+    key = _file_digest(path)
+    cache_path = f"{path}.npz"
+    if os.path.exists(cache_path):
+        with np.load(cache_path, allow_pickle=False) as z:
+            if str(z["key"]) == key:
+                out = {}
+                for c in z["columns"].tolist():
+                    if c in z.files:
+                        out[c] = z[c]
+                    else:
+                        labels = np.append(z[f"{c}.labels"].astype(object), np.nan)
+                        out[c] = labels[z[f"{c}.codes"]]  # codice -1 = valore mancante (NaN, come read_csv)
+                return pd.DataFrame(out)
+    df = _parse_votes_csv(path)
+    arrays = {"key":np.array(key), "columns":np.array(df.columns.tolist())}
+    for c in df.columns:
+        if pd.api.types.is_numeric_dtype(df[c].dtype):
+            arrays[c] = df[c].to_numpy()
+        else:
+            codes, labels = pd.factorize(df[c])
+            arrays[f"{c}.codes"], arrays[f"{c}.labels"] = codes.astype(np.int32), np.array(labels.tolist(), dtype=str)
+    try:
+        tmp = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, cache_path)
+    except OSError:
+        pass
+    return df
+
+def _read_params(params_df):
+    # parametri da params.csv (key,value) come argomenti di run_allocation
+    p = params_df.rename(columns=lambda x: x.strip())
+    p = p.assign(value=pd.to_numeric(p["value"], errors="coerce")).set_index(p["key"].str.strip())["value"]
+    unknown = sorted(set(p.index) - set(PARAMS_KEYS))
+    if unknown:
+        raise ValueError(f"unknown keys in params: {unknown}")
+    out = dict(DEFAULT_PARAMS)
+    for key, name in PARAMS_KEYS.items():
+        if key in p.index:
+            if pd.isna(p[key]):
+                raise ValueError(f"{key} is not a number")
+            out[name] = type(DEFAULT_PARAMS[name])(p[key])
+    return out
+
+def load_inputs(votes_path="votes_marche_2025_all_provinces.csv", seats_path="seats_per_province.csv",
+                params_path="params.csv", cache=True):
+    """
+    Loads the three input files with the shared parsing rules.
+    Returns:
+        tuple: (votes_df, seats_df, params) -- params as keyword arguments of run_allocation
+    """
+    votes_df = load_votes(votes_path, cache=cache)
+    seats_df = pd.read_csv(seats_path).rename(columns=lambda x: x.strip())
+    if "seats" in seats_df.columns:
+        seats_df["seats"] = pd.to_numeric(seats_df["seats"], errors="coerce").fillna(0)
+    return votes_df, seats_df, _read_params(pd.read_csv(params_path))
+
 # ---------- pipeline ----------
-def run_allocation(votes_df, province_seats_df, total_list_seats=30, pct19=0.43, pct18=0.40):
-    # Pipeline: applies all steps in sequence as per L.R. 27/2004, artt. 18–19
-    # Clean column names and data
+def _clean_votes(votes_df):
+    # Clean column names and data; frames that are already clean (e.g. from load_votes) are returned without a copy
+    v = votes_df["votes"] if "votes" in votes_df.columns else None
+    if all(c == c.strip() for c in votes_df.columns) and \
+       (v is None or (pd.api.types.is_numeric_dtype(v.dtype) and not v.isna().any())):
+        return votes_df
     votes_df = votes_df.rename(columns=lambda x: x.strip())
-    
-    # Handle comma-separated numbers in votes column
-    if "votes" in votes_df.columns and votes_df["votes"].dtype == 'object':
-        votes_df["votes"] = votes_df["votes"].astype(str).str.replace(',', '').astype(float)
-    
-    for col in ["votes"]:
-        if col in votes_df.columns:
-            votes_df[col] = pd.to_numeric(votes_df[col], errors="coerce").fillna(0)
-    
-    coal_votes, coal_seats = coalitions_stage(votes_df, total_list_seats, pct19, pct18)
+    if "votes" in votes_df.columns:
+        votes_df["votes"] = _parse_votes(votes_df["votes"])
+    return votes_df
+
+@_instrumented("run_allocation")
+def run_allocation(votes_df, province_seats_df, total_list_seats=30, pct19=0.43, pct18=0.40, seats19=19, seats18=18,
+                   coal_threshold=0.05, list_threshold=0.03):
+    # Pipeline: applies all steps in sequence as per L.R. 27/2004, artt. 18–19
+    # votes_df può essere anche un ElectionData (province_seats_df=None usa i seggi codificati)
+    if not isinstance(votes_df, ElectionData):
+        votes_df = _clean_votes(votes_df)
+    if _TRACE is not None:
+        _TRACE.runs += 1
+
+    coal_votes, coal_seats = coalitions_stage(votes_df, total_list_seats, pct19, pct18, seats19, seats18,
+                                              coal_threshold, list_threshold)
     admitted = coal_votes[coal_votes["admitted"]]["coalition"].tolist()
     if not admitted: return (pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), None)
-    grp_seats = group_seats_stage(votes_df[votes_df["coalition"].isin(admitted)], coal_seats)
-    stepC, prov_meta = provincial_integers(votes_df[votes_df["coalition"].isin(admitted)], province_seats_df, admitted)
-    alloc, order = assign_residuals(stepC, prov_meta, grp_seats)
-    final, removed = reserve_runner_up(alloc, order, votes_df, coal_votes, coal_seats)
+    # gli stadi filtrano da soli sulle coalizioni ammesse e D ed E scrivono sul posto nella tabella di
+    # provincial_integers; ogni stadio costruisce comunque le proprie colonne (vedi benchmarks/bench_memory.py)
+    grp_seats = group_seats_stage(votes_df, coal_seats)
+    stepC, prov_meta = provincial_integers(votes_df, province_seats_df, admitted)
+    alloc, order = assign_residuals(stepC, prov_meta, grp_seats, copy=False)
+    final, removed = reserve_runner_up(alloc, order, votes_df, coal_votes, coal_seats, copy=False)
     return final, coal_seats, grp_seats, removed
 
+# ---------- F) motore vettoriale: scenari x province x liste ----------
+# Stesse regole degli stadi A–E, ma su array: ogni scenario è una matrice province x liste di voti.
+# Le parità nelle graduatorie seguono l'ordine delle righe (province e liste in ordine alfabetico),
+# come un ordinamento stabile sulle tabelle degli stadi.
+RUNNER_UP_NONE = 0            # meno di due coalizioni ammesse
+RUNNER_UP_REPRESENTED = 1     # la seconda coalizione ha già seggi
+RUNNER_UP_UNREPRESENTED = 2   # la seconda coalizione è rimasta senza seggi
+
+@_instrumented("allocate_batch", rows=lambda out, args: len(out["seats"]))
+def _allocate_batch(data, votes, total_list_seats, pct19, pct18, province_seats=None,
+                    coal_threshold=0.05, list_threshold=0.03, seats19=19, seats18=18):
+    # stadi A–E per un blocco di scenari sulla struttura di data; votes ha forma (scenari, province, liste).
+    # Seggi totali, soglie e seggi del premio, soglie di ammissione possono essere scalari o uno per scenario;
+    # province_seats (None = quelli di data) vale per tutto il blocco
+    V = np.asarray(votes, dtype=float)
+    seats_p = data.province_seats if province_seats is None else np.asarray(province_seats, dtype=np.int64)
+    n, P, L = V.shape
+    lc = data.list_coalition
+    ar = np.arange(n)
+
+    # A) soglie, D'Hondt e premio minimo
+    LV = V.sum(axis=1)
+    _, CV, _, _, admitted = _coalition_arrays(LV, lc, data.pres_votes, coal_threshold, list_threshold)
+    coal_seats, leader, need, bonus = coalition_seats_batch(CV, admitted, total_list_seats, pct19, pct18, seats19, seats18)
+
+    # B) seggi ai gruppi di liste
+    adm_l = admitted[:, lc]
+    group, _ = _group_seats_arrays(LV, lc, coal_seats, admitted)
+
+    # C) quoziente circoscrizionale sui voti delle coalizioni ammesse; si lavora sulle righe presenti
+    # (ordine di input), come le tabelle degli stadi DataFrame
+    pi, li = data.cells
+    R = len(pi)
+    cand = adm_l[:, li]
+    Va = np.where(cand, V[:, pi, li], 0.0)
+    ints, rest_pct, _, _ = provincial_integers_batch(Va, pi, seats_p)
+
+    # D) tetti di gruppo: togli un seggio per riga, (seggi interi desc, voti asc) dentro la lista
+    final = ints.copy()
+    over = np.maximum(ints @ (li[:, None] == np.arange(L)) - group, 0) * adm_l
+    if over.any():
+        order = np.lexsort((Va, -ints, np.broadcast_to(li, (n, R))), axis=-1)
+        pos = np.empty_like(order)
+        np.put_along_axis(pos, order, np.arange(R), axis=-1)
+        start = np.searchsorted(np.sort(li), li)  # prima posizione della lista nell'ordinamento
+        final -= (ints > 0) & (pos - start < over[:, li])
+    trimmed = final.copy()
+    prov_left = seats_p - final @ (pi[:, None] == np.arange(P))
+    lst_left = np.where(adm_l, group - final @ (li[:, None] == np.arange(L)), 0)
+
+    # graduatoria unica dei resti %, poi eventuale giro sui voti assoluti. Scansione per posizione
+    # di graduatoria, vettoriale sugli scenari: capacità e seggi come vettori piatti (righe x scenari)
+    pl, ll, fl = prov_left.T.copy().ravel(), lst_left.T.copy().ravel(), final.T.copy().ravel()
+    for key in (rest_pct, Va):
+        order = np.argsort(np.where(cand, -key, np.inf), axis=1, kind="stable").T
+        ok = np.take_along_axis(cand, order.T, axis=1).T
+        pidx, lidx, fidx = pi[order]*n + ar, li[order]*n + ar, order*n + ar
+        for j in range(R):
+            if j % 8 == 0 and not ((pl.reshape(P, n) > 0).any(axis=0) & (ll.reshape(L, n) > 0).any(axis=0)).any():
+                break
+            pj, lj = pidx[j], lidx[j]
+            hit = ok[j] & (pl[pj] > 0) & (ll[lj] > 0)
+            fl[fidx[j]] += hit
+            pl[pj] -= hit
+            ll[lj] -= hit
+    final = fl.reshape(R, n).T
+
+    # E) seggio riservato: la seconda coalizione per voti fra le ammesse
+    ck = np.where(admitted, -CV, np.inf)
+    corder = np.argsort(ck, axis=1, kind="stable")
+    has2 = admitted.sum(axis=1) >= 2
+    second = np.where(has2, corder[:, min(1, corder.shape[1] - 1)], -1)  # una sola coalizione: nessuna seconda
+    second_l = (lc[None, :] == second[:, None]) & has2[:, None]
+    second_seats = (final * second_l[:, li]).sum(axis=1)
+    runner_up = np.where(~has2, RUNNER_UP_NONE,
+                         np.where(second_seats > 0, RUNNER_UP_REPRESENTED, RUNNER_UP_UNREPRESENTED))
+
+    def cube(x):
+        # righe -> tensore (scenari, province, liste), zero per le celle assenti
+        out = np.zeros((n, P, L), dtype=x.dtype)
+        out[:, pi, li] = x
+        return out
+    return {"seats":cube(final), "int_seats":cube(ints), "residual_seats":cube(final - trimmed), "rest_pct":cube(rest_pct),
+            "group_seats":group, "coalition_seats":coal_seats, "admitted":admitted,
+            "leader":leader, "need":need, "bonus":bonus, "second":second, "runner_up":runner_up}
+
+def _perturb_votes(rng, base, present, n, noise, method):
+    # quote di ogni provincia estratte da una Dirichlet centrata sul risultato base (concentrazione 1/noise²),
+    # poi voti arrotondati (dirichlet) o estratti da una multinomiale sul totale provinciale (multinomial)
+    tot = base.sum(axis=1)
+    shares = np.divide(base, tot[:, None], out=np.zeros_like(base), where=tot[:, None] > 0)
+    if noise > 0:
+        g = rng.standard_gamma(np.broadcast_to(shares / noise**2, (n,) + base.shape))
+        gs = g.sum(axis=2, keepdims=True)
+        p = np.divide(g, gs, out=np.zeros_like(g), where=gs > 0)
+    else:
+        p = np.broadcast_to(shares, (n,) + base.shape)
+    if method == "multinomial":
+        counts = rng.multinomial(np.broadcast_to(tot.astype(np.int64), (n, len(tot))), p)
+        return np.where(present, counts, 0).astype(float)
+    if method != "dirichlet":
+        raise ValueError(f"unknown method: {method}")
+    return np.where(present, np.round(p * tot[:, None]), 0.0)
+
+@dataclass
+class SimulationResult:
+    """
+    Output of simulate(): seat tensor plus per-scenario coalition outcomes.
+    Attributes:
+        provinces, lists, coalitions (list): axis labels
+        seats (np.ndarray): final seats, shape (scenarios, provinces, lists)
+        coalition_seats (np.ndarray): seats per coalition, shape (scenarios, coalitions)
+        leader (np.ndarray): index of the leading admitted coalition (-1 if none)
+        bonus (np.ndarray): True where the 19/18 minimum bonus was applied
+        runner_up (np.ndarray): RUNNER_UP_* status of the reserved seat check
+    """
+    provinces: list
+    lists: list
+    coalitions: list
+    seats: np.ndarray
+    coalition_seats: np.ndarray
+    leader: np.ndarray
+    bonus: np.ndarray
+    runner_up: np.ndarray
+
+    def summary(self):
+        """
+        Summary probabilities over the scenarios.
+        Returns:
+            dict: 'coalitions' (mean seats, P(bonus), P(majority of list seats)), 'lists' (mean seats,
+            P(at least one seat)) and 'cells' (province x list mean seats and P(at least one seat))
+        """
+        cs = self.coalition_seats
+        total = cs.sum(axis=1, keepdims=True)
+        coal = pd.DataFrame({"coalition":self.coalitions,
+                             "mean_seats":cs.mean(axis=0),
+                             "p_bonus":[(self.bonus & (self.leader == c)).mean() for c in range(len(self.coalitions))],
+                             "p_majority":(2 * cs > total).mean(axis=0)})
+        ls = self.seats.sum(axis=1)
+        lists = pd.DataFrame({"list":self.lists, "mean_seats":ls.mean(axis=0), "p_seat":(ls > 0).mean(axis=0)})
+        P, L = len(self.provinces), len(self.lists)
+        cells = pd.DataFrame({"province":np.repeat(self.provinces, L), "list":np.tile(self.lists, P),
+                              "mean_seats":self.seats.mean(axis=0).ravel(),
+                              "p_seat":(self.seats > 0).mean(axis=0).ravel()})
+        return {"coalitions":coal, "lists":lists, "cells":cells}
+
+RUNNER_UP_STATUS = ("none", "represented", "unrepresented")  # nomi degli stati RUNNER_UP_*
+
+def _grown(hist, top):
+    # istogramma con almeno top + 1 classi: le classi nuove (conteggi zero) si aggiungono in coda
+    if top < hist.shape[-1]:
+        return hist
+    return np.pad(hist, [(0, 0)] * (hist.ndim - 1) + [(0, top + 1 - hist.shape[-1])])
+
+def _row_hist(x, bins):
+    # conteggi per valore di ogni colonna di x (scenari, m) -> (m, bins); x < bins
+    m = x.shape[1]
+    return np.bincount((np.arange(m) * bins + x).ravel(), minlength=m * bins).reshape(m, bins)
+
+def _hist_stats(hist, n, quantiles):
+    # media, deviazione standard e quantili (il più piccolo k con F(k) >= q) dai conteggi per valore
+    k = np.arange(hist.shape[-1])
+    mean = hist @ k / n
+    std = np.sqrt(np.maximum(hist @ (k * k) / n - mean**2, 0.0))
+    cum = np.cumsum(hist, axis=-1)
+    return mean, std, {f"q{round(100 * q):02d}":(cum < q * n - 1e-9).sum(axis=-1) for q in quantiles}
+
+class SeatAccumulator:
+    """
+    Streaming aggregates of simulated allocations: each batch of the batched engine is folded in as it is
+    produced and only fixed-size counts are kept, so memory depends on the provinces, lists, coalitions
+    and seats, not on the number of scenarios. Seats are bounded integers, so the seat histograms are an
+    exact quantile sketch and give exact means and variances. The histograms start at the province and list
+    seat totals and grow when a batch has more seats in one entry (integer quotas can exceed the seats of a
+    small province).
+    Attributes:
+        provinces, lists, coalitions (list): axis labels
+        n (int): scenarios folded in
+        cell_hist (np.ndarray): scenarios per seat count of each province x list entry,
+            shape (provinces, lists, max(largest province seats, largest count seen) + 1)
+        list_hist, coalition_hist (np.ndarray): scenarios per regional seat count of each list / coalition,
+            shape (lists or coalitions, max(total_list_seats, largest count seen) + 1)
+        residual (np.ndarray): scenarios in which each province x list entry won a seat through the residuals
+        residual_seats (np.ndarray): residual seats of each province x list entry summed over the scenarios
+    """
+    def __init__(self, data, total_list_seats=30, seats19=19, seats18=18):
+        """
+        Args:
+            data (ElectionData): structure of the simulated election
+            total_list_seats (int): seats allocated to lists (the largest one if it varies by scenario)
+            seats19, seats18 (int): seats of the two bonus tiers, to tell them apart in the outcomes
+        """
+        P, L, C = len(data.provinces), len(data.lists), len(data.coalitions)
+        K, S = int(np.max(total_list_seats)), int(data.province_seats.max())
+        self.provinces, self.lists, self.coalitions = list(data.provinces), list(data.lists), list(data.coalitions)
+        self.list_coalition = data.list_coalition
+        self.seats19, self.seats18 = seats19, seats18
+        self.n = 0
+        self.cell_hist = np.zeros((P, L, S + 1), dtype=np.int64)
+        self.list_hist = np.zeros((L, K + 1), dtype=np.int64)
+        self.coalition_hist = np.zeros((C, K + 1), dtype=np.int64)
+        self.residual = np.zeros((P, L), dtype=np.int64)
+        self.residual_seats = np.zeros((P, L), dtype=np.int64)
+        # esiti congiunti (capolista, seconda, maggioranza, fascia del premio, premio applicato, stato della riserva):
+        # codice -> scenari; per le coalizioni l'indice C vale 'nessuna'
+        self._outcome_shape = (C + 1, C + 1, C + 1, 3, 2, len(RUNNER_UP_STATUS))
+        self._outcomes = {}
+
+    def update(self, batch):
+        """
+        Folds in one batch of scenarios.
+        Args:
+            batch (dict): output of the batched engine ('seats', 'residual_seats', 'coalition_seats', 'leader',
+                'second', 'need', 'bonus', 'runner_up')
+        Returns:
+            SeatAccumulator: self
+        """
+        seats, cs = batch["seats"], batch["coalition_seats"]
+        b, P, L = seats.shape
+        C = cs.shape[1]
+        ls = seats.sum(axis=1)
+        self.cell_hist = _grown(self.cell_hist, int(seats.max(initial=0)))
+        self.list_hist = _grown(self.list_hist, int(ls.max(initial=0)))
+        self.coalition_hist = _grown(self.coalition_hist, int(cs.max(initial=0)))
+        self.cell_hist += _row_hist(seats.reshape(b, -1), self.cell_hist.shape[2]).reshape(self.cell_hist.shape)
+        self.list_hist += _row_hist(ls, self.list_hist.shape[1])
+        self.coalition_hist += _row_hist(cs, self.coalition_hist.shape[1])
+        self.residual += (batch["residual_seats"] > 0).sum(axis=0)
+        self.residual_seats += batch["residual_seats"].sum(axis=0)
+
+        has_majority = 2 * cs > cs.sum(axis=1, keepdims=True)
+        majority = np.where(has_majority.any(axis=1), has_majority.argmax(axis=1), C)
+        leader, second, need = batch["leader"], batch["second"], batch["need"]
+        tier = np.where(leader < 0, 0, np.where(need == self.seats19, 2, np.where(need == self.seats18, 1, 0)))
+        codes = np.ravel_multi_index((np.where(leader < 0, C, leader), np.where(second < 0, C, second), majority,
+                                      tier, batch["bonus"].astype(np.int64), batch["runner_up"]), self._outcome_shape)
+        for code, count in zip(*np.unique(codes, return_counts=True)):
+            self._outcomes[int(code)] = self._outcomes.get(int(code), 0) + int(count)
+        self.n += b
+        return self
+
+    def merge(self, other):
+        """
+        Adds the counts of another accumulator on the same structure (e.g. from another worker).
+        Returns:
+            SeatAccumulator: self
+        Raises:
+            ValueError: different structure
+        """
+        if (other.provinces, other.lists, other.coalitions) != (self.provinces, self.lists, self.coalitions):
+            raise ValueError("accumulators on different structures cannot be merged")
+        for name in ("cell_hist", "list_hist", "coalition_hist"):
+            mine, theirs = getattr(self, name), getattr(other, name)
+            mine = _grown(mine, theirs.shape[-1] - 1)
+            mine[..., :theirs.shape[-1]] += theirs
+            setattr(self, name, mine)
+        self.residual += other.residual
+        self.residual_seats += other.residual_seats
+        for code, count in other._outcomes.items():
+            self._outcomes[code] = self._outcomes.get(code, 0) + count
+        self.n += other.n
+        return self
+
+    def _outcome_arrays(self):
+        # campi degli esiti congiunti come array (uno per campo) e scenari per esito
+        codes = np.fromiter(self._outcomes, dtype=np.int64, count=len(self._outcomes))
+        counts = np.fromiter(self._outcomes.values(), dtype=np.int64, count=len(self._outcomes))
+        return np.unravel_index(codes, self._outcome_shape), counts
+
+    def outcomes(self):
+        """
+        Joint distribution of the coalition outcomes over the scenarios.
+        Returns:
+            pd.DataFrame: leader, second (runner-up coalition), majority (coalition with more than half of the list
+            seats), bonus_tier (0, seats18 or seats19), bonus (re-allocation applied), runner_up (RUNNER_UP_STATUS),
+            scenarios, probability; None where no coalition qualifies, most likely outcomes first
+        """
+        (leader, second, majority, tier, bonus, status), counts = self._outcome_arrays()
+        names = np.array(self.coalitions + [None], dtype=object)
+        out = pd.DataFrame({"leader":names[leader], "second":names[second], "majority":names[majority],
+                            "bonus_tier":np.array([0, self.seats18, self.seats19])[tier], "bonus":bonus.astype(bool),
+                            "runner_up":np.array(RUNNER_UP_STATUS, dtype=object)[status],
+                            "scenarios":counts, "probability":counts / max(self.n, 1)})
+        return out.sort_values("scenarios", ascending=False, kind="stable").reset_index(drop=True)
+
+    @property
+    def p_reserved(self):
+        """Probability that the runner-up reservation fires (runner-up coalition without seats)."""
+        fields, counts = self._outcome_arrays()
+        return counts[fields[5] == RUNNER_UP_UNREPRESENTED].sum() / max(self.n, 1)
+
+    def distribution(self, kind="lists"):
+        """
+        Seat distribution of each list, coalition or province x list entry (non-zero probabilities only).
+        Args:
+            kind (str): 'lists', 'coalitions' or 'cells'
+        Returns:
+            pd.DataFrame: list / coalition / province, list, then seats and probability
+        """
+        if kind == "cells":
+            pi, li, si = np.nonzero(self.cell_hist)
+            return pd.DataFrame({"province":np.array(self.provinces, dtype=object)[pi],
+                                 "list":np.array(self.lists, dtype=object)[li], "seats":si,
+                                 "probability":self.cell_hist[pi, li, si] / self.n})
+        if kind not in ("lists", "coalitions"):
+            raise ValueError(f"unknown distribution: {kind}")
+        hist, labels = (self.list_hist, self.lists) if kind == "lists" else (self.coalition_hist, self.coalitions)
+        i, si = np.nonzero(hist)
+        return pd.DataFrame({kind[:-1]:np.array(labels, dtype=object)[i], "seats":si, "probability":hist[i, si] / self.n})
+
+    def summary(self, quantiles=(0.05, 0.5, 0.95)):
+        """
+        Summary over the scenarios, with the columns of SimulationResult.summary() first.
+        Args:
+            quantiles (tuple): seat quantiles to report (columns q05, q50, ...)
+        Returns:
+            dict: 'coalitions' (mean seats, P(bonus), P(majority), std, quantiles, P(19 / 18 bonus tier) of the
+            leader, P(runner-up coalition)), 'lists' (mean seats, P(at least one seat), std, quantiles) and
+            'cells' (the same per province x list, plus P(seat through the residuals) and mean residual seats)
+        Raises:
+            ValueError: no scenario folded in
+        """
+        if not self.n:
+            raise ValueError("no scenarios in the accumulator")
+        n, C = self.n, len(self.coalitions)
+        (leader, second, majority, tier, bonus, _), counts = self._outcome_arrays()
+
+        def per_coalition(idx, mask=True):
+            return np.bincount(idx, weights=counts * mask, minlength=C + 1)[:C] / n
+
+        mean, std, q = _hist_stats(self.coalition_hist, n, quantiles)
+        coal = pd.DataFrame({"coalition":self.coalitions, "mean_seats":mean, "p_bonus":per_coalition(leader, bonus == 1),
+                             "p_majority":per_coalition(majority), "std_seats":std, **q,
+                             "p_tier19":per_coalition(leader, tier == 2), "p_tier18":per_coalition(leader, tier == 1),
+                             "p_runner_up":per_coalition(second)})
+        mean, std, q = _hist_stats(self.list_hist, n, quantiles)
+        lists = pd.DataFrame({"list":self.lists, "mean_seats":mean, "p_seat":1 - self.list_hist[:, 0] / n,
+                              "std_seats":std, **q})
+        P, L = len(self.provinces), len(self.lists)
+        mean, std, q = _hist_stats(self.cell_hist, n, quantiles)
+        cells = pd.DataFrame({"province":np.repeat(self.provinces, L), "list":np.tile(self.lists, P),
+                              "mean_seats":mean.ravel(), "p_seat":(1 - self.cell_hist[:, :, 0] / n).ravel(),
+                              "std_seats":std.ravel(), **{k:v.ravel() for k, v in q.items()},
+                              "p_residual":(self.residual / n).ravel(), "mean_residual_seats":(self.residual_seats / n).ravel()})
+        return {"coalitions":coal, "lists":lists, "cells":cells}
+
+def simulate(votes_df, province_seats_df, n=10000, noise=0.05, seed=None,
+             total_list_seats=30, pct19=0.43, pct18=0.40, method="dirichlet", batch_size=10000, accumulate=False,
+             **params):
+    """
+    Monte Carlo seat projection: perturbs the province x list votes n times and runs stages A–E
+    on the whole batch of scenarios with the array engine.
+    Args:
+        votes_df (pd.DataFrame or ElectionData): columns ['province', 'list', 'coalition', 'votes'] (cleaned as in run_allocation)
+        province_seats_df (pd.DataFrame): columns ['province', 'seats'] (ignored for an ElectionData)
+        n (int): number of scenarios
+        noise (float): spread of the Dirichlet around the observed provincial shares (0 = no perturbation)
+        seed (int): seed of the random generator
+        method (str): 'dirichlet' (rounded expected votes) or 'multinomial' (votes drawn on the provincial total)
+        batch_size (int): scenarios processed per block
+        accumulate (bool or SeatAccumulator): fold each block into a SeatAccumulator (a new one, or the one
+            given) instead of keeping the seat tensor; memory then does not grow with n
+        **params: seats19, seats18, coal_threshold, list_threshold (see run_allocation)
+    Returns:
+        SimulationResult: seat tensor (scenarios x provinces x lists) plus coalition outcomes,
+        or the SeatAccumulator with accumulate
+    """
+    if n <= 0:
+        raise ValueError("n must be a positive number of scenarios")
+    data = votes_df if isinstance(votes_df, ElectionData) else ElectionData.from_frames(votes_df, province_seats_df)
+    rng = np.random.default_rng(seed)
+    acc = accumulate if isinstance(accumulate, SeatAccumulator) else None
+    if accumulate and acc is None:
+        acc = SeatAccumulator(data, total_list_seats, params.get("seats19", 19), params.get("seats18", 18))
+    keep = ("seats", "coalition_seats", "leader", "bonus", "runner_up")
+    parts = {k:[] for k in keep}
+    for lo in range(0, n, batch_size):
+        V = _perturb_votes(rng, data.votes.astype(float), data.present, min(batch_size, n - lo), noise, method)
+        res = _allocate_batch(data, V, total_list_seats, pct19, pct18, **params)
+        if acc is not None:
+            acc.update(res)
+            continue
+        for k in keep:
+            parts[k].append(res[k])
+    if acc is not None:
+        return acc
+    return SimulationResult(list(data.provinces), list(data.lists), list(data.coalitions),
+                            **{k:np.concatenate(v) for k, v in parts.items()})
+
+# ---------- G) modello compilato: struttura fissa, solo i voti cambiano ----------
+@dataclass(frozen=True)
+class Allocation:
+    """
+    Result of ElectionModel.allocate(); arrays are read-only and indexed by the codes of the model's ElectionData.
+    Attributes:
+        data (ElectionData): structure and votes the allocation was computed on
+        seats, int_seats (np.ndarray): final and integer seats, shape (provinces, lists)
+        rest_pct (np.ndarray): percentage remainder, shape (provinces, lists)
+        group_seats (np.ndarray): group cap of each list
+        coalition_seats (np.ndarray): seats of each coalition
+        admitted (np.ndarray): True for the admitted coalitions
+        leader, second (int): leading and runner-up admitted coalition (-1 if none)
+        bonus (bool): True if the 19/18 minimum bonus was applied
+        runner_up (int): RUNNER_UP_* status of the reserved seat check
+        residual_order (tuple): (province, list) codes that won a residual seat, in assignment order
+    """
+    data: ElectionData
+    seats: np.ndarray
+    int_seats: np.ndarray
+    rest_pct: np.ndarray
+    group_seats: np.ndarray
+    coalition_seats: np.ndarray
+    admitted: np.ndarray
+    leader: int
+    second: int
+    bonus: bool
+    runner_up: int
+    residual_order: tuple
+
+    def __post_init__(self):
+        for name in ("seats", "int_seats", "rest_pct", "group_seats", "coalition_seats", "admitted"):
+            arr = np.array(getattr(self, name))
+            arr.setflags(write=False)
+            object.__setattr__(self, name, arr)
+
+    def to_frames(self):
+        """
+        Same output as run_allocation: (final, coal_seats, grp_seats, removed), built with the stage helpers of
+        run_allocation from the allocation's seats.
+        """
+        d = self.data
+        adm = np.flatnonzero(self.admitted)
+        if not len(adm):
+            return (pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), None)
+        order = adm
+        if self.bonus:
+            order = np.r_[self.leader, adm[adm!=self.leader]]
+        coal_seats = pd.DataFrame({"coalition":[d.coalitions[c] for c in order],
+                                   "seats":self.coalition_seats[order].tolist()})
+        grp_seats = group_seats_stage(d, coal_seats)
+
+        # tabella dello stadio C con le righe nell'ordine di _provincial_integers_data, colonne di D dai seggi calcolati
+        x, _ = _provincial_integers_data(d, None, [d.coalitions[c] for c in adm])
+        pi, li = d.cells
+        keep = self.admitted[d.list_coalition[li]]
+        x["regional_rest_rank"], x["rest"] = _rest_columns(x["rest_pct"], x["votes"], x["int_seats"], x["q_circ"])
+        x["final_seats"] = self.seats[pi[keep], li[keep]]
+        removed = _runner_up_removed(self.runner_up, self.seats[:, d.list_coalition==self.second].sum())
+        return x, coal_seats, grp_seats, removed
+
+class ElectionModel:
+    """
+    Allocation model compiled once from the static structure of an election: provinces and their seats,
+    list -> coalition mapping and the params.csv parameters. allocate() only takes the votes, so no column
+    cleaning, parsing, merges or label lookups happen per call.
+    Args:
+        data (ElectionData): encoded structure (its votes are the default vote vector)
+        total_list_seats (int): seats to allocate
+        pct19, pct18 (float): leader shares that guarantee seats19 and seats18 seats
+        seats19, seats18 (int): minimum seats of the bonus
+        coal_threshold, list_threshold (float): admission thresholds (Art. 18, comma 5–6)
+    """
+    def __init__(self, data, total_list_seats=30, pct19=0.43, pct18=0.40, seats19=19, seats18=18,
+                 coal_threshold=0.05, list_threshold=0.03):
+        self.data = data
+        self.total_list_seats, self.pct19, self.pct18 = total_list_seats, pct19, pct18
+        self.seats19, self.seats18 = seats19, seats18
+        self.coal_threshold, self.list_threshold = coal_threshold, list_threshold
+        self._pi, self._li = data.cells
+        self._shape = data.votes.shape
+
+    @property
+    def params(self):
+        """Parameters as keyword arguments of run_allocation."""
+        return {k:getattr(self, k) for k in DEFAULT_PARAMS}
+
+    @classmethod
+    def from_frames(cls, votes_df, province_seats_df, params_df=None, **params):
+        """Builds the model from the input DataFrames; params_df (key,value) is read like params.csv, keywords override it."""
+        kw = _read_params(params_df) if params_df is not None else {}
+        kw.update(params)
+        seats = province_seats_df.rename(columns=lambda x: x.strip())
+        return cls(ElectionData.from_frames(_clean_votes(votes_df), seats), **kw)
+
+    @classmethod
+    def from_csv(cls, votes_path="votes_marche_2025_all_provinces.csv", seats_path="seats_per_province.csv",
+                 params_path="params.csv"):
+        """Builds the model from the three input CSV files."""
+        votes_df, seats_df, params = load_inputs(votes_path, seats_path, params_path)
+        return cls.from_frames(votes_df, seats_df, **params)
+
+    def votes_matrix(self, votes):
+        """
+        Province x list float matrix from a vote vector (one value per input row, in input order) or
+        from a (provinces, lists) matrix; entries absent from the input are set to zero.
+        """
+        v = np.asarray(votes, dtype=float)
+        if v.shape == self._shape:
+            return np.where(self.data.present, v, 0.0)
+        if v.shape != self._pi.shape:
+            raise ValueError(f"expected {len(self._pi)} votes or a {self._shape} matrix, got shape {v.shape}")
+        V = np.zeros(self._shape)
+        V[self._pi, self._li] = v
+        return V
+
+    @_instrumented("model.allocate", rows=lambda out, args: len(out.data.cells[0]))
+    def allocate(self, votes=None):
+        """
+        Runs stages A–E on one vote vector.
+        Args:
+            votes (array-like): votes per input row (input order) or a (provinces, lists) matrix;
+                None uses the votes the model was built from
+        Returns:
+            Allocation: immutable result; Allocation.to_frames() gives the run_allocation tables
+        """
+        d = self.data
+        V = d.votes.astype(float) if votes is None else self.votes_matrix(votes)
+        reg = self._regional(V.sum(axis=0))
+        cand = reg[1][d.list_coalition[self._li]]
+        ints, rest_pct, _, _ = provincial_integers_batch(np.where(cand, V[self._pi, self._li], 0.0), self._pi,
+                                                         d.province_seats)
+        return self._finish(d if votes is None else d.with_votes(V), V, reg, cand, ints[0], rest_pct[0])
+
+    def _regional(self, list_votes):
+        # stadi A–B sui voti regionali per lista: (CV, ammesse, seggi coalizione, leader, premio, seggi gruppo)
+        d = self.data
+        LV = np.asarray(list_votes, dtype=float)[None, :]
+        _, CV, _, _, admitted = _coalition_arrays(LV, d.list_coalition, d.pres_votes, self.coal_threshold,
+                                                  self.list_threshold)
+        coal_seats, leader, _, bonus = coalition_seats_batch(CV, admitted, self.total_list_seats, self.pct19, self.pct18,
+                                                             self.seats19, self.seats18)
+        group, _ = _group_seats_arrays(LV, d.list_coalition, coal_seats, admitted)
+        return CV[0], admitted[0], coal_seats[0], int(leader[0]), bool(bonus[0]), group[0]
+
+    def _finish(self, data, V, reg, cand, ints, rest_pct):
+        # stadi D–E dalle righe di input (seggi interi e resti già calcolati); cand = righe delle coalizioni ammesse
+        CV, adm, coal_seats, leader, bonus, group = reg
+        lc = data.list_coalition
+        pi, li = self._pi[cand], self._li[cand]
+        ints, rest_pct = ints[cand], rest_pct[cand]
+        # resti con il motore indicizzato dello stadio D
+        final, rows = assign_residuals_arrays(pi, li, ints, V[pi, li], rest_pct, data.province_seats, group)
+
+        second = -1
+        if adm.sum() >= 2:
+            second = int(np.argsort(np.where(adm, -CV, np.inf), kind="stable")[1])
+            runner_up = RUNNER_UP_REPRESENTED if final[lc[li]==second].sum() > 0 else RUNNER_UP_UNREPRESENTED
+        else:
+            runner_up = RUNNER_UP_NONE
+
+        def cube(x, dtype):
+            out = np.zeros(self._shape, dtype=dtype)
+            out[pi, li] = x
+            return out
+        return Allocation(data, cube(final, np.int64), cube(ints, np.int64), cube(rest_pct, float), group, coal_seats,
+                          adm, leader, second, bonus, runner_up, tuple((int(pi[i]), int(li[i])) for i in rows))
+
+    def allocate_batch(self, votes, batch_size=10000, accumulate=False):
+        """
+        Runs stages A–E on many vote vectors with the batched engine.
+        Args:
+            votes (array-like): (scenarios, input rows) or (scenarios, provinces, lists) votes
+            batch_size (int): scenarios processed per block
+            accumulate (bool or SeatAccumulator): fold each block into a SeatAccumulator (a new one, or the one
+                given) instead of keeping the seat tensor
+        Returns:
+            SimulationResult, or the SeatAccumulator with accumulate
+        """
+        v = np.asarray(votes, dtype=float)
+        if v.ndim == 2:
+            V = np.zeros((len(v),) + self._shape)
+            V[:, self._pi, self._li] = v
+        elif v.shape[1:] == self._shape:
+            V = np.where(self.data.present, v, 0.0)
+        else:
+            raise ValueError(f"expected (scenarios, {len(self._pi)}) or (scenarios,) + {self._shape} votes, got {v.shape}")
+        acc = accumulate if isinstance(accumulate, SeatAccumulator) else None
+        if accumulate and acc is None:
+            acc = SeatAccumulator(self.data, self.total_list_seats, self.seats19, self.seats18)
+        keep = ("seats", "coalition_seats", "leader", "bonus", "runner_up")
+        parts = {k:[] for k in keep}
+        for lo in range(0, len(V), batch_size):
+            res = _allocate_batch(self.data, V[lo:lo + batch_size], **self.params)
+            if acc is not None:
+                acc.update(res)
+                continue
+            for k in keep:
+                parts[k].append(res[k])
+        if acc is not None:
+            return acc
+        d = self.data
+        return SimulationResult(list(d.provinces), list(d.lists), list(d.coalitions),
+                                **{k:np.concatenate(v) for k, v in parts.items()})
+
+class IncrementalAllocation:
+    """
+    Incremental mode of the allocation for partial updates (e.g. provinces reporting at different times on
+    election night). Keeps the previous stage outputs: regional list totals, coalition and group seats, and the
+    integer seats and remainders of every input row. An update recomputes the regional aggregates (stages A–B),
+    only the provincial_integers rows of the changed provinces (all provinces if the set of admitted coalitions
+    changes) and the residual ranking from the cached remainders. Results are identical to a full run.
+    Args:
+        model (ElectionModel): compiled structure and parameters
+        votes (array-like): starting votes, as in ElectionModel.allocate (None = the model's votes)
+    Attributes:
+        allocation (Allocation): current result
+        recomputed (dict): stages recomputed by the last call -- 'coalitions', 'group_seats', 'residuals',
+            'runner_up' (bool) and 'provincial_integers' (names of the provinces whose rows were recomputed)
+    """
+    def __init__(self, model, votes=None):
+        self.model = model
+        d = model.data
+        self._V = d.votes.astype(float) if votes is None else model.votes_matrix(votes)
+        self._LV = self._V.sum(axis=0)
+        self._ints = np.zeros(len(model._pi), dtype=np.int64)
+        self._rest = np.zeros(len(model._pi))
+        self._admitted = None
+        self._prov_rows = [np.flatnonzero(model._pi==p) for p in range(len(d.provinces))]
+        self._run(np.arange(len(d.provinces)))
+
+    def update(self, changes):
+        """
+        Replaces the votes of some provinces and re-allocates.
+        Args:
+            changes (dict): {province: votes}, votes as {list: votes} (lists not given keep their votes)
+                or as a vector with one value per list code
+        Returns:
+            Allocation: the new result (see also .recomputed)
+        """
+        d = self.model.data
+        changed = []
+        for prov, row in changes.items():
+            try:
+                p = d.provinces.index(prov)
+            except ValueError:
+                raise ValueError(f"unknown province: {prov}") from None
+            new = self._V[p].copy()
+            if isinstance(row, dict):
+                li = pd.Index(d.lists).get_indexer(list(row))
+                if (li<0).any():
+                    raise ValueError(f"unknown lists: {[l for l, i in zip(row, li) if i<0]}")
+                new[li] = list(row.values())
+            else:
+                new = np.asarray(row, dtype=float)
+                if new.shape != (len(d.lists),):
+                    raise ValueError(f"expected {len(d.lists)} votes for {prov}, got shape {new.shape}")
+            new = np.where(d.present[p], new, 0.0)
+            if (new != self._V[p]).any():
+                self._LV += new - self._V[p]
+                self._V[p] = new
+                changed.append(p)
+        if not changed:
+            self.recomputed = {"coalitions":False, "group_seats":False, "provincial_integers":[],
+                               "residuals":False, "runner_up":False}
+            return self.allocation
+        return self._run(np.array(changed))
+
+    def _run(self, changed):
+        m, d = self.model, self.model.data
+        reg = m._regional(self._LV)
+        admitted = reg[1]
+        if self._admitted is None or (admitted != self._admitted).any():
+            changed = np.arange(len(d.provinces))  # cambia l'insieme delle righe ammesse: tutte le province
+        self._admitted = admitted
+        cand = admitted[d.list_coalition[m._li]]
+        rows = np.sort(np.concatenate([self._prov_rows[p] for p in changed]))
+        pi, li = m._pi[rows], m._li[rows]
+        ints, rest, _, _ = provincial_integers_batch(np.where(cand[rows], self._V[pi, li], 0.0), pi, d.province_seats)
+        self._ints[rows], self._rest[rows] = ints[0], rest[0]
+        self.allocation = m._finish(d.with_votes(self._V), self._V, reg, cand, self._ints, self._rest)
+        self.recomputed = {"coalitions":True, "group_seats":True,
+                           "provincial_integers":[d.provinces[p] for p in np.sort(changed)],
+                           "residuals":True, "runner_up":True}
+        return self.allocation
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "evictions", "maxsize", "currsize"])
+
+def _structure_digest(data):
+    # impronta di tutto ElectionData tranne i voti: etichette, mappature, ordine di input, seggi
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([data.provinces, data.lists, data.coalitions, data.presidents]).encode())
+    for arr in (data.present, data.cell_order, data.list_coalition, data.list_president, data.province_seats,
+                data.pres_votes):
+        h.update(arr.tobytes())
+    return h.digest()
+
+class AllocationCache:
+    """
+    Bounded LRU cache of allocations for what-if tools that keep returning to the same configurations.
+    The key is a canonical hash of the aggregated province x list votes, the election structure (labels,
+    list -> coalition and president mapping, input row order, which breaks ties), the seats per province
+    and the parameters. Values are immutable Allocation objects: a hit hands out the stored result, and
+    Allocation.to_frames() builds new tables on every call.
+    Args:
+        maxsize (int): allocations kept before the least recently used one is evicted
+    """
+    def __init__(self, maxsize=256):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self._store = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def key(self, data, votes, params):
+        """
+        Canonical key of one allocation.
+        Args:
+            data (ElectionData): structure and seats per province
+            votes (np.ndarray): (provinces, lists) vote matrix in the codes of data
+            params (dict): run_allocation parameters
+        Returns:
+            str: hex digest
+        """
+        h = hashlib.blake2b(_structure_digest(data), digest_size=16)
+        h.update(repr(sorted((k, float(params[k])) for k in DEFAULT_PARAMS)).encode())
+        h.update(np.ascontiguousarray(np.asarray(votes, dtype=float) + 0.0).tobytes())
+        return h.hexdigest()
+
+    def allocate(self, model, votes=None):
+        """
+        Cached model.allocate(votes).
+        Args:
+            model (ElectionModel): compiled model (structure, seats and parameters)
+            votes (array-like): votes per input row or a (provinces, lists) matrix; None uses the model's votes
+        Returns:
+            Allocation
+        """
+        V = model.data.votes.astype(float) if votes is None else model.votes_matrix(votes)
+        key = self.key(model.data, V, model.params)
+        return self._lookup(key, lambda: model.allocate(V))
+
+    def allocate_frames(self, votes_df, province_seats_df, **params):
+        """
+        Cached allocation of the run_allocation inputs; .to_frames() on the result gives the run_allocation tables.
+        Args:
+            votes_df (pd.DataFrame or ElectionData): votes (cleaned here as in run_allocation)
+            province_seats_df (pd.DataFrame): columns ['province', 'seats'] (ignored for an ElectionData)
+            **params: run_allocation parameters (defaults for the missing ones)
+        Returns:
+            Allocation
+        """
+        data = votes_df if isinstance(votes_df, ElectionData) else \
+            ElectionData.from_frames(_clean_votes(votes_df), province_seats_df)
+        kw = dict(DEFAULT_PARAMS, **params)
+        key = self.key(data, data.votes, kw)
+        return self._lookup(key, lambda: ElectionModel(data, **kw).allocate())
+
+    def _lookup(self, key, compute):
+        store = self._store
+        if key in store:
+            self.hits += 1
+            store.move_to_end(key)
+            return store[key]
+        self.misses += 1
+        out = store[key] = compute()
+        if len(store) > self.maxsize:
+            store.popitem(last=False)
+            self.evictions += 1
+        return out
+
+    def info(self):
+        """Hit/miss statistics as a CacheInfo(hits, misses, evictions, maxsize, currsize)."""
+        return CacheInfo(self.hits, self.misses, self.evictions, self.maxsize, len(self._store))
+
+    def clear(self):
+        """Drops every entry and resets the statistics."""
+        self._store.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._store)
+
+# ---------- H) scrutinio in diretta: sezioni in streaming ----------
+PROVINCIAL_RESULTS_COLUMNS = ["province", "list", "coalition", "votes", "int_seats", "rest", "rest_pct",
+                              "regional_rest_rank", "final_seats"]
+
+def _provincial_results(final):
+    # tabella provincial_results.csv: colonne obbligatorie presenti, ordine provincia, seggi desc, voti desc
+    out = final.copy()
+    for col in PROVINCIAL_RESULTS_COLUMNS:
+        if col not in out.columns:
+            out[col] = {"rest":0, "rest_pct":0.0, "regional_rest_rank":0, "int_seats":0}.get(col, "")
+    return out.sort_values(["province", "final_seats", "votes"], ascending=[True, False, False])
+
+@dataclass(frozen=True)
+class LiveSnapshot:
+    """
+    Allocation snapshot emitted by LiveCount.
+    Attributes:
+        records (int): records ingested so far
+        sections (int): distinct sections seen so far
+        provincial_results (pd.DataFrame): same schema as provincial_results.csv
+        coalition_seats (pd.DataFrame): same schema as coalition_seats.csv
+        runnerup_reserved (pd.DataFrame): same schema as runnerup_reserved.csv
+        allocation (Allocation): array result
+        recomputed (dict): stages recomputed for this snapshot (see IncrementalAllocation)
+    """
+    records: int
+    sections: int
+    provincial_results: pd.DataFrame
+    coalition_seats: pd.DataFrame
+    runnerup_reserved: pd.DataFrame
+    allocation: Allocation
+    recomputed: dict
+
+class LiveCount:
+    """
+    Streaming ingestion of section-level (sezione) results into province x list totals, with seat
+    projections at a configurable cadence. Each record updates one cell of the vote matrix in O(1);
+    a record for a (section, province, list) already seen replaces its previous value (corrections and
+    replays), a record without section is added. To tell corrections apart, the last value of every
+    (section, province, list) and the set of section ids are kept next to the province x list matrix, so
+    memory grows with the sections reported. Snapshots reuse IncrementalAllocation, so only the provinces
+    that changed since the previous snapshot are recomputed.
+    Args:
+        model (ElectionModel): structure and parameters (its votes are not used: the count starts at zero)
+        every (int): emit a snapshot every `every` records (None = no record cadence)
+        interval (float): emit a snapshot when `interval` seconds have passed since the last one (None = no time cadence)
+    Records are mappings with keys 'province', 'list', 'votes' and optional 'section', or tuples
+    (section, province, list, votes).
+    """
+    def __init__(self, model, every=1000, interval=None):
+        d = model.data
+        self.model = model
+        self.every, self.interval = every, interval
+        self._prov = {p:i for i, p in enumerate(d.provinces)}
+        self._list = {l:i for i, l in enumerate(d.lists)}
+        self._V = np.zeros(d.votes.shape)
+        self._seen = {}
+        self._sections = set()
+        self._dirty = set()
+        self.records = 0
+        self._since = 0
+        self._last = time.monotonic()
+        self._inc = IncrementalAllocation(model, self._V)
+
+    def add(self, record):
+        """Ingests one record; returns a LiveSnapshot if the cadence is reached, else None."""
+        if isinstance(record, tuple):
+            section, province, lst, votes = record
+        else:
+            section, province, lst, votes = record.get("section"), record["province"], record["list"], record["votes"]
+        try:
+            p, l = self._prov[province], self._list[lst]
+        except KeyError as e:
+            raise ValueError(f"unknown province or list: {e.args[0]}") from None
+        if not self.model.data.present[p, l]:
+            raise ValueError(f"list {lst} is not on the ballot in {province}")
+        if isinstance(votes, str):
+            votes = votes.strip().replace(",", "")
+        votes = float(votes)
+        if section is None:
+            self._V[p, l] += votes
+        else:
+            key = (section, p, l)
+            self._V[p, l] += votes - self._seen.get(key, 0.0)
+            self._seen[key] = votes
+            self._sections.add(section)
+        self._dirty.add(p)
+        self.records += 1
+        self._since += 1
+        if (self.every and self._since >= self.every) or \
+           (self.interval is not None and time.monotonic() - self._last >= self.interval):
+            return self.snapshot()
+        return None
+
+    def snapshot(self):
+        """Allocation on the current totals (only provinces changed since the last snapshot are recomputed)."""
+        d = self.model.data
+        alloc = self._inc.update({d.provinces[p]:self._V[p] for p in sorted(self._dirty)})
+        self._dirty.clear()
+        self._since = 0
+        self._last = time.monotonic()
+        final, coal_seats, _, removed = alloc.to_frames()
+        return LiveSnapshot(self.records, len(self._sections), _provincial_results(final), coal_seats,
+                            pd.DataFrame([removed or {}]), alloc, dict(self._inc.recomputed))
+
+    def ingest(self, records):
+        """Consumes an iterable of records, yielding a LiveSnapshot at each cadence point and one at the end."""
+        for rec in records:
+            snap = self.add(rec)
+            if snap is not None:
+                yield snap
+        if self._since:
+            yield self.snapshot()
+
+    async def aingest(self, records):
+        """Async version of ingest() for an async iterable of records."""
+        async for rec in records:
+            snap = self.add(rec)
+            if snap is not None:
+                yield snap
+        if self._since:
+            yield self.snapshot()
+
+# ---------- I) punti di svolta: voti minimi che fanno cambiare un seggio ----------
+def tipping_points(model, votes=None, top=None):
+    """
+    Seat tipping-point analysis: for every seat in provincial_results, the smallest number of votes that,
+    moved away from the list holding it, makes it lose that seat. Candidate moves are
+    (a) to every other list on the ballot in the same province and (b) to the same list in every other
+    province. All moves are solved together by integer bisection on the batched engine (one batch of
+    scenarios per bisection step), so the shift can act through any stage: the coalition D'Hondt
+    margins and the pct19/pct18 bonus, the group quota of stage B, the provincial quota or the
+    rest_pct ranking. The stage is read off the flipped allocation. The bisection returns the boundary
+    between a shift that keeps the seat and one that loses it; where the allocation is not monotone in
+    the shift it is an upper bound of the minimum, and every reported shift is verified.
+    Args:
+        model (ElectionModel): structure and parameters
+        votes (array-like): votes to analyse, as in ElectionModel.allocate (None = the model's votes)
+        top (int): keep only the `top` most fragile seats
+    Returns:
+        pd.DataFrame: one row per province x list with seats, ranked by votes_to_flip (most fragile first):
+        province, list, coalition, final_seats, votes, votes_to_flip, pct_of_votes, to_province, to_list,
+        stage ('coalitions', 'bonus', 'group_seats', 'provincial_integers' or 'residuals'),
+        gained_province, gained_list (the entry that takes the seat)
+    """
+    d = model.data
+    V = d.votes.astype(float) if votes is None else model.votes_matrix(votes)
+    base = _allocate_batch(d, V[None], **model.params)
+    seats = base["seats"][0]
+    P, L = seats.shape
+
+    # mosse candidate: (provincia, lista) sorgente con seggi -> altra lista stessa provincia / stessa lista altra provincia
+    sp, sl = np.nonzero(seats > 0)
+    src, dst = [], []
+    for c, (p, l) in enumerate(zip(sp, sl)):
+        for b in np.flatnonzero(d.present[p]):
+            if b != l:
+                src.append(c); dst.append(p*L + b)
+        for q in np.flatnonzero(d.present[:, l]):
+            if q != p:
+                src.append(c); dst.append(q*L + l)
+    src, dst = np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64)
+    fp, fl = sp[src], sl[src]
+    dp, dl = np.divmod(dst, L)
+
+    def run(idx, k):
+        # scenari: k voti spostati dalla sorgente alla destinazione della mossa idx
+        X = np.repeat(V[None], len(idx), axis=0)
+        r = np.arange(len(idx))
+        X[r, fp[idx], fl[idx]] -= k
+        X[r, dp[idx], dl[idx]] += k
+        res = _allocate_batch(d, X, **model.params)
+        return res, res["seats"][r, fp[idx], fl[idx]] < seats[fp[idx], fl[idx]]
+
+    # bisezione intera su tutte le mosse insieme: lo mantiene il seggio, hi lo fa perdere
+    lo = np.zeros(len(src), dtype=np.int64)
+    hi = V[fp, fl].astype(np.int64)
+    ok = np.zeros(len(src), dtype=bool)
+    if len(src):
+        _, ok = run(np.arange(len(src)), hi)
+    live = np.flatnonzero(ok & (hi - lo > 1))
+    while len(live):
+        mid = (lo[live] + hi[live]) // 2
+        _, flip = run(live, mid)
+        hi[live[flip]] = mid[flip]
+        lo[live[~flip]] = mid[~flip]
+        live = live[hi[live] - lo[live] > 1]
+
+    # mossa migliore per seggio (a parità la prima), poi lettura dello stadio sull'allocazione spostata
+    k = np.where(ok, hi, np.iinfo(np.int64).max)
+    best = np.full(len(sp), -1)
+    for c in range(len(sp)):
+        m = np.flatnonzero((src == c) & ok)
+        if len(m):
+            best[c] = m[np.argmin(k[m])]
+    has = np.flatnonzero(best >= 0)
+    stage = np.array([""]*len(sp), dtype=object)
+    gp, gl = np.full(len(sp), -1), np.full(len(sp), -1)
+    if len(has):
+        b = best[has]
+        res, _ = run(b, k[b])
+        for i, c in enumerate(has):
+            if res["bonus"][i] != base["bonus"][0] or res["leader"][i] != base["leader"][0]:
+                stage[c] = "bonus"
+            elif (res["coalition_seats"][i] != base["coalition_seats"][0]).any():
+                stage[c] = "coalitions"
+            elif (res["group_seats"][i] != base["group_seats"][0]).any():
+                stage[c] = "group_seats"
+            elif res["int_seats"][i, sp[c], sl[c]] != base["int_seats"][0, sp[c], sl[c]]:
+                stage[c] = "provincial_integers"
+            else:
+                stage[c] = "residuals"
+            gain = np.argwhere(res["seats"][i] > seats)
+            if len(gain):
+                gp[c], gl[c] = gain[0]
+
+    provs = np.array(d.provinces + ("",), dtype=object)
+    lists = np.array(d.lists + ("",), dtype=object)
+    found = best >= 0
+    bb = np.maximum(best, 0)
+    out = pd.DataFrame({"province":provs[sp], "list":lists[sl],
+                        "coalition":np.array(d.coalitions, dtype=object)[d.list_coalition[sl]],
+                        "final_seats":seats[sp, sl], "votes":V[sp, sl],
+                        "votes_to_flip":pd.Series(k[bb], dtype="Int64").mask(~found),
+                        "to_province":np.where(found, provs[dp[bb]], None),
+                        "to_list":np.where(found, lists[dl[bb]], None),
+                        "stage":np.where(found, stage, None),
+                        "gained_province":np.where(gp >= 0, provs[gp], None),
+                        "gained_list":np.where(gl >= 0, lists[gl], None)})
+    out.insert(6, "pct_of_votes", 100 * out["votes_to_flip"].astype(float) / out["votes"].where(out["votes"] > 0))
+    out = out.sort_values(["votes_to_flip", "province", "list"], na_position="last", kind="stable").reset_index(drop=True)
+    return out.head(top) if top else out
+
+# ---------- J) sweep di parametri su un pool di processi ----------
+SWEEP_PARAMS = tuple(DEFAULT_PARAMS)
+_SWEEP = {}  # stato del processo worker: struttura e voti in memoria condivisa
+
+def _sweep_init(data, shm_name, shape):
+    # aggancia i voti condivisi senza copiarli
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=shm_name)
+    votes = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    votes.setflags(write=False)
+    _SWEEP.update(data=data, shm=shm, votes=votes)
+
+def _sweep_task(task):
+    # un blocco di punti della griglia con la stessa ripartizione provinciale, su tutti gli scenari di voto
+    province_seats, params = task
+    data, V = _SWEEP["data"], _SWEEP["votes"]
+    S, G = len(V), len(params["pct19"])
+    X = np.broadcast_to(V[:, None], (S, G) + V.shape[1:]).reshape((S*G,) + V.shape[1:])
+    rep = {k:np.tile(v, S) for k, v in params.items()}
+    res = _allocate_batch(data, X, province_seats=province_seats, **rep)
+    pi, li = data.cells
+    return res["seats"][:, pi, li].astype(np.int32)  # righe: scenario, poi punto
+
+def sweep(model, grid, votes=None, jobs=None, chunk_size=2000):
+    """
+    Parameter sweep for electoral-law variants: runs the allocation for every parameter set of a grid
+    across a process pool. The vote data go once into shared memory and are read zero-copy by the workers;
+    grid points sharing the same seats per province are evaluated together on the batched engine.
+    Args:
+        model (ElectionModel): structure; its parameters are the defaults of every grid point
+        grid (list of dict or pd.DataFrame): parameter sets with any of the keys total_list_seats, pct19, pct18,
+            seats19, seats18, coal_threshold, list_threshold and province_seats
+            ({province: seats} or one value per province in alphabetical order)
+        votes (array-like): (provinces, lists) matrix or (scenarios, provinces, lists) array of votes;
+            None = the model's votes
+        jobs (int): worker processes (None = all cores, 1 = in this process)
+        chunk_size (int): allocations per task (grid points x vote scenarios)
+    Returns:
+        pd.DataFrame: tidy table, one row per grid point, vote scenario and province x list entry:
+        point, (scenario,) the parameters given in the grid, province, list, coalition, seats.
+        Seats per coalition, list or province are group sums of this table.
+    """
+    d = model.data
+    points = pd.DataFrame(grid).reset_index(drop=True)
+    unknown = set(points.columns) - set(SWEEP_PARAMS) - {"province_seats"}
+    if unknown:
+        raise ValueError(f"unknown sweep parameters: {sorted(unknown)}")
+    params = {k:(points[k].astype(float).fillna(v).to_numpy() if k in points else np.full(len(points), float(v)))
+              for k, v in model.params.items()}
+    for k in ("total_list_seats", "seats19", "seats18"):
+        params[k] = params[k].astype(np.int64)
+
+    def split(ps):
+        if ps is None or (isinstance(ps, float) and np.isnan(ps)):
+            return tuple(d.province_seats.tolist())
+        if isinstance(ps, dict):
+            missing = set(d.provinces) - set(ps)
+            if missing:
+                raise ValueError(f"no seats for provinces: {sorted(missing)}")
+            return tuple(int(ps[p]) for p in d.provinces)
+        if len(ps) != len(d.provinces):
+            raise ValueError(f"expected {len(d.provinces)} province seats, got {len(ps)}")
+        return tuple(int(x) for x in ps)
+    splits = [split(ps) for ps in points["province_seats"]] if "province_seats" in points else \
+             [tuple(d.province_seats.tolist())]*len(points)
+
+    V = d.votes.astype(np.float64)[None] if votes is None else np.asarray(votes, dtype=np.float64)
+    if V.ndim == 2:
+        V = V[None]
+    if V.shape[1:] != d.votes.shape:
+        raise ValueError(f"expected votes of shape (scenarios,) + {d.votes.shape}, got {V.shape}")
+    S = len(V)
+
+    # blocchi di punti con la stessa ripartizione provinciale; almeno ~4 blocchi per worker
+    workers = jobs or os.cpu_count() or 1
+    tasks, index = [], []
+    per_task = max(1, min(chunk_size // S, -(-len(points) // (4 * workers))))
+    groups = pd.Series(range(len(points))).groupby(pd.Series(splits, dtype=object), sort=False)
+    for ps, idx in groups:
+        idx = idx.to_numpy()
+        for lo in range(0, len(idx), per_task):
+            chunk = idx[lo:lo + per_task]
+            tasks.append((np.array(ps, dtype=np.int64), {k:v[chunk] for k, v in params.items()}))
+            index.append(chunk)
+
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(create=True, size=max(V.nbytes, 1))
+    try:
+        np.ndarray(V.shape, dtype=np.float64, buffer=shm.buf)[:] = V
+        if jobs == 1:
+            _sweep_init(d, shm.name, V.shape)
+            try:
+                results = [_sweep_task(t) for t in tasks]
+            finally:
+                _SWEEP.pop("votes", None)
+                _SWEEP.pop("shm").close()
+        else:
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_sweep_init,
+                                     initargs=(d, shm.name, V.shape)) as ex:
+                results = list(ex.map(_sweep_task, tasks))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # tabella ordinata: punto, scenario, righe di input
+    pi, li = d.cells
+    R = len(pi)
+    seats = np.empty((len(points), S, R), dtype=np.int32)
+    for chunk, res in zip(index, results):
+        seats[chunk] = res.reshape(S, len(chunk), R).transpose(1, 0, 2)
+    n = len(points) * S
+    out = {"point":np.repeat(np.arange(len(points)), S*R)}
+    if S > 1:
+        out["scenario"] = np.tile(np.repeat(np.arange(S), R), len(points))
+    for k in points.columns:
+        col = params[k] if k != "province_seats" else np.array(splits + [()], dtype=object)[:-1]
+        out[k] = np.repeat(col, S*R)
+    out["province"] = np.tile(np.array(d.provinces, dtype=object)[pi], n)
+    out["list"] = np.tile(np.array(d.lists, dtype=object)[li], n)
+    out["coalition"] = np.tile(np.array(d.coalitions, dtype=object)[d.list_coalition[li]], n)
+    out["seats"] = seats.ravel()
+    return pd.DataFrame(out)
+
+# ---------- K) report in memoria: riepiloghi calcolati una volta, piu' formati ----------
+REPORT_FILES = {"markdown":"province_seat_report.md", "heatmap":"province_seat_heatmap.md",
+                "pdf":"ripartizioneSeggi_finale.pdf"}
+
+def _vote_recap(votes_df, key):
+    # voti e percentuali per chiave, in ordine di voti decrescenti
+    agg = votes_df.groupby(key)["votes"].sum().reset_index().sort_values("votes", ascending=False)
+    total = agg["votes"].sum()
+    pct = 100 * agg["votes"] / total if total > 0 else agg["votes"] * 0.0
+    return pd.DataFrame({key:agg[key].to_numpy(), "votes":agg["votes"].astype(np.int64).to_numpy(),
+                         "pct":pct.to_numpy()})
+
+@dataclass(frozen=True)
+class ReportData:
+    """
+    Recap tables of one allocation, computed once and shared by the Markdown, heatmap and PDF renderers.
+    Build it with build_report() or ReportData.from_allocation().
+    Attributes:
+        coalition_votes (pd.DataFrame or None): ['coalition', 'votes', 'pct'], votes descending
+        coalition_seats (pd.DataFrame or None): ['coalition', 'seats']
+        group_seats (pd.DataFrame or None): ['list', 'coalition', 'group_seats']
+        president_votes, list_votes (pd.DataFrame or None): ['president'|'list', 'votes', 'pct'] (only with a 'president' column)
+        provinces (pd.DataFrame): ['province', 'seats', 'admitted_votes', 'q_circ']
+        results (pd.DataFrame): provincial_results.csv schema plus 'rest_abs' and 'votes_per_seat'
+        heatmap (pd.DataFrame): final seats, one row per province and one column per list
+    """
+    coalition_votes: pd.DataFrame
+    coalition_seats: pd.DataFrame
+    group_seats: pd.DataFrame
+    president_votes: pd.DataFrame
+    list_votes: pd.DataFrame
+    provinces: pd.DataFrame
+    results: pd.DataFrame
+    heatmap: pd.DataFrame
+
+    @classmethod
+    def from_allocation(cls, alloc):
+        """
+        Report of an ElectionModel.allocate() result, with votes and seats taken from its ElectionData.
+        """
+        final, coal_seats, grp_seats, _ = alloc.to_frames()
+        d = alloc.data
+        seats = pd.DataFrame({"province":list(d.provinces), "seats":d.province_seats})
+        return build_report(final, coal_seats, grp_seats, d.cells_frame(), seats)
+
+def build_report(final, coal_seats=None, grp_seats=None, votes_df=None, province_seats_df=None):
+    """
+    Computes the recap tables of an allocation once, straight from the in-memory output of run_allocation
+    (no CSV round-trip). The provincial quota uses the votes of the coalitions present in final, i.e. the
+    admitted ones.
+    Args:
+        final (pd.DataFrame): first output of run_allocation (or a provincial_results table)
+        coal_seats, grp_seats (pd.DataFrame): coalition and group seats (tables omitted if None)
+        votes_df (pd.DataFrame): cleaned votes, for the coalition/president/list recaps (omitted if None)
+        province_seats_df (pd.DataFrame): columns ['province', 'seats'] (default: the 'seats' column of final)
+    Returns:
+        ReportData
+    """
+    results = _provincial_results(final).reset_index(drop=True)
+    coal_votes = pres_votes = list_votes = None
+    if votes_df is not None and "coalition" in votes_df.columns:
+        coal_votes = _vote_recap(votes_df, "coalition")
+    # nessuna coalizione ammessa: run_allocation restituisce tabelle senza colonne
+    if coal_votes is None or coal_seats is None or "coalition" not in coal_seats.columns:
+        coal_seats = None
+    if coal_votes is None or grp_seats is None or "list" not in grp_seats.columns:
+        grp_seats = None
+    if votes_df is not None and "president" in votes_df.columns:
+        pres_votes, list_votes = _vote_recap(votes_df, "president"), _vote_recap(votes_df, "list")
+
+    if province_seats_df is None:
+        province_seats_df = results[["province", "seats"]] if "seats" in results.columns else \
+                            pd.DataFrame({"province":[], "seats":[]})
+    seats = province_seats_df.drop_duplicates("province").set_index("province")["seats"]
+    names = votes_df["province"] if votes_df is not None else results["province"]
+    names = [p for p in sorted(names.unique()) if p in seats.index]
+    prov_seats = seats.reindex(names).astype(np.int64).to_numpy()
+    admitted = results.groupby("province")["votes"].sum().reindex(names, fill_value=0.0).to_numpy(dtype=float)
+    q_circ = np.where(prov_seats > 0, admitted // (prov_seats + 1), 0.0)
+    provinces = pd.DataFrame({"province":names, "seats":prov_seats, "admitted_votes":admitted, "q_circ":q_circ})
+
+    q = results["province"].map(dict(zip(names, q_circ))).fillna(0.0).to_numpy()
+    v, fs = results["votes"].to_numpy(dtype=float), results["final_seats"].to_numpy(dtype=float)
+    results["rest_abs"] = np.where(q > 0, np.trunc(v - results["int_seats"].to_numpy(dtype=float) * q), 0).astype(np.int64)
+    results["votes_per_seat"] = np.divide(v, fs, out=np.zeros(len(v)), where=fs > 0)
+    heatmap = results.pivot_table(index="province", columns="list", values="final_seats", fill_value=0)\
+                     .reset_index() if len(results) else pd.DataFrame({"province":[]})
+    return ReportData(coal_votes, coal_seats, grp_seats, pres_votes, list_votes, provinces, results, heatmap)
+
+def _md_rows(df, columns, fmt):
+    return [fmt.format(*row) for row in zip(*(df[c].tolist() for c in columns))]
+
+def render_markdown(report):
+    """
+    Province seat report (quota, elected lists, votes per seat, remainders) as a Markdown string.
+    """
+    md = ["# Provincial Seat Allocation Report\n\n"]
+    if report.coalition_votes is not None:
+        md.append("## Ripartizione seggi tra coalizioni (regionale)\n\n| Coalizione | Voti | % |\n|---|---|---|\n")
+        md += _md_rows(report.coalition_votes, ["coalition", "votes", "pct"], "| {} | {} | {:.2f}% |\n")
+        if report.coalition_seats is not None:
+            md.append("\n| Coalizione | Seggi assegnati |\n|---|---|\n")
+            md += _md_rows(report.coalition_seats, ["coalition", "seats"], "| {} | {} |\n")
+        if report.group_seats is not None:
+            md.append("\n## Ripartizione seggi tra liste (regionale)\n\n"
+                      "| Lista | Coalizione | Seggi assegnati |\n|---|---|---|\n")
+            md += _md_rows(report.group_seats, ["list", "coalition", "group_seats"], "| {} | {} | {} |\n")
+    if report.president_votes is not None:
+        md.append("## Riepilogo percentuali Presidenti\n\n| Presidente | Voti | % |\n|---|---|---|\n")
+        md += _md_rows(report.president_votes, ["president", "votes", "pct"], "| {} | {} | {:.2f}% |\n")
+        md.append("\n## Riepilogo voti e percentuali per lista/partito\n\n| Lista/Partito | Voti | % |\n|---|---|---|\n")
+        md += _md_rows(report.list_votes, ["list", "votes", "pct"], "| {} | {} | {:.2f}% |\n")
+        md.append("\n")
+    elected = report.results[report.results["final_seats"] > 0]
+    rows = elected.groupby("province", sort=False).indices
+    cols = ["list", "final_seats", "votes_per_seat", "votes", "rest_abs", "rest_pct", "regional_rest_rank"]
+    for province, seats, admitted, q_circ in zip(*(report.provinces[c].tolist() for c in report.provinces.columns)):
+        md.append(f"## {province}\n**Quota (votes per seat):** {q_circ} = {admitted} voti / ({seats} + 1)\n\n")
+        if province in rows:
+            md.append("| Party/List | Seats | Votes per Seat | Total Votes | Resto assoluto | Resto % | Rank regionale resti % |\n"
+                      "|---|---|---|---|---|---|---|\n")
+            md += _md_rows(elected.iloc[rows[province]], cols,
+                           "| {} | {} | {:.2f} | {} | {} | {:.2f}% | {} |\n")
+        else:
+            md.append("No seats elected in this province.\n")
+        md.append("\n")
+    return "".join(md)
+
+def render_heatmap(report):
+    """
+    Markdown heatmap-style table of the final seats by province and list.
+    """
+    return "# Provincial Distribution of Seats (Heatmap)\n\n" + report.heatmap.to_markdown(index=False)
+
+@functools.lru_cache(maxsize=None)
+def _reportlab():
+    # reportlab caricato al primo PDF: il motore si importa senza le dipendenze dei report
+    try:
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+    except ImportError as e:
+        raise ImportError("PDF reports need reportlab (pip install reportlab)") from e
+    return SimpleNamespace(colors=colors, A4=A4, getSampleStyleSheet=getSampleStyleSheet, Paragraph=Paragraph,
+                           SimpleDocTemplate=SimpleDocTemplate, Spacer=Spacer, Table=Table, TableStyle=TableStyle)
+
+def _pdf_table(data):
+    # stile comune a tutte le tabelle del PDF
+    rl = _reportlab()
+    colors = rl.colors
+    table = rl.Table(data, repeatRows=1)
+    table.setStyle(rl.TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.black),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0,0), (-1,0), 8),
+    ]))
+    return table
+
+def _pdf_recap(df, key, header):
+    return _pdf_table([header] + [[k, v, f"{p:.2f}%"] for k, v, p in zip(df[key].tolist(), df["votes"].tolist(),
+                                                                         df["pct"].tolist())])
+
+def render_pdf(report, output_path="ripartizioneSeggi_finale.pdf"):
+    """
+    Writes the PDF report with the same structure as RipartizioneSeggi finale.pdf: regional recaps, then
+    per province the quota with its formula and the table of integer seats, remainders and final seats.
+    reportlab is imported on the first call (ImportError if it is not installed).
+    """
+    rl = _reportlab()
+    Paragraph, Spacer = rl.Paragraph, rl.Spacer
+    doc = rl.SimpleDocTemplate(output_path, pagesize=rl.A4)
+    styles = rl.getSampleStyleSheet()
+    elements = []
+    if report.coalition_votes is not None:
+        elements.append(Paragraph("<b>Ripartizione seggi tra coalizioni (regionale)</b>", styles['Heading1']))
+        elements += [_pdf_recap(report.coalition_votes, "coalition", ["Coalizione", "Voti", "%"]), Spacer(1, 18)]
+        if report.coalition_seats is not None:
+            cs = report.coalition_seats
+            data = [["Coalizione", "Seggi assegnati"]] + [list(r) for r in zip(cs["coalition"].tolist(),
+                                                                                 cs["seats"].tolist())]
+            elements += [_pdf_table(data), Spacer(1, 18)]
+        if report.group_seats is not None:
+            gs = report.group_seats
+            data = [["Lista", "Coalizione", "Seggi assegnati"]] + \
+                   [list(r) for r in zip(gs["list"].tolist(), gs["coalition"].tolist(), gs["group_seats"].tolist())]
+            elements += [_pdf_table(data), Spacer(1, 18)]
+    if report.president_votes is not None:
+        elements.append(Paragraph("<b>Riepilogo percentuali Presidenti</b>", styles['Heading1']))
+        elements += [_pdf_recap(report.president_votes, "president", ["Presidente", "Voti", "%"]), Spacer(1, 18)]
+        elements.append(Paragraph("<b>Riepilogo voti e percentuali per lista/partito</b>", styles['Heading1']))
+        elements += [_pdf_recap(report.list_votes, "list", ["Partito/Lista", "Voti", "%"]), Spacer(1, 18)]
+
+    prov = report.provinces.set_index("province")
+    res = report.results
+    cols = ["list", "votes", "int_seats", "rest_abs", "rest_pct", "regional_rest_rank", "final_seats"]
+    for province, idx in res.groupby("province", sort=False).indices.items():
+        elements.append(Paragraph(f"<b>Provincia di {province}</b>", styles['Heading2']))
+        if province in prov.index:
+            p = prov.loc[province]
+            elements.append(Paragraph(f"Quoziente provinciale: <b>{p['q_circ']}</b> = {p['admitted_votes']} voti "
+                                      f"/ ({int(p['seats'])} + 1)", styles['Normal']))
+        else:
+            elements.append(Paragraph("Province not found in seats data.", styles['Normal']))
+        elements.append(Spacer(1, 6))
+        data = [["Lista", "Voti", "Seggi Interi", "Resto assoluto", "Resto %", "Rank regionale resti %", "Seggi Finali"]]
+        for name, votes, int_seats, rest_abs, rest_pct, rank, final_seats in \
+                zip(*(res[c].iloc[idx].tolist() for c in cols)):
+            data.append([name, int(votes), int_seats, rest_abs, f"{rest_pct:.2f}%", rank, final_seats])
+        elements += [_pdf_table(data), Spacer(1, 12)]
+    doc.build(elements)
+
+_RENDERERS = {"markdown":render_markdown, "heatmap":render_heatmap}
+
+def write_report(report, output_dir=".", formats=tuple(REPORT_FILES), prefix=""):
+    """
+    Writes the requested formats of one report.
+    Args:
+        report (ReportData or Allocation): report data (an Allocation is converted once)
+        output_dir (str): destination directory (created if missing)
+        formats (iterable): any of 'markdown', 'heatmap', 'pdf'
+        prefix (str): prepended to the file names of REPORT_FILES
+    Returns:
+        dict: format -> path of the written file
+    """
+    if isinstance(report, Allocation):
+        report = ReportData.from_allocation(report)
+    unknown = set(formats) - set(REPORT_FILES)
+    if unknown:
+        raise ValueError(f"unknown report formats: {sorted(unknown)}")
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    for fmt in formats:
+        path = os.path.join(output_dir, prefix + REPORT_FILES[fmt])
+        if fmt == "pdf":
+            render_pdf(report, path)
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(_RENDERERS[fmt](report))
+        paths[fmt] = path
+    return paths
+
+def render_reports(reports, output_dir=".", formats=tuple(REPORT_FILES)):
+    """
+    Renders many scenarios in one call, each from its in-memory result (no intermediate CSVs).
+    Args:
+        reports (dict or iterable): name -> ReportData/Allocation, or a sequence (named scenario_0, scenario_1, ...)
+        output_dir (str): destination directory; files are named '<name>_<REPORT_FILES entry>'
+        formats (iterable): any of 'markdown', 'heatmap', 'pdf'
+    Returns:
+        dict: name -> {format: path}
+    """
+    if not isinstance(reports, dict):
+        reports = {f"scenario_{i}":r for i, r in enumerate(reports)}
+    return {name:write_report(r, output_dir, formats, prefix=f"{name}_") for name, r in reports.items()}
+
+# ---------- L) servizio locale HTTP/JSON: modello caldo, richieste raggruppate in blocchi ----------
+_SERVICE_DATA = None
+_HTTP_STATUS = {200:"OK", 400:"Bad Request", 404:"Not Found", 405:"Method Not Allowed", 500:"Internal Server Error"}
+
+def _service_rows(d):
+    # parte fissa dei record di ogni cella presente, nell'ordine delle colonne di provincial_results.csv
+    pi, li = d.cells
+    frame = d.cells_frame().drop(columns="votes")
+    return [json.dumps(r, separators=(",", ":"))[:-1] + ',"votes":' for r in frame.to_dict("records")], pi, li
+
+def _service_init(data):
+    # struttura calda di ogni worker (come _sweep_init), con la parte fissa dei record già composta
+    global _SERVICE_DATA
+    _SERVICE_DATA = (data, _service_rows(data))
+
+def _service_task(data, params, votes):
+    # stadi A–E sul blocco di richieste con il motore vettoriale; le risposte JSON si compongono dagli array
+    # del blocco, con le stesse righe, colonne e ordinamenti delle tabelle di run_allocation
+    d, (prefix, pi, li) = _SERVICE_DATA if data is None else (data, _service_rows(data))
+    res = _allocate_batch(d, votes, **params)
+    _, pos = _group_seats_arrays(votes.sum(axis=1), d.list_coalition, res["coalition_seats"], res["admitted"])
+    lc, seats = d.list_coalition, d.province_seats
+    lists = [json.dumps(l) for l in d.lists]
+    coals = [json.dumps(c) for c in d.coalitions]
+    out = []
+    for i in range(len(votes)):
+        admitted = res["admitted"][i]
+        adm = np.flatnonzero(admitted)
+        if not len(adm):
+            out.append('{"provincial_results":[],"coalition_seats":[],"group_seats":[],"runnerup_reserved":{}}')
+            continue
+        order = np.r_[res["leader"][i], adm[adm!=res["leader"][i]]] if res["bonus"][i] else adm
+        cs = res["coalition_seats"][i]
+        coal_rows = ['{"coalition":%s,"seats":%d}' % (coals[c], cs[c]) for c in order]
+        rank_c = np.empty(len(coals), dtype=np.int64)
+        rank_c[order] = np.arange(len(order))
+        keep = np.flatnonzero(admitted[lc])
+        keep = keep[np.lexsort((pos[i, keep], rank_c[lc[keep]]))]
+        group_rows = ['{"list":%s,"coalition":%s,"group_seats":%d}' % (lists[l], coals[lc[l]], res["group_seats"][i, l])
+                      for l in keep]
+
+        # provincial_results: righe delle coalizioni ammesse, ordine provincia, seggi desc, voti desc
+        cell = np.flatnonzero(admitted[lc[li]])
+        p, l = pi[cell], li[cell]
+        v, final = votes[i, p, l], res["seats"][i, p, l]
+        (ints,), (rest_pct,), (q_circ,), (prov_total,) = provincial_integers_batch(v, p, seats)
+        rank, rest = _rest_columns(rest_pct, v, ints, q_circ[p])
+        rows = []
+        for k in np.lexsort((-v, -final, p)).tolist():
+            rows.append('%s%r,"seats":%d,"q_circ":%d,"prov_total":%r,"int_seats":%d,"rest_pct":%r,'
+                        '"regional_rest_rank":%d,"rest":%r,"final_seats":%d}' % (
+                            prefix[cell[k]], float(v[k]), seats[p[k]], q_circ[p[k]], float(prov_total[p[k]]),
+                            ints[k], float(rest_pct[k]), rank[k], float(rest[k]), final[k]))
+
+        # record vuoto come la tabella runnerup_reserved.csv quando reserve_runner_up non restituisce nulla
+        removed = _runner_up_removed(res["runner_up"][i], res["seats"][i][:, lc==res["second"][i]].sum()) or {}
+        out.append('{"provincial_results":[%s],"coalition_seats":[%s],"group_seats":[%s],"runnerup_reserved":%s}' % (
+            ",".join(rows), ",".join(coal_rows), ",".join(group_rows), json.dumps(removed, separators=(",", ":"))))
+    return out
+
+def _http_response(status, body, keep_alive):
+    body = body.encode()
+    head = (f"HTTP/1.1 {status} {_HTTP_STATUS[status]}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+class AllocationService:
+    """
+    Local HTTP/JSON allocation service on asyncio. Structure, seats per province and parameters are loaded
+    once; concurrent requests are queued and coalesced into one batched-engine call per structure and
+    parameter set, run on a worker pool while the event loop keeps accepting requests.
+    Endpoints:
+        POST /allocate: {"votes": ..., "params": {...}} -> {"provincial_results", "coalition_seats",
+            "group_seats", "runnerup_reserved"} (the tables of python ERM.py as JSON records)
+        POST /allocate/batch: {"scenarios": [request, ...]} -> {"results": [response, ...]}
+        GET /health: request and batch counters
+    "votes" is either a list of records ['province', 'list', 'coalition', ('president',) 'votes'], as the
+    votes CSV, or {province: {list: votes}} on the structure of the service model. "params" optionally
+    overrides run_allocation parameters for that request.
+    Args:
+        model (ElectionModel): warm model (structure, seats per province and default parameters)
+        jobs (int): worker processes (0 = one worker thread in this process)
+        max_batch (int): requests coalesced into one engine call
+        max_wait (float): seconds the first request of a batch waits for others to join
+    """
+    def __init__(self, model, jobs=0, max_batch=256, max_wait=0.002):
+        self.model = model
+        self.jobs, self.max_batch, self.max_wait = jobs, max_batch, max_wait
+        self._seats_df = pd.DataFrame({"province":list(model.data.provinces), "seats":model.data.province_seats})
+        self._warm = _structure_digest(model.data)
+        self._codes = ({p:i for i, p in enumerate(model.data.provinces)}, {l:j for j, l in enumerate(model.data.lists)})
+        self.requests = self.batches = self.errors = 0
+        self._queue = self._batcher = self._pool = None
+
+    @classmethod
+    def from_csv(cls, votes_path="votes_marche_2025_all_provinces.csv", seats_path="seats_per_province.csv",
+                 params_path="params.csv", **kw):
+        """Service on the model of the three input CSV files (see ElectionModel.from_csv)."""
+        return cls(ElectionModel.from_csv(votes_path, seats_path, params_path), **kw)
+
+    def parse(self, request):
+        """
+        Validates one request.
+        Returns:
+            tuple: (group key, ElectionData or None for the service model, params, (provinces, lists) votes)
+        Raises:
+            ValueError: malformed votes, unknown labels or parameters
+        """
+        if not isinstance(request, dict) or "votes" not in request:
+            raise ValueError("request must be a JSON object with 'votes'")
+        params = dict(self.model.params)
+        extra = request.get("params") or {}
+        unknown = set(extra) - set(DEFAULT_PARAMS)
+        if unknown:
+            raise ValueError(f"unknown params: {sorted(unknown)}")
+        params.update({k:float(v) if isinstance(v, float) else int(v) for k, v in extra.items()})
+        votes, data = request["votes"], None
+        if isinstance(votes, dict):
+            present, (prov_code, list_code) = self.model.data.present, self._codes
+            V = np.zeros(present.shape)
+            for prov, row in votes.items():
+                i = prov_code.get(prov)
+                if i is None:
+                    raise ValueError(f"unknown province: {prov}")
+                for name, v in row.items():
+                    j = list_code.get(name)
+                    if j is None or not present[i, j]:
+                        raise ValueError(f"list {name} is not on the ballot in {prov}")
+                    V[i, j] = v
+            if not np.isfinite(V).all() or (V != np.round(V)).any() or (V < 0).any():
+                raise ValueError("votes must be non-negative whole numbers")
+        elif isinstance(votes, list):
+            records = pd.DataFrame.from_records(votes)
+            missing = {"province", "list", "coalition", "votes"} - set(records.columns)
+            if missing:
+                raise ValueError(f"vote records need the columns {sorted(missing)}")
+            records["votes"] = _parse_votes(records["votes"], strict=True)
+            data = ElectionData.from_frames(_clean_votes(records), self._seats_df)
+            V = data.votes.astype(float)
+            if _structure_digest(data) == self._warm:
+                data = None
+        else:
+            raise ValueError("'votes' must be a list of records or a {province: {list: votes}} mapping")
+        key = (self._warm if data is None else _structure_digest(data), tuple(sorted(params.items())))
+        return key, data, params, V
+
+    async def allocate(self, request):
+        """Allocation of one request (dict); returns the JSON response body."""
+        import asyncio
+        if self._queue is None:
+            self._start_batcher()
+        key, data, params, V = self.parse(request)
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((key, data, params, V, fut))
+        self.requests += 1
+        return await fut
+
+    def _start_batcher(self):
+        # asyncio e i pool si importano solo con il servizio: import ERM resta leggero per calcolo e worker
+        import asyncio
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        self._queue = asyncio.Queue()
+        if self.jobs:
+            self._pool = ProcessPoolExecutor(self.jobs, initializer=_service_init, initargs=(self.model.data,))
+        else:
+            _service_init(self.model.data)
+            self._pool = ThreadPoolExecutor(1)
+        self._batcher = asyncio.get_running_loop().create_task(self._coalesce())
+
+    async def _coalesce(self):
+        # un blocco per volta per worker: mentre i worker sono occupati le richieste si accumulano in coda
+        import asyncio
+        loop = asyncio.get_running_loop()
+        free = asyncio.Semaphore(max(self.jobs, 1))
+        while True:
+            items = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(items) < self.max_batch:
+                if self._queue.empty():
+                    left = deadline - loop.time()
+                    if left <= 0:
+                        break
+                    try:
+                        items.append(await asyncio.wait_for(self._queue.get(), left))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    items.append(self._queue.get_nowait())
+            groups = {}
+            for item in items:
+                groups.setdefault(item[0], []).append(item)
+            for group in groups.values():
+                await free.acquire()
+                task = loop.create_task(self._run(group))
+                task.add_done_callback(lambda _: free.release())
+
+    async def _run(self, group):
+        import asyncio
+        _, data, params, _, _ = group[0]
+        votes = np.stack([item[3] for item in group])
+        self.batches += 1
+        try:
+            bodies = await asyncio.get_running_loop().run_in_executor(self._pool, _service_task, data, params, votes)
+        except Exception as e:
+            for item in group:
+                if not item[4].done():
+                    item[4].set_exception(e)
+            return
+        for item, body in zip(group, bodies):
+            if not item[4].done():
+                item[4].set_result(body)
+
+    async def _route(self, method, path, body):
+        import asyncio
+        if path == "/health":
+            return 200, json.dumps({"status":"ok", "requests":self.requests, "batches":self.batches,
+                                    "errors":self.errors, "jobs":self.jobs})
+        if path not in ("/allocate", "/allocate/batch"):
+            return 404, json.dumps({"error":f"no endpoint {path}"})
+        if method != "POST":
+            return 405, json.dumps({"error":f"{path} takes POST"})
+        try:
+            request = json.loads(body or b"null")
+            if path == "/allocate":
+                return 200, await self.allocate(request)
+            scenarios = request.get("scenarios") if isinstance(request, dict) else None
+            if not isinstance(scenarios, list):
+                raise ValueError("batch request must be a JSON object with a 'scenarios' list")
+            bodies = await asyncio.gather(*(self.allocate(r) for r in scenarios))
+            return 200, '{"results":[%s]}' % ",".join(bodies)
+        except (ValueError, KeyError, TypeError) as e:
+            self.errors += 1
+            return 400, json.dumps({"error":str(e)})
+        except Exception as e:
+            self.errors += 1
+            traceback.print_exc()
+            return 500, json.dumps({"error":f"{type(e).__name__}: {e}"})
+
+    async def _handle(self, reader, writer):
+        # HTTP/1.1 minimale con keep-alive: una richiesta per volta per connessione
+        import asyncio
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                parts = lines[0].split(" ")
+                headers = dict((k.strip().lower(), v.strip()) for k, _, v in (l.partition(":") for l in lines[1:] if l))
+                if len(parts) != 3:
+                    writer.write(_http_response(400, json.dumps({"error":"malformed request line"}), False))
+                    break
+                method, path, version = parts
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload = await self._route(method, path, body)
+                keep = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(_http_response(status, payload, keep))
+                await writer.drain()
+                if not keep:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8765):
+        """Starts listening; returns the asyncio.Server (port 0 picks a free port)."""
+        import asyncio
+        if self._queue is None:
+            self._start_batcher()
+        if self.jobs:
+            # i worker nascono prima del socket in ascolto: un fork successivo erediterebbe le connessioni aperte
+            await asyncio.get_running_loop().run_in_executor(self._pool, os.getpid)
+        return await asyncio.start_server(self._handle, host, port)
+
+    def close(self):
+        """Stops the batcher and shuts the worker pool down."""
+        if self._batcher is not None:
+            self._batcher.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+        self._queue = self._batcher = self._pool = None
+
+def serve(host="127.0.0.1", port=8765, jobs=0, votes_path="votes_marche_2025_all_provinces.csv",
+          seats_path="seats_per_province.csv", params_path="params.csv", **kw):
+    """
+    Runs an AllocationService until interrupted (Ctrl-C or SIGTERM).
+    Args:
+        host, port: listening address
+        jobs (int): worker processes (0 = one worker thread)
+        votes_path, seats_path, params_path (str): input files of the warm model
+        **kw: max_batch, max_wait (see AllocationService)
+    """
+    import asyncio
+    service = AllocationService.from_csv(votes_path, seats_path, params_path, jobs=jobs, **kw)
+
+    async def main():
+        server = await service.start(host, port)
+        print(f"allocation service on http://{host}:{server.sockets[0].getsockname()[1]} ({jobs or 'thread'} workers)",
+              flush=True)
+        if os.name == "posix":
+            # SIGTERM chiude come Ctrl-C, così i worker vengono fermati
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, server.close)
+        async with server:
+            await server.serve_forever()
+    try:
+        asyncio.run(main())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    finally:
+        service.close()
+
+# ---------- M) previsione da sondaggi: quote a posteriori, voti provinciali, probabilità di seggio ----------
+_IPF_ITERATIONS = 20  # adattamento della tabella provincia x lista ai totali provinciali e alle quote estratte
+
+@dataclass(frozen=True)
+class ForecastResult:
+    """
+    Output of forecast(): seat probabilities over the posterior draws.
+    Attributes:
+        n (int): posterior draws
+        coalitions (pd.DataFrame): coalition, mean_seats, p_tier19 / p_tier18 (leading admitted coalition with
+            a share reaching pct19 / pct18 only), p_bonus (bonus re-allocation applied), p_majority (more than
+            half of the list seats), p_runner_up (second admitted coalition)
+        lists (pd.DataFrame): list, coalition, poll_share (posterior mean regional share), mean_seats, p_seat
+            and the q05, q50, q95 quantiles of the regional seats
+        list_seats (pd.DataFrame): list, seats, probability -- distribution of the regional seats of each list
+        province_seats (pd.DataFrame): province, list, seats, probability -- distribution of the seats of each
+            province x list entry (non-zero probabilities only)
+        p_reserved (float): probability that the runner-up reservation fires (runner-up coalition without seats)
+    """
+    n: int
+    coalitions: pd.DataFrame
+    lists: pd.DataFrame
+    list_seats: pd.DataFrame
+    province_seats: pd.DataFrame
+    p_reserved: float
+
+def _poll_counts(polls, lists, base_share, design_effect):
+    # respondenti effettivi per lista, sommati sui sondaggi; la quota non attribuita da un sondaggio va alle
+    # liste che non vi compaiono, in proporzione al risultato di base
+    p = pd.DataFrame(polls).rename(columns=lambda x: x.strip())
+    missing = {"list", "share", "sample_size"} - set(p.columns)
+    if missing:
+        raise ValueError(f"polls need the columns {sorted(missing)}")
+    unknown = set(p["list"]) - set(lists)
+    if unknown:
+        raise ValueError(f"lists not in the votes data: {sorted(unknown)}")
+    counts = np.zeros(len(lists))
+    for poll, rows in p.groupby(p["poll"] if "poll" in p.columns else np.zeros(len(p)), sort=False):
+        share = rows["share"].to_numpy(dtype=float)
+        if share.max() > 1:
+            share = share / 100  # quote in percentuale
+        size = rows["sample_size"].to_numpy(dtype=float)
+        if (share < 0).any() or share.sum() > 1 + 1e-6:
+            raise ValueError(f"poll {poll}: shares must be non-negative and add up to at most 100%")
+        if (size != size[0]).any() or size[0] <= 0:
+            raise ValueError(f"poll {poll}: one positive sample_size per poll")
+        code = pd.Index(lists).get_indexer(rows["list"])
+        if len(set(code)) < len(code):
+            raise ValueError(f"poll {poll}: a list appears more than once")
+        n_eff = size[0] / design_effect
+        np.add.at(counts, code, n_eff * share)
+        rest = np.where(np.isin(np.arange(len(lists)), code), 0.0, base_share)
+        if rest.sum() > 0:
+            counts += n_eff * max(1.0 - share.sum(), 0.0) * rest / rest.sum()
+    return counts
+
+def _poll_votes(rng, data, shares, noise):
+    # voti provinciali (scenari, province, liste) dalle quote regionali estratte: la tabella del file di voti
+    # (ripartizione di ogni lista fra le province) adattata con IPF ai totali provinciali e alle quote, poi
+    # quote provinciali da una Dirichlet attorno al risultato adattato (concentrazione 1/noise², come simulate)
+    base = data.votes.astype(float)
+    prov_total = base.sum(axis=1)
+    seed = np.where(data.present, np.maximum(base, 1.0), 0.0)  # anche le liste presenti senza voti
+    target = shares * prov_total.sum()
+    M = seed[None] * np.divide(target, seed.sum(axis=0), out=np.zeros_like(target), where=seed.sum(axis=0) > 0)[:, None, :]
+    for _ in range(_IPF_ITERATIONS):
+        rows = M.sum(axis=2, keepdims=True)
+        M *= np.divide(prov_total[None, :, None], rows, out=np.zeros_like(rows), where=rows > 0)
+        cols = M.sum(axis=1, keepdims=True)
+        M *= np.divide(target[:, None, :], cols, out=np.zeros_like(cols), where=cols > 0)
+    if noise > 0:
+        rows = M.sum(axis=2, keepdims=True)
+        g = rng.standard_gamma(np.divide(M, rows, out=np.zeros_like(M), where=rows > 0) / noise**2)
+        gs = g.sum(axis=2, keepdims=True)
+        M = np.divide(g, gs, out=np.zeros_like(g), where=gs > 0) * prov_total[None, :, None]
+    return np.where(data.present, np.round(M), 0.0)
+
+def forecast(polls, votes_df, province_seats_df=None, n=10000, seed=None, design_effect=1.0, prior=1.0, noise=0.02,
+             batch_size=10000, **params):
+    """
+    Seat forecast from regional polls. The list-level poll results give a Dirichlet posterior of the
+    regional list shares; each draw is spread over the provinces with the provincial distribution of
+    the votes file and pushed through stages A–E with the batched engine, in blocks of batch_size
+    draws folded into a SeatAccumulator, so memory does not grow with n.
+    Args:
+        polls (pd.DataFrame or list of dict): columns 'list', 'share' (fraction or percentage of the regional
+            vote), 'sample_size' and optionally 'poll' (several polls are pooled). The share a poll does not
+            assign goes to the lists missing from it, in proportion to their result in votes_df
+        votes_df (pd.DataFrame or ElectionData): base election (cleaned as in run_allocation); fixes the
+            structure, the provincial totals and the distribution of each list across the provinces
+        province_seats_df (pd.DataFrame): columns ['province', 'seats'] (ignored for an ElectionData)
+        n (int): posterior draws
+        seed (int): seed of the random generator
+        design_effect (float): divides the sample sizes (> 1 for polls less precise than simple random samples)
+        prior (float): pseudo-respondents spread over the lists by their result in votes_df
+        noise (float): provincial deviation from the fitted distribution (Dirichlet concentration 1/noise²;
+            0 = the fitted distribution itself)
+        batch_size (int): draws processed per block
+        **params: total_list_seats, pct19, pct18, seats19, seats18, coal_threshold, list_threshold
+    Returns:
+        ForecastResult
+    Raises:
+        ValueError: malformed polls or lists that are not in votes_df
+    """
+    if n <= 0:
+        raise ValueError("n must be a positive number of draws")
+    unknown = set(params) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise TypeError(f"unexpected parameters: {sorted(unknown)}")
+    kw = dict(DEFAULT_PARAMS, **params)
+    data = votes_df if isinstance(votes_df, ElectionData) else \
+        ElectionData.from_frames(_clean_votes(votes_df), province_seats_df.rename(columns=lambda x: x.strip()))
+    L = len(data.lists)
+    lv = data.votes.sum(axis=0).astype(float)
+    base_share = lv / lv.sum() if lv.sum() > 0 else np.full(L, 1.0 / L)
+    alpha = _poll_counts(polls, data.lists, base_share, design_effect) + prior * base_share
+    rng = np.random.default_rng(seed)
+
+    acc, share_sum = SeatAccumulator(data, kw["total_list_seats"], kw["seats19"], kw["seats18"]), np.zeros(L)
+    for lo in range(0, n, batch_size):
+        g = rng.standard_gamma(np.broadcast_to(alpha, (min(batch_size, n - lo), L)))
+        shares = g / g.sum(axis=1, keepdims=True)
+        acc.update(_allocate_batch(data, _poll_votes(rng, data, shares, noise), **kw))
+        share_sum += shares.sum(axis=0)
+
+    summary = acc.summary()
+    lists = summary["lists"]
+    lists.insert(1, "coalition", np.array(data.coalitions, dtype=object)[data.list_coalition])
+    lists.insert(2, "poll_share", share_sum / n)
+    return ForecastResult(
+        n, summary["coalitions"][["coalition", "mean_seats", "p_tier19", "p_tier18", "p_bonus", "p_majority", "p_runner_up"]],
+        lists.drop(columns="std_seats"), acc.distribution("lists"), acc.distribution("cells"), acc.p_reserved)
+
+# ---------- N) riga di comando: molti scenari in un solo interprete ----------
+TABLE_FILES = {"provincial_results":"provincial_results.csv", "coalition_seats":"coalition_seats.csv",
+               "group_seats":"group_seats.csv", "runnerup_reserved":"runnerup_reserved.csv"}
+SIMULATION_FILES = {"coalitions":"simulation_coalitions.csv", "lists":"simulation_lists.csv",
+                    "cells":"simulation_cells.csv"}
+FORECAST_FILES = {"coalitions":"forecast_coalitions.csv", "lists":"forecast_lists.csv",
+                  "list_seats":"forecast_list_seats.csv", "province_seats":"forecast_province_seats.csv"}
+_CLI = {}  # stato del processo worker: opzioni, seggi per provincia e parametri letti una volta
+
+def read_manifest(path):
+    """
+    Reads a scenario manifest. A CSV with a 'votes' column lists one scenario per row: 'votes' (vote file),
+    optional 'name', optional 'seats' (seats-per-province file) and optional parameter columns named as the
+    run_allocation keywords (total_list_seats, pct19, ...) overriding params.csv; empty cells keep the
+    defaults. Any other file lists one vote file per line ('#' starts a comment). Relative paths are taken
+    from the manifest's directory.
+    Args:
+        path (str): manifest file
+    Returns:
+        list of dict: scenarios with keys 'name', 'votes', 'seats' (None = --seats) and 'params'
+    Raises:
+        ValueError: unknown columns or duplicate scenario names
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8") as f:
+        lines = [l.strip() for l in f if l.strip() and not l.lstrip().startswith("#")]
+    if lines and "votes" in [c.strip() for c in lines[0].split(",")]:
+        rows = pd.read_csv(path, comment="#", skipinitialspace=True).rename(columns=lambda x: x.strip())
+        unknown = set(rows.columns) - {"name", "votes", "seats"} - set(DEFAULT_PARAMS)
+        if unknown:
+            raise ValueError(f"unknown manifest columns: {sorted(unknown)}")
+        records = rows.to_dict("records")
+    else:
+        records = [{"votes":l} for l in lines]
+    scenarios = []
+    for r in records:
+        votes = os.path.join(base, str(r["votes"]).strip())
+        seats = r.get("seats")
+        params = {k:type(DEFAULT_PARAMS[k])(r[k]) for k in DEFAULT_PARAMS if k in r and not pd.isna(r[k])}
+        name = r.get("name")
+        scenarios.append({"name":_scenario_name(votes) if name is None or pd.isna(name) else str(name),
+                          "votes":votes, "seats":None if seats is None or pd.isna(seats) else os.path.join(base, str(seats).strip()),
+                          "params":params})
+    names = [s["name"] for s in scenarios]
+    dup = sorted({n for n in names if names.count(n) > 1})
+    if dup:
+        raise ValueError(f"duplicate scenario names in {path}: {dup}")
+    return scenarios
+
+def _scenario_name(path):
+    # nome di uno scenario dal file dei voti, senza estensioni (.csv, .csv.gz)
+    name = os.path.basename(path)
+    for ext in (".gz", ".bz2", ".zip", ".xz", ".csv"):
+        if name.endswith(ext):
+            name = name[:-len(ext)]
+    return name
+
+def _cli_init(options):
+    # opzioni comuni del comando; i file dei seggi si leggono una volta per processo
+    _CLI.clear()
+    _CLI.update(options, seats_cache={})
+
+def _require_columns(df, columns, path):
+    # colonne obbligatorie di un file di ingresso, con il nome del file nel messaggio
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"missing columns in {path}: {missing}")
+    return df
+
+def _cli_seats(path):
+    cache = _CLI["seats_cache"]
+    if path not in cache:
+        seats_df = _require_columns(pd.read_csv(path).rename(columns=lambda x: x.strip()), ["province", "seats"], path)
+        seats_df["seats"] = pd.to_numeric(seats_df["seats"], errors="coerce").fillna(0)
+        cache[path] = seats_df
+    return cache[path]
+
+def _cli_task(scenario):
+    # uno scenario di allocate/report/simulate; restituisce il testo da stampare
+    try:
+        return _CLI_COMMANDS[_CLI["command"]](scenario)
+    except (OSError, ValueError, KeyError) as e:
+        raise ValueError(f"scenario {scenario['name']} ({scenario['votes']}): {e}") from e
+
+def _cli_inputs(scenario):
+    # file di voti e di seggi con le colonne obbligatorie: un file incompleto si segnala per nome
+    votes_df = _require_columns(load_votes(scenario["votes"], cache=_CLI["cache"]), VOTES_COLUMNS, scenario["votes"])
+    seats_df = _cli_seats(scenario["seats"] or _CLI["seats"])
+    return votes_df, seats_df, dict(_CLI["params"], **scenario["params"])
+
+def _cli_prefix(scenario):
+    # file di uscita '<nome>_<file>' con più scenari (come render_reports), nomi di sempre con uno solo
+    return f"{scenario['name']}_" if _CLI["prefix"] else ""
+
+def _cli_allocate(scenario):
+    votes_df, seats_df, params = _cli_inputs(scenario)
+    model = ElectionModel(ElectionData.from_frames(_clean_votes(votes_df), seats_df), **params)
+    final, coal_seats, grp_seats, removed = model.allocate().to_frames()
+    outputs, prefix = _CLI["outputs"], _cli_prefix(scenario)
+    tables = {"provincial_results":lambda: _provincial_results(final), "coalition_seats":lambda: coal_seats,
+              "group_seats":lambda: grp_seats, "runnerup_reserved":lambda: pd.DataFrame([removed or {}])}
+    written = []
+    for name in (o for o in outputs if o in TABLE_FILES):
+        path = os.path.join(_CLI["output_dir"], prefix + TABLE_FILES[name])
+        tables[name]().to_csv(path, index=False)
+        written.append(path)
+    formats = [o for o in outputs if o in REPORT_FILES]
+    report = None
+    if formats or _CLI["details"]:
+        report = build_report(final, coal_seats, grp_seats, votes_df, seats_df)
+    if formats:
+        written += write_report(report, _CLI["output_dir"], formats, prefix).values()
+    seats = ", ".join(f"{c} {s}" for c, s in zip(coal_seats.get("coalition", []), coal_seats.get("seats", [])))
+    text = f"{scenario['name']}: {seats or 'no coalition admitted'}"
+    if written:
+        text += "\n  wrote " + ", ".join(os.path.normpath(p) for p in written)
+    if _CLI["details"]:
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            print_province_allocation_details(report.results, seats_df, _CLI["details"])
+        text += out.getvalue().rstrip("\n")
+    return text
+
+def _cli_simulate(scenario):
+    votes_df, seats_df, params = _cli_inputs(scenario)
+    acc = simulate(votes_df, seats_df, n=_CLI["n"], noise=_CLI["noise"], seed=_CLI["seed"], method=_CLI["method"],
+                   accumulate=True, **params)
+    summary = acc.summary()
+    prefix = _cli_prefix(scenario)
+    written = []
+    for name in _CLI["outputs"]:
+        path = os.path.join(_CLI["output_dir"], prefix + SIMULATION_FILES[name])
+        summary[name].to_csv(path, index=False)
+        written.append(path)
+    coal = summary["coalitions"]
+    text = f"{scenario['name']}: " + ", ".join(f"{c} {m:.2f} seats (P(bonus) {b:.3f})" for c, m, b in
+                                               zip(coal["coalition"], coal["mean_seats"], coal["p_bonus"]))
+    if written:
+        text += "\n  wrote " + ", ".join(os.path.normpath(p) for p in written)
+    return text
+
+def _cli_forecast(scenario):
+    votes_df, seats_df, params = _cli_inputs(scenario)
+    res = forecast(_CLI["polls"], votes_df, seats_df, n=_CLI["n"], seed=_CLI["seed"], design_effect=_CLI["design_effect"],
+                   noise=_CLI["noise"], **params)
+    prefix = _cli_prefix(scenario)
+    written = []
+    for name in _CLI["outputs"]:
+        path = os.path.join(_CLI["output_dir"], prefix + FORECAST_FILES[name])
+        getattr(res, name).to_csv(path, index=False)
+        written.append(path)
+    coal = res.coalitions[res.coalitions["mean_seats"] > 0]
+    text = f"{scenario['name']}: " + ", ".join(f"{c} {m:.2f} seats (P(19) {a:.3f}, P(18) {b:.3f})" for c, m, a, b in
+                                               zip(coal["coalition"], coal["mean_seats"], coal["p_tier19"], coal["p_tier18"]))
+    text += f", P(runner-up reservation) {res.p_reserved:.3f}"
+    if written:
+        text += "\n  wrote " + ", ".join(os.path.normpath(p) for p in written)
+    return text
+
+_CLI_COMMANDS = {"allocate":_cli_allocate, "report":_cli_allocate, "simulate":_cli_simulate, "forecast":_cli_forecast}
+
+def _cli_sweep(options, scenarios, grid_path):
+    # tutti i file di voti sulla stessa struttura: un solo sweep con una colonna 'scenario' per file
+    if any(s["params"] or s["seats"] for s in scenarios):
+        raise ValueError("sweep takes its parameters from --grid: the manifest may only list vote files")
+    _cli_init(options)
+    seats_df, datas = _cli_seats(options["seats"]), []
+    for s in scenarios:
+        votes_df = _require_columns(load_votes(s["votes"], cache=options["cache"]), VOTES_COLUMNS, s["votes"])
+        datas.append(ElectionData.from_frames(_clean_votes(votes_df), seats_df))
+        if _structure_digest(datas[-1]) != _structure_digest(datas[0]):
+            raise ValueError(f"scenario {s['name']}: sweep needs vote files with the same provinces, lists and rows")
+    model = ElectionModel(datas[0], **options["params"])
+    grid = pd.read_csv(grid_path, skipinitialspace=True).rename(columns=lambda x: x.strip())
+    table = sweep(model, grid, votes=np.stack([d.votes for d in datas]), jobs=options["jobs"])
+    if len(scenarios) > 1:
+        table["scenario"] = np.array([s["name"] for s in scenarios], dtype=object)[table["scenario"].to_numpy()]
+    path = os.path.join(options["output_dir"], "sweep.csv")
+    table.to_csv(path, index=False)
+    return f"{len(grid)} grid points x {len(scenarios)} vote files: {len(table)} rows\n  wrote {path}"
+
+def main(argv=None):
+    """
+    Command-line interface (python ERM.py COMMAND ...). Every command loads params.csv and the seats per
+    province once and runs all the scenarios (vote files given as arguments or in a --manifest) in one
+    interpreter, in process or on --jobs worker processes, writing only the requested --outputs.
+    Commands:
+        allocate: run_allocation tables (and optionally the reports) of each scenario
+        report: Markdown / heatmap / PDF reports of each scenario
+        simulate: Monte Carlo summaries (simulate) of each scenario
+        forecast: seat probabilities from regional polls (forecast) on each scenario's provincial distribution
+        sweep: parameter sweep of a --grid CSV over the vote files (sweep)
+        serve: local HTTP/JSON service (serve)
+    Without arguments it runs 'allocate --outputs all' on the sample files, as the script always did.
+    Errors in the inputs stop the run with a message and exit status 1.
+    Args:
+        argv (list): arguments (None = sys.argv[1:])
+    Returns:
+        int: exit status
+    """
+    import argparse
+    import sys
+    from concurrent.futures import ProcessPoolExecutor
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv:
+        argv = ["allocate", "--outputs", "all"]
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("votes", nargs="*", help="vote files, one scenario each")
+    common.add_argument("--manifest", help="CSV of scenarios (votes, name, seats, parameters) or a list of vote files")
+    common.add_argument("--seats", default="seats_per_province.csv", help="seats per province")
+    common.add_argument("--params", default="params.csv", help="electoral parameters (key,value)")
+    common.add_argument("-o", "--output-dir", default=".", help="destination of the output files")
+    common.add_argument("-j", "--jobs", type=int, default=1, help="worker processes (1 = in this process)")
+    common.add_argument("--no-cache", dest="cache", action="store_false", help="do not read or write <votes>.npz")
+    parser = argparse.ArgumentParser(prog="ERM.py", description="Marche regional council seat allocation "
+                                     "(L.R. 27/2004, artt. 18-19).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    outputs = list(TABLE_FILES) + list(REPORT_FILES)
+    p = sub.add_parser("allocate", parents=[common], help="allocation tables (and reports) per scenario")
+    p.add_argument("--outputs", nargs="+", default=list(TABLE_FILES), choices=outputs + ["all"], metavar="OUTPUT",
+                   help=f"any of {', '.join(outputs)} or all (default: the four tables)")
+    p.add_argument("--details", metavar="PROVINCE", help="print the allocation details of one province")
+    p = sub.add_parser("report", parents=[common], help="Markdown / heatmap / PDF reports per scenario")
+    p.add_argument("--outputs", nargs="+", default=list(REPORT_FILES), choices=outputs + ["all"], metavar="OUTPUT",
+                   help=f"any of {', '.join(outputs)} or all (default: the three reports)")
+    p.add_argument("--details", metavar="PROVINCE", help="print the allocation details of one province")
+    p = sub.add_parser("simulate", parents=[common], help="Monte Carlo seat projection per scenario")
+    p.add_argument("-n", type=int, default=10000, help="scenarios drawn per vote file")
+    p.add_argument("--noise", type=float, default=0.05)
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--method", choices=["dirichlet", "multinomial"], default="dirichlet")
+    p.add_argument("--outputs", nargs="+", default=["coalitions", "lists"], choices=list(SIMULATION_FILES) + ["all"],
+                   metavar="OUTPUT", help=f"any of {', '.join(SIMULATION_FILES)} or all (default: coalitions lists)")
+    p = sub.add_parser("forecast", parents=[common], help="seat probabilities from regional polls per scenario")
+    p.add_argument("--polls", required=True, help="CSV with list, share, sample_size and optionally poll columns")
+    p.add_argument("-n", type=int, default=10000, help="posterior draws per vote file")
+    p.add_argument("--noise", type=float, default=0.02, help="provincial deviation from the fitted distribution")
+    p.add_argument("--design-effect", type=float, default=1.0, help="divides the poll sample sizes")
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--outputs", nargs="+", default=["coalitions", "lists"], choices=list(FORECAST_FILES) + ["all"],
+                   metavar="OUTPUT", help=f"any of {', '.join(FORECAST_FILES)} or all (default: coalitions lists)")
+    p = sub.add_parser("sweep", parents=[common], help="parameter sweep over a grid (one sweep.csv)")
+    p.add_argument("--grid", required=True, help="CSV with one parameter set per row (run_allocation keywords)")
+    p = sub.add_parser("serve", help="local HTTP/JSON allocation service")
+    p.add_argument("--votes", default="votes_marche_2025_all_provinces.csv", help="votes of the warm model")
+    p.add_argument("--seats", default="seats_per_province.csv")
+    p.add_argument("--params", default="params.csv")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("-j", "--jobs", type=int, default=0, help="worker processes (0 = one worker thread)")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.jobs, args.votes, args.seats, args.params)
+        return 0
+    try:
+        if args.manifest and args.votes:
+            parser.error("give vote files or --manifest, not both")
+        if args.manifest:
+            scenarios = read_manifest(args.manifest)
+        else:
+            files = args.votes or ["votes_marche_2025_all_provinces.csv"]
+            scenarios = [{"name":_scenario_name(f), "votes":f, "seats":None, "params":{}} for f in files]
+            names = [s["name"] for s in scenarios]
+            if len(set(names)) < len(names):
+                parser.error("vote files with the same name: use a --manifest with a 'name' column")
+        if not scenarios:
+            parser.error("no scenarios to run")
+        chosen = getattr(args, "outputs", [])
+        if "all" in chosen:
+            chosen = {"simulate":list(SIMULATION_FILES), "forecast":list(FORECAST_FILES)}.get(args.command, outputs)
+        options = {"command":args.command, "outputs":list(dict.fromkeys(chosen)), "output_dir":args.output_dir,
+                   "prefix":bool(args.manifest) or len(scenarios) > 1, "seats":args.seats, "cache":args.cache,
+                   "params":_read_params(_require_columns(pd.read_csv(args.params).rename(columns=lambda x: x.strip()),
+                                                          ["key", "value"], args.params)),
+                   "details":getattr(args, "details", None), "jobs":args.jobs,
+                   **{k:getattr(args, k) for k in ("n", "noise", "seed", "method", "design_effect") if hasattr(args, k)}}
+        if args.command == "forecast":
+            options["polls"] = pd.read_csv(args.polls, skipinitialspace=True)
+        os.makedirs(args.output_dir, exist_ok=True)
+        if args.command == "sweep":
+            print(_cli_sweep(options, scenarios, args.grid))
+        elif args.jobs > 1 and len(scenarios) > 1:
+            with ProcessPoolExecutor(min(args.jobs, len(scenarios)), initializer=_cli_init, initargs=(options,)) as ex:
+                for text in ex.map(_cli_task, scenarios, chunksize=max(1, len(scenarios) // (4 * args.jobs))):
+                    print(text)
+        else:
+            _cli_init(options)
+            for scenario in scenarios:
+                print(_cli_task(scenario))
+    except BrokenPipeError:
+        raise
+    except (OSError, ValueError) as e:
+        print(f"ERM.py {args.command}: error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
 import pandas as pd
 
 def generate_markdown_report(seat_alloc_df, output_path="seat_report.md"):
@@ -524,94 +3388,23 @@ def get_regional_rest_rank(df):
     return df[["province", "list", "coalition", "votes", "rest", "rest_pct"]].sort_values("rest_pct", ascending=False)
 
 # Funzione per stampare i dettagli della ripartizione seggi per una provincia
-def print_province_allocation_details(prov_res_df, seats_per_province_df, province, votes_df):
-    # Stampa dettagli ripartizione seggi per una provincia
+def print_province_allocation_details(prov_res_df, seats_per_province_df, province, votes_df=None):
+    # Stampa dettagli ripartizione seggi per una provincia: quota, voti ammessi e seggi interi letti dalle
+    # colonne q_circ, prov_total e int_seats di provincial_results (coalizioni davvero ammesse);
+    # votes_df non è più letto ed è tenuto per compatibilità
     print(f"\nRipartizione seggi per la provincia di {province}:")
     prov_df = prov_res_df[prov_res_df["province"] == province]
-    seats_row = seats_per_province_df[seats_per_province_df["province"] == province]
-    if not seats_row.empty:
-        seats = int(seats_row["seats"].iloc[0])
-        # Use only admitted coalition votes for quota calculation
-        admitted_coalitions = ["Centrodestra", "Centrosinistra"]  # These are the admitted coalitions
-        admitted_votes = votes_df[(votes_df["province"] == province) & 
-                                 (votes_df["coalition"].isin(admitted_coalitions))]["votes"].sum()
-        q_circ = admitted_votes // (seats + 1) if seats > 0 else 0
-        print(f"Quota provinciale: {q_circ} = {admitted_votes} voti / ({seats} + 1)")
-    else:
+    if seats_per_province_df[seats_per_province_df["province"] == province].empty:
         print("Province not found in seats data.")
         return
+    if prov_df.empty:
+        print("No admitted list in this province.")
+        return
+    first = prov_df.iloc[0]
+    print(f"Quota provinciale: {first['q_circ']} = {first['prov_total']} voti / ({int(first['seats'])} + 1)")
     for _, row in prov_df.iterrows():
-        print(f"Lista: {row['list']}, Voti: {row['votes']}, Seggi: {row['final_seats']}, Resti: {row.get('rest', 0)} ({row['rest_pct']:.2f}%)")
+        print(f"Lista: {row['list']}, Voti: {row['votes']}, Seggi interi: {row['int_seats']}, Seggi: {row['final_seats']}, "
+              f"Resti: {row.get('rest', 0)} ({row['rest_pct']:.2f}%)")
 
-# Example usage in main
 if __name__=="__main__":
-    try:
-        votes_df = pd.read_csv("votes_marche_2025_all_provinces.csv")
-        seats_per_province_df = pd.read_csv("seats_per_province.csv")
-        provs = seats_per_province_df
-        params = pd.read_csv("params.csv")
-
-        # Ensure column names are stripped of whitespace
-        votes_df.columns = votes_df.columns.str.strip()
-        seats_per_province_df.columns = seats_per_province_df.columns.str.strip()
-        params.columns = params.columns.str.strip()
-        
-        # Handle comma-separated numbers in votes column BEFORE numeric conversion
-        if "votes" in votes_df.columns and votes_df["votes"].dtype == 'object':
-            votes_df["votes"] = votes_df["votes"].astype(str).str.replace(',', '').astype(float)
-        
-        # Ensure votes column is numeric
-        if "votes" in votes_df.columns:
-            votes_df["votes"] = pd.to_numeric(votes_df["votes"], errors="coerce").fillna(0)
-        # Ensure seats column is numeric
-        if "seats" in seats_per_province_df.columns:
-            seats_per_province_df["seats"] = pd.to_numeric(seats_per_province_df["seats"], errors="coerce").fillna(0)
-        # Ensure value column is numeric in params
-        if "value" in params.columns:
-            params["value"] = pd.to_numeric(params["value"], errors="coerce").fillna(0)
-
-        total = int(params.loc[params["key"]=="TOTAL_LIST_SEATS","value"].iloc[0])
-        p19   = float(params.loc[params["key"]=="BONUS_TARGET_PCT_19","value"].iloc[0])
-        p18   = float(params.loc[params["key"]=="BONUS_TARGET_PCT_18","value"].iloc[0])
-
-        final, coal_seats, grp_seats, removed = run_allocation(votes_df, provs, total, p19, p18)
-
-        # Simple output generation - no complex aggregation
-        out = final.copy()
-        
-        # Ensure all required columns exist
-        required_columns = ["province", "list", "coalition", "votes", "int_seats", "rest", "rest_pct", "regional_rest_rank", "final_seats"]
-        for col in required_columns:
-            if col not in out.columns:
-                if col == "rest":
-                    out[col] = 0
-                elif col == "rest_pct":
-                    out[col] = 0.0
-                elif col == "regional_rest_rank":
-                    out[col] = 0
-                elif col == "int_seats":
-                    out[col] = 0
-                else:
-                    out[col] = ""
-        
-        # Sort by province, final_seats (descending), votes (descending)
-        if "province" in out.columns and "final_seats" in out.columns and "votes" in out.columns:
-            out = out.sort_values(["province", "final_seats", "votes"], ascending=[True, False, False])
-
-        out.to_csv("provincial_results.csv", index=False)
-        coal_seats.to_csv("coalition_seats.csv", index=False)
-        grp_seats.to_csv("group_seats.csv", index=False)
-        pd.DataFrame([removed or {}]).to_csv("runnerup_reserved.csv", index=False)
-
-        # Now generate reports after provincial_results.csv is written
-        provincial_results_df = pd.read_csv("provincial_results.csv")
-        quota_df = calculate_provincial_quota(votes_df, seats_per_province_df)
-        # Calcola il rank regionale dei resti percentuali
-        generate_province_seat_markdown(votes_df, provincial_results_df, quota_df, seats_per_province_df, output_path="province_seat_report.md")
-        generate_province_seat_heatmap(provincial_results_df, output_path="province_seat_heatmap.md")
-        generate_province_seat_pdf(provincial_results_df, output_path="ripartizioneSeggi_finale.pdf", seats_per_province_df=seats_per_province_df, votes_df=votes_df)
-        print("Reports generated: province_seat_report.md, province_seat_heatmap.md, ripartizioneSeggi_finale.pdf")
-        # Print allocation details for Fermo
-        print_province_allocation_details(provincial_results_df, seats_per_province_df, "Fermo", votes_df)
-    except Exception as e:
-        print("Could not generate report:", e)
+    raise SystemExit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+What-if session replay: run_allocation on every slider move against AllocationCache.
+
+The session jumps between a fixed set of configurations (the baseline, +-1% swings of each
+coalition's votes and the params.csv thresholds moved by one point), as a user moving sliders back
+and forth does. Every move goes through run_allocation, AllocationCache.allocate_frames (same
+DataFrame inputs) and AllocationCache.allocate (compiled model); the cached results are checked
+against run_allocation.
+
+Usage (from the repository root):
+    python benchmarks/bench_cache.py [--moves 2000] [--maxsize 64] [--seed 0]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ERM import AllocationCache, ElectionModel, load_inputs, run_allocation
+
+
+def configurations(votes_df, params):
+    # (voti, parametri) raggiungibili con gli slider
+    out = [(votes_df, params)]
+    for coalition in votes_df["coalition"].unique():
+        for swing in (0.99, 1.01):
+            v = votes_df.copy()
+            v.loc[v["coalition"]==coalition, "votes"] = (v.loc[v["coalition"]==coalition, "votes"] * swing).round()
+            out.append((v, params))
+    for key in ("coal_threshold", "list_threshold", "pct19", "pct18"):
+        for step in (-0.01, 0.01):
+            out.append((votes_df, dict(params, **{key:round(params[key] + step, 4)})))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--moves", type=int, default=2000)
+    parser.add_argument("--maxsize", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    votes_df, seats_df, params = load_inputs()
+    configs = configurations(votes_df, params)
+    models = [ElectionModel.from_frames(v, seats_df, **p) for v, p in configs]
+    session = np.random.default_rng(args.seed).integers(0, len(configs), args.moves)
+    print(f"{len(configs)} configurations, {args.moves} moves, cache of {args.maxsize}\n")
+
+    t0 = time.perf_counter()
+    ref = {i:run_allocation(configs[i][0], seats_df, **configs[i][1]) for i in session}
+    base = time.perf_counter() - t0
+
+    frames, model = AllocationCache(args.maxsize), AllocationCache(args.maxsize)
+    t0 = time.perf_counter()
+    for i in session:
+        frames.allocate_frames(configs[i][0], seats_df, **configs[i][1])
+    t_frames = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for i in session:
+        model.allocate(models[i])
+    t_model = time.perf_counter() - t0
+
+    for name, dt, cache in (("run_allocation", base, None), ("allocate_frames", t_frames, frames),
+                            ("allocate (model)", t_model, model)):
+        info = cache and cache.info()
+        stats = f"  hits {info.hits}, misses {info.misses}, evictions {info.evictions}" if info else ""
+        print(f"{name:18s} {1e3*dt/args.moves:7.3f} ms/move{stats}")
+
+    for i in set(session.tolist()):
+        got = frames.allocate_frames(configs[i][0], seats_df, **configs[i][1]).to_frames()[0]
+        assert (got["final_seats"].to_numpy() == ref[i][0]["final_seats"].to_numpy()).all()
+
+
+if __name__ == "__main__":
+    main()
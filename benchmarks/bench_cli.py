@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Many scenario files through the command line: one interpreter per file against one manifest run.
+
+Writes --files perturbed copies of the sample votes and a manifest to a temporary directory, then
+times `python ERM.py allocate FILE` once per file (the old way of scripting the allocation, timed on
+the first --cold files and extrapolated) against a single `python ERM.py allocate --manifest` run,
+in process and with --jobs workers. The tables of both paths are checked to be identical.
+
+Usage (from the repository root):
+    python benchmarks/bench_cli.py [--files 500] [--cold 10] [--jobs 4] [--seed 0]
+"""
+
+import argparse
+import filecmp
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ERM import TABLE_FILES, load_votes
+
+ERM_PY = os.path.join(ROOT, "ERM.py")
+
+
+def run(args, cwd):
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, ERM_PY] + args, cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--cold", type=int, default=10, help="files timed with one interpreter each")
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    votes = load_votes(os.path.join(ROOT, "votes_marche_2025_all_provinces.csv"), cache=False)
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "votes"))
+        names = [f"s{i:04d}" for i in range(args.files)]
+        for name in names:
+            v = votes.copy()
+            v["votes"] = (v["votes"] * rng.lognormal(0.0, 0.2, len(v))).round()
+            v.to_csv(os.path.join(tmp, "votes", f"{name}.csv"), index=False)
+        with open(os.path.join(tmp, "manifest.txt"), "w") as f:
+            f.write("\n".join(f"votes/{name}.csv" for name in names) + "\n")
+        common = ["--seats", os.path.join(ROOT, "seats_per_province.csv"), "--params", os.path.join(ROOT, "params.csv")]
+        print(f"{args.files} scenario files\n")
+
+        # un interprete per file: i primi --cold, poi estrapolato
+        cold = min(args.cold, args.files)
+        t_cold = 0.0
+        for name in names[:cold]:
+            out = os.path.join(tmp, "cold", name)
+            t_cold += run(["allocate", os.path.join(tmp, "votes", f"{name}.csv"), "-o", out] + common, tmp)
+        per_file = t_cold / cold
+        print(f"{'one process per file':24s} {1e3 * per_file:8.1f} ms/file  ~{per_file * args.files:7.1f} s total")
+
+        for jobs in (1, args.jobs):
+            out = os.path.join(tmp, f"manifest_j{jobs}")
+            dt = run(["allocate", "--manifest", "manifest.txt", "-o", out, "--jobs", str(jobs)] + common, tmp)
+            print(f"{f'manifest, --jobs {jobs}':24s} {1e3 * dt / args.files:8.1f} ms/file  {dt:8.1f} s total"
+                  f"  ({per_file * args.files / dt:.0f}x)")
+
+        for name in names[:cold]:
+            for file in TABLE_FILES.values():
+                assert filecmp.cmp(os.path.join(tmp, "cold", name, file),
+                                   os.path.join(tmp, f"manifest_j{args.jobs}", f"{name}_{file}"), shallow=False)
+
+
+if __name__ == "__main__":
+    main()
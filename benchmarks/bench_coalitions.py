@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Run time of the batched coalition stage (coalitions_batch) on random coalition vote vectors.
+
+Usage (from the repository root):
+    python benchmarks/bench_coalitions.py [--scenarios 100000] [--coalitions 6] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ERM import coalitions_batch, load_inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenarios", type=int, default=100_000, help="coalition vote vectors")
+    parser.add_argument("--coalitions", type=int, default=6, help="coalitions per vector")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs (median reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    _, _, params = load_inputs(*(os.path.join(ROOT, f) for f in
+                                 ("votes_marche_2025_all_provinces.csv", "seats_per_province.csv", "params.csv")))
+    rng = np.random.default_rng(args.seed)
+    share = rng.dirichlet(np.full(args.coalitions, 2.0), args.scenarios)
+    coal_votes = np.rint(share * 800_000)
+    max_list_share = share * rng.uniform(0.3, 1.0, share.shape)
+
+    times = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        res = coalitions_batch(coal_votes, max_list_share, **params)
+        times.append(time.perf_counter() - t0)
+    el = np.median(times)
+    print(f"{args.scenarios} scenarios x {args.coalitions} coalitions: {el*1e3:.0f} ms "
+          f"({args.scenarios/el:,.0f} scenarios/s, median of {args.repeat})")
+    print(f"admitted per scenario {res['admitted'].sum(axis=1).mean():.2f}, "
+          f"bonus tier reached {np.mean(res['need'] > 0):.1%}, re-allocation applied {res['bonus'].mean():.1%}")
+
+
+if __name__ == "__main__":
+    main()
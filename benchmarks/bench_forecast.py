@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Poll-driven forecast: posterior draws per second and peak memory for increasing numbers of draws.
+
+The poll is the sample result itself (one row per list, --sample-size respondents), so the
+forecast is centred on the deterministic allocation. Peak memory is measured with tracemalloc;
+it depends on --batch-size, not on the number of draws.
+
+Usage (from the repository root):
+    python benchmarks/bench_forecast.py [--draws 10000 50000 200000] [--batch-size 10000] [--sample-size 1000]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ERM import ElectionData, forecast, load_inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--draws", type=int, nargs="+", default=[10000, 50000, 200000])
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--sample-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    votes_df, seats_df, params = load_inputs()
+    data = ElectionData.from_frames(votes_df, seats_df)
+    lv = data.votes.sum(axis=0)
+    polls = pd.DataFrame({"list":list(data.lists), "share":lv / lv.sum(), "sample_size":args.sample_size})
+
+    print(f"{'draws':>8s} {'s':>8s} {'draws/s':>10s} {'peak MB':>9s}")
+    for n in args.draws:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        res = forecast(polls, data, n=n, seed=0, batch_size=args.batch_size, **params)
+        dt = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{n:8d} {dt:8.2f} {n / dt:10.0f} {peak / 2**20:9.1f}")
+    print("\n" + res.coalitions.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Cold-start import time of ERM (python -X importtime) against a budget, for CLI runs and worker processes.
+
+Each run is a fresh interpreter doing only `import ERM`; the median over --runs is compared with
+--budget-ms (whole import, pandas and numpy included) and --own-budget-ms (what ERM adds on top of
+pandas and numpy). Reporting dependencies (reportlab, tabulate) and asyncio must not be imported at
+all: they are loaded on the first PDF or Markdown table and when the local service starts. The exit
+status is 1 when a check fails, so the script can guard cold start in CI.
+
+Usage (from the repository root):
+    python benchmarks/bench_import.py [--runs 7] [--budget-ms 1500] [--own-budget-ms 100] [--top 8]
+"""
+
+import argparse
+import os
+import py_compile
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+FORBIDDEN = ("reportlab", "tabulate", "asyncio")
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times():
+    # {modulo: (self us, cumulativo us, profondita')} di un interprete nuovo
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import ERM"], cwd=ROOT,
+                         capture_output=True, text=True, check=True).stderr
+    out = {}
+    for m in LINE.finditer(err):
+        out[m.group(4)] = (int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--runs", type=int, default=7)
+    ap.add_argument("--budget-ms", type=float, default=1500.0)
+    ap.add_argument("--own-budget-ms", type=float, default=100.0)
+    ap.add_argument("--top", type=int, default=8, help="direct imports of ERM to list")
+    args = ap.parse_args()
+
+    py_compile.compile(os.path.join(ROOT, "ERM.py"))  # .pyc aggiornato anche con PYTHONDONTWRITEBYTECODE
+    runs = [import_times() for _ in range(args.runs)]
+    total = statistics.median(r["ERM"][1] for r in runs) / 1e3
+    deps = statistics.median(sum(r[m][1] for m in ("pandas", "numpy") if m in r and r[m][2] == 1)
+                             for r in runs) / 1e3
+    own = total - deps
+    direct = sorted(((statistics.median(r[m][1] for r in runs if m in r) / 1e3, m)
+                     for m, (_, _, depth) in runs[-1].items() if depth == 1), reverse=True)
+
+    print(f"import ERM: {total:.1f} ms median of {args.runs} runs (pandas + numpy {deps:.1f} ms, ERM on top {own:.1f} ms)")
+    for ms, m in direct[:args.top]:
+        print(f"  {ms:8.1f} ms  {m}")
+
+    failed = []
+    loaded = sorted({m.split(".")[0] for r in runs for m in r if m.split(".")[0] in FORBIDDEN})
+    if loaded:
+        failed.append(f"modules loaded on first use imported at startup: {', '.join(loaded)}")
+    if total > args.budget_ms:
+        failed.append(f"import time {total:.1f} ms over the {args.budget_ms:.0f} ms budget")
+    if own > args.own_budget_ms:
+        failed.append(f"ERM adds {own:.1f} ms over the {args.own_budget_ms:.0f} ms budget")
+    for msg in failed:
+        print("FAIL:", msg)
+    if not failed:
+        print("OK: within budget, no reporting or service dependencies loaded")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Replay throughput of the live-count ingestion (LiveCount).
+
+The sample province x list votes are split at random into ~50 sections per provincial seat
+(~1,500 sections for Marche), shuffled and replayed through LiveCount; the last snapshot is
+checked against run_allocation on the full totals.
+
+Usage (from the repository root):
+    python benchmarks/bench_live.py [--every 1000] [--replays 3] [--seed 0]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ERM import ElectionModel, LiveCount
+
+
+def section_records(data, rng, per_seat=50):
+    # record (sezione, provincia, lista, voti) da una ripartizione multinomiale dei voti provinciali
+    recs = []
+    for p, prov in enumerate(data.provinces):
+        ns = max(1, int(data.province_seats[p]) * per_seat)
+        for l in np.flatnonzero(data.present[p]):
+            parts = rng.multinomial(int(data.votes[p, l]), np.full(ns, 1.0 / ns))
+            recs += [(f"{prov}-{s}", prov, data.lists[l], int(v)) for s, v in enumerate(parts)]
+    order = rng.permutation(len(recs))
+    return [recs[i] for i in order]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--every", type=int, default=1000, help="records between snapshots")
+    parser.add_argument("--replays", type=int, default=3, help="times the stream is replayed")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    model = ElectionModel.from_csv(*(os.path.join(ROOT, f) for f in
+                                     ("votes_marche_2025_all_provinces.csv", "seats_per_province.csv", "params.csv")))
+    recs = section_records(model.data, np.random.default_rng(args.seed))
+    stream = recs * args.replays
+
+    live = LiveCount(model, every=args.every)
+    t0 = time.perf_counter()
+    snaps = sum(1 for _ in live.ingest(stream))
+    elapsed = time.perf_counter() - t0
+
+    last = live.snapshot()
+    assert (last.allocation.seats == model.allocate().seats).all(), "final snapshot differs from the full allocation"
+    print(f"records: {len(stream)} ({last.sections} sections, {args.replays} replays)")
+    print(f"snapshots: {snaps} (every {args.every} records)")
+    print(f"throughput: {len(stream)/elapsed:,.0f} records/s ({elapsed*1e3:.1f} ms total)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Startup time of the vote loader: cold (CSV parse, cache written) against warm (binary cache hit).
+
+Runs on a temporary copy of the sample votes file, optionally replicated to --rows rows with the
+same quoted " 13,800 " format, so the repository is left untouched. The legacy path is the
+read_csv + strip + str.replace + to_numeric sequence the scripts used before load_votes.
+
+Usage (from the repository root):
+    python benchmarks/bench_load.py [--rows 1000000] [--repeat 5]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ERM import load_votes
+
+
+def legacy_load(path):
+    votes_df = pd.read_csv(path)
+    votes_df = votes_df.rename(columns=lambda x: x.strip())
+    if votes_df["votes"].dtype == 'object':
+        votes_df["votes"] = votes_df["votes"].astype(str).str.replace(',', '').astype(float)
+    votes_df["votes"] = pd.to_numeric(votes_df["votes"], errors="coerce").fillna(0)
+    return votes_df
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return np.median(times) * 1e3, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=0, help="replicate the sample to this many rows (0 = sample only)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per variant (median reported)")
+    args = parser.parse_args()
+
+    src = os.path.join(ROOT, "votes_marche_2025_all_provinces.csv")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "votes.csv")
+        if args.rows:
+            header, body = open(src, encoding="utf-8").read().split("\n", 1)
+            lines = body.strip("\n").split("\n")
+            reps = -(-args.rows // len(lines))
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(header + "\n" + ("\n".join(lines) + "\n") * reps)
+        else:
+            shutil.copy(src, path)
+        cache = f"{path}.npz"
+
+        def cold():
+            if os.path.exists(cache):
+                os.remove(cache)
+            return load_votes(path)
+
+        legacy, ref = timed(lambda: legacy_load(path), args.repeat)
+        cold_ms, _ = timed(cold, args.repeat)
+        load_votes(path)
+        warm_ms, warm = timed(lambda: load_votes(path), args.repeat)
+        pd.testing.assert_frame_equal(warm, ref, check_dtype=False)
+
+        print(f"rows: {len(ref):,} ({os.path.getsize(path)/1e6:.1f} MB csv, {os.path.getsize(cache)/1e6:.1f} MB cache)")
+        print(f"{'variant':<30}{'median ms':>12}")
+        print(f"{'legacy read_csv + cleanup':<30}{legacy:>12.2f}")
+        print(f"{'load_votes cold (parse+cache)':<30}{cold_ms:>12.2f}")
+        print(f"{'load_votes warm (cache hit)':<30}{warm_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
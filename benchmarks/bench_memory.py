@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Peak memory (tracemalloc) of each run_allocation stage: pipeline mode against copying stages.
+
+Pipeline mode drops the pre-filtered vote frame, the merges and the table copies between stages;
+each stage still builds its own columns, and group_seats_stage, grouping the unfiltered votes,
+allocates more than on the pre-filtered frame. The region is synthetic (benchmarks/synthetic.py)
+and large (--provinces x --lists rows, lists spread over --coalitions coalitions), so stage C-E
+tables dominate. The copying path is the stage chain run_allocation used before the pipeline mode:
+votes pre-filtered on the admitted coalitions, provincial_integers with .copy() and two merges,
+assign_residuals and reserve_runner_up copying their input table.
+
+Usage (from the repository root):
+    python benchmarks/bench_memory.py [--provinces 200] [--lists 500] [--coalitions 8]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ERM import (_quota_split, assign_residuals, coalitions_stage, group_seats_stage, provincial_integers,
+                 reserve_runner_up)
+from synthetic import synthetic_election
+
+
+def legacy_provincial_integers(votes_df, province_seats_df, admitted_coalitions):
+    v = votes_df[votes_df["coalition"].isin(admitted_coalitions)].copy()
+    prov = v.groupby("province", as_index=False)["votes"].sum().rename(columns={"votes":"prov_total"})
+    prov = prov.merge(province_seats_df, on="province", how="left")
+    prov["q_circ"] = (prov["prov_total"]//(prov["seats"]+1)).astype(int)
+    x = v.merge(prov[["province","seats","q_circ","prov_total"]], on="province", how="left")
+    x["int_seats"], x["rest_pct"] = _quota_split(x["votes"].to_numpy(dtype=float), x["q_circ"].to_numpy(),
+                                                 x["prov_total"].to_numpy(dtype=float))
+    return x, prov
+
+
+def run_stages(votes_df, seats_df, copying):
+    total = int(seats_df["seats"].sum())
+    stats, state = [], {}
+
+    def stage(name, fn):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        out = fn()
+        el = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        stats.append((name, peak/1e6, el*1e3))
+        return out
+
+    coal_votes, coal_seats = stage("coalitions_stage", lambda: coalitions_stage(votes_df, total, 0.43, 0.40))
+    admitted = coal_votes[coal_votes["admitted"]]["coalition"].tolist()
+    if copying:
+        state["votes"] = stage("filter admitted", lambda: votes_df[votes_df["coalition"].isin(admitted)])
+        integers = legacy_provincial_integers
+    else:
+        state["votes"] = votes_df
+        integers = provincial_integers
+    grp = stage("group_seats_stage", lambda: group_seats_stage(state["votes"], coal_seats))
+    step, meta = stage("provincial_integers", lambda: integers(state["votes"], seats_df, admitted))
+    alloc, order = stage("assign_residuals", lambda: assign_residuals(step, meta, grp, copy=copying))
+    final, _ = stage("reserve_runner_up", lambda: reserve_runner_up(alloc, order, votes_df, coal_votes, coal_seats,
+                                                                     copy=copying))
+    return stats, final
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--provinces", type=int, default=200)
+    parser.add_argument("--lists", type=int, default=500)
+    parser.add_argument("--coalitions", type=int, default=8)
+    args = parser.parse_args()
+
+    votes_df, seats_df, _ = synthetic_election(args.provinces, args.lists, args.coalitions, seats=6*args.provinces)
+    copy_stats, a = run_stages(votes_df, seats_df, copying=True)
+    pipe_stats, b = run_stages(votes_df, seats_df, copying=False)
+    assert (a["final_seats"].to_numpy() == b["final_seats"].to_numpy()).all()
+
+    print(f"{len(votes_df):,} rows, table of {b.memory_usage(deep=False).sum()/1e6:.1f} MB\n")
+    print(f"{'stage':<22}{'copying MB':>12}{'pipeline MB':>13}{'copying ms':>12}{'pipeline ms':>13}")
+    pipe = {name:(mb, ms) for name, mb, ms in pipe_stats}
+    for name, mb, ms in copy_stats:
+        pm, pt = pipe.get(name, (0.0, 0.0))
+        print(f"{name:<22}{mb:>12.1f}{pm:>13.1f}{ms:>12.0f}{pt:>13.0f}")
+    print(f"{'total allocated':<22}{sum(s[1] for s in copy_stats):>12.1f}{sum(s[1] for s in pipe_stats):>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
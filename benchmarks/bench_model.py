@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Per-call latency of ElectionModel.allocate() against run_allocation().
+
+run_allocation re-cleans the columns, re-parses the votes and rebuilds every lookup on each call;
+the model is built once and only receives the vote vector.
+
+Usage (from the repository root):
+    python benchmarks/bench_model.py [--calls 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ERM import ElectionModel, _read_params, run_allocation
+
+
+def per_call(fn, calls):
+    fn()  # warm-up
+    times = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return np.array(times) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=200, help="timed calls per variant")
+    args = parser.parse_args()
+
+    votes_df = pd.read_csv(os.path.join(ROOT, "votes_marche_2025_all_provinces.csv"))
+    seats_df = pd.read_csv(os.path.join(ROOT, "seats_per_province.csv"))
+    params = _read_params(pd.read_csv(os.path.join(ROOT, "params.csv")))
+
+    t0 = time.perf_counter()
+    model = ElectionModel.from_frames(votes_df, seats_df, **params)
+    build = (time.perf_counter() - t0) * 1e3
+    vector = model.data.votes[model.data.cells]
+
+    rows = [("run_allocation", per_call(lambda: run_allocation(votes_df, seats_df, **params), args.calls)),
+            ("model.allocate", per_call(lambda: model.allocate(vector), args.calls)),
+            ("model.allocate + to_frames", per_call(lambda: model.allocate(vector).to_frames(), args.calls))]
+
+    print(f"model build: {build:.2f} ms (once)")
+    print(f"{'variant':<28}{'median ms':>12}{'p95 ms':>10}{'speed-up':>10}")
+    base = np.median(rows[0][1])
+    for name, t in rows:
+        print(f"{name:<28}{np.median(t):>12.3f}{np.percentile(t, 95):>10.3f}{base/np.median(t):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Cost of the per-stage instrumentation (StageProfile): disabled, timing only and with memory tracing.
+
+Prints the per-stage summary of a profiled run and, with --trace, writes the Chrome trace
+(open it in chrome://tracing or https://ui.perfetto.dev).
+
+Usage (from the repository root):
+    python benchmarks/bench_profile.py [--repeat 50] [--scenarios 20000] [--trace trace.json]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ERM import StageProfile, _instrumented, load_inputs, run_allocation, simulate
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return np.median(times) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=50, help="timed run_allocation calls per variant (median reported)")
+    parser.add_argument("--scenarios", type=int, default=20000, help="Monte Carlo scenarios of the profiled projection")
+    parser.add_argument("--trace", help="write the Chrome trace of the profiled runs to this file")
+    args = parser.parse_args()
+
+    votes_df, seats_df, params = load_inputs(*(os.path.join(ROOT, f) for f in
+                                               ("votes_marche_2025_all_provinces.csv", "seats_per_province.csv",
+                                                "params.csv")))
+    run = lambda: run_allocation(votes_df, seats_df, **params)
+
+    # costo del controllo a strumentazione spenta, su una funzione vuota
+    noop = lambda: None
+    wrapped = _instrumented("noop")(noop)
+    n = 1_000_000
+    t0 = time.perf_counter()
+    for _ in range(n): noop()
+    t1 = time.perf_counter()
+    for _ in range(n): wrapped()
+    t2 = time.perf_counter()
+    print(f"disabled hook: {((t2 - t1) - (t1 - t0)) / n * 1e9:.0f} ns per stage call")
+
+    off = timed(run, args.repeat)
+    with StageProfile():
+        on = timed(run, args.repeat)
+    with StageProfile(memory=True):
+        mem = timed(run, args.repeat)
+    print(f"run_allocation: {off:.1f} ms disabled, {on:.1f} ms timing, {mem:.1f} ms timing + memory\n")
+
+    with StageProfile(memory=True) as prof:
+        run()
+        simulate(votes_df, seats_df, n=args.scenarios, seed=0, **params)
+    print(prof.summary().to_string(index=False))
+    if args.trace:
+        prof.to_chrome_trace(args.trace)
+        print(f"\nChrome trace written to {args.trace}")
+
+
+if __name__ == "__main__":
+    main()
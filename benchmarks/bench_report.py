@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Report rendering for many scenarios: shared in-memory recap against the CSV round-trip path.
+
+Each scenario is the sample election with every vote scaled by a random factor (--noise). The
+round-trip path is what ERM.py's __main__ did before the report layer: write the run_allocation
+outputs to CSV, read provincial_results.csv back and call one generate_* function per format, each
+recomputing the recap tables. The shared path converts each Allocation once with
+ReportData.from_allocation and renders every format from it (render_reports).
+
+Usage (from the repository root):
+    python benchmarks/bench_report.py [--scenarios 50] [--noise 0.05] [--pdf]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ERM import (REPORT_FILES, ElectionModel, _provincial_results, calculate_provincial_quota,
+                 generate_province_seat_heatmap, generate_province_seat_markdown, generate_province_seat_pdf,
+                 render_reports)
+
+
+def round_trip(model, allocs, out_dir, formats):
+    seats_df = pd.DataFrame({"province":list(model.data.provinces), "seats":model.data.province_seats})
+    for i, alloc in enumerate(allocs):
+        final, coal_seats, grp_seats, _ = alloc.to_frames()
+        votes_df = alloc.data.cells_frame()
+        prefix = os.path.join(out_dir, f"scenario_{i}_")
+        _provincial_results(final).to_csv(prefix + "provincial_results.csv", index=False)
+        coal_seats.to_csv(prefix + "coalition_seats.csv", index=False)
+        grp_seats.to_csv(prefix + "group_seats.csv", index=False)
+        results = pd.read_csv(prefix + "provincial_results.csv")
+        coal_seats = pd.read_csv(prefix + "coalition_seats.csv")
+        grp_seats = pd.read_csv(prefix + "group_seats.csv")
+        if "markdown" in formats:
+            quota_df = calculate_provincial_quota(votes_df, seats_df)
+            generate_province_seat_markdown(votes_df, results, quota_df, seats_df, prefix + REPORT_FILES["markdown"],
+                                            coal_seats, grp_seats)
+        if "heatmap" in formats:
+            generate_province_seat_heatmap(results, prefix + REPORT_FILES["heatmap"])
+        if "pdf" in formats:
+            generate_province_seat_pdf(results, prefix + REPORT_FILES["pdf"], seats_df, votes_df, coal_seats, grp_seats)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--scenarios", type=int, default=50)
+    ap.add_argument("--noise", type=float, default=0.05)
+    ap.add_argument("--pdf", action="store_true", help="also render the PDF report")
+    args = ap.parse_args()
+
+    os.chdir(ROOT)
+    model = ElectionModel.from_csv()
+    rng = np.random.default_rng(0)
+    base = model.data.votes.astype(float)
+    allocs = [model.allocate((base * rng.lognormal(0.0, args.noise, base.shape)).round())
+              for _ in range(args.scenarios)]
+    formats = ("markdown", "heatmap") + (("pdf",) if args.pdf else ())
+
+    for name, fn in (("csv round-trip", lambda d: round_trip(model, allocs, d, formats)),
+                     ("shared recap", lambda d: render_reports(allocs, d, formats))):
+        with tempfile.TemporaryDirectory() as d:
+            t0 = time.perf_counter()
+            fn(d)
+            dt = time.perf_counter() - t0
+        print(f"{name:15s} {args.scenarios} scenarios x {len(formats)} formats: {dt:.2f} s "
+              f"({1e3*dt/args.scenarios:.1f} ms/scenario)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Load test of the local allocation service (ERM.serve): latency and throughput under concurrency.
+
+Starts `ERM.serve` in a subprocess (or targets a running one with --port) and opens --concurrency
+keep-alive connections, each sending perturbed copies of the sample votes to POST /allocate (or
+--batch scenarios at a time to POST /allocate/batch). Reports requests per second, latency
+percentiles and how many requests the service coalesced per engine call (from GET /health), next
+to a cold `python -c "import ERM; ERM.run_allocation(...)"` process per request, as scripts that
+shell out to ERM.py do. One response is checked against run_allocation.
+
+Usage (from the repository root):
+    python benchmarks/bench_service.py [--requests 2000] [--concurrency 32] [--batch 0] [--jobs 0]
+                                       [--port PORT] [--cold 3] [--seed 0]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ERM import load_inputs, run_allocation
+
+COLD = ("import ERM; v, s, p = ERM.load_inputs(); r = ERM.run_allocation(v, s, **p); "
+        "ERM._provincial_results(r[0]).to_csv('{out}', index=False)")
+
+
+def scenarios(votes_df, n, seed):
+    # richieste nella forma {provincia: {lista: voti}}
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(n):
+        v = (votes_df["votes"].to_numpy() * rng.lognormal(0.0, 0.1, len(votes_df))).round().astype(int)
+        req = {}
+        for prov, name, x in zip(votes_df["province"], votes_df["list"], v.tolist()):
+            req.setdefault(prov, {})[name] = x
+        out.append({"votes":req})
+    return out
+
+
+async def call(reader, writer, method, path, obj=None):
+    body = b"" if obj is None else json.dumps(obj).encode()
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    size = next(int(l.split(b":")[1]) for l in head.split(b"\r\n") if l.lower().startswith(b"content-length"))
+    status = int(head.split(b" ")[1])
+    return status, json.loads(await reader.readexactly(size))
+
+
+async def load(port, payloads, concurrency, path):
+    # concurrency connessioni keep-alive che si dividono le richieste
+    latencies, todo = [], list(reversed(payloads))
+
+    async def client():
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        while todo:
+            payload = todo.pop()
+            t0 = time.perf_counter()
+            status, body = await call(reader, writer, "POST", path, payload)
+            latencies.append(time.perf_counter() - t0)
+            assert status == 200, body
+        writer.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - t0, np.array(latencies)
+
+
+async def health(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    out = (await call(reader, writer, "GET", "/health"))[1]
+    writer.close()
+    return out
+
+
+async def first(port, request):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    out = (await call(reader, writer, "POST", "/allocate", request))[1]
+    writer.close()
+    return out
+
+
+def start_service(jobs):
+    proc = subprocess.Popen([sys.executable, "-c", f"import ERM; ERM.serve(port=0, jobs={jobs})"], cwd=ROOT,
+                            stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line:
+        raise SystemExit("service did not start")
+    return proc, int(line.split("http://")[1].split(":")[1].split(" ")[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--batch", type=int, default=0, help="scenarios per /allocate/batch call (0 = /allocate)")
+    parser.add_argument("--jobs", type=int, default=0, help="worker processes of the started service")
+    parser.add_argument("--port", type=int, default=None, help="running service to target")
+    parser.add_argument("--cold", type=int, default=3, help="cold ERM processes to time (0 = skip)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    votes_df, seats_df, params = load_inputs()
+    reqs = scenarios(votes_df, args.requests, args.seed)
+    if args.batch:
+        payloads = [{"scenarios":reqs[i:i + args.batch]} for i in range(0, len(reqs), args.batch)]
+        path = "/allocate/batch"
+    else:
+        payloads, path = reqs, "/allocate"
+
+    proc, port = (None, args.port) if args.port else start_service(args.jobs)
+    try:
+        before = asyncio.run(health(port))
+        wall, lat = asyncio.run(load(port, payloads, args.concurrency, path))
+        after = asyncio.run(health(port))
+        check = asyncio.run(first(port, reqs[0]))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    batches = after["batches"] - before["batches"]
+    print(f"{args.requests} scenarios over {len(payloads)} {path} calls, {args.concurrency} connections\n")
+    print(f"throughput    {args.requests / wall:9.1f} scenarios/s  ({wall:.2f} s)")
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99]) * 1e3
+    print(f"latency       p50 {p50:.2f} ms  p95 {p95:.2f} ms  p99 {p99:.2f} ms  (per call)")
+    print(f"coalescing    {batches} engine calls, {args.requests / max(batches, 1):.1f} scenarios per call")
+
+    if args.cold:
+        times = []
+        for _ in range(args.cold):
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, "-c", COLD.format(out=os.devnull)], cwd=ROOT, check=True)
+            times.append(time.perf_counter() - t0)
+        print(f"cold process  {1e3 * np.median(times):9.1f} ms per request (median of {args.cold})")
+
+    # verifica: la prima richiesta contro run_allocation
+    v = votes_df.copy()
+    v["votes"] = [reqs[0]["votes"][p][l] for p, l in zip(v["province"], v["list"])]
+    ref = run_allocation(v, seats_df, **params)[0].sort_values(["province", "list"])
+    got = sorted((r["province"], r["list"], r["final_seats"]) for r in check["provincial_results"])
+    assert got == list(zip(ref["province"], ref["list"], ref["final_seats"])), "service result differs from run_allocation"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo output memory: full seat tensor against streaming accumulators for increasing scenario counts.
+
+Runs `simulate` with the default result (scenarios × provinces × lists seat tensor plus per-scenario
+coalition outcomes) and with `accumulate=True` (SeatAccumulator: seat histograms, residual counts and
+joint outcomes folded in per block), and prints the run time and tracemalloc peak of each. The summaries
+of both are checked to be identical. The tensor path is skipped above --max-tensor scenarios.
+
+Usage (from the repository root):
+    python benchmarks/bench_stream.py [--scenarios 10000 100000 1000000] [--batch-size 10000] [--max-tensor 200000]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ERM import ElectionData, load_inputs, simulate
+
+
+def measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn()
+    dt = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return out, dt, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenarios", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--max-tensor", type=int, default=200000, help="largest run that keeps the tensor")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    votes_df, seats_df, params = load_inputs()
+    data = ElectionData.from_frames(votes_df, seats_df)
+
+    print(f"{'scenarios':>10s} {'tensor s':>9s} {'tensor MB':>10s} {'stream s':>9s} {'stream MB':>10s}")
+    for n in args.scenarios:
+        run = lambda **kw: simulate(data, None, n=n, seed=0, batch_size=args.batch_size, **params, **kw)
+        acc, t_stream, m_stream = measure(lambda: run(accumulate=True))
+        if n <= args.max_tensor:
+            res, t_tensor, m_tensor = measure(run)
+            old, new = res.summary(), acc.summary()
+            for k in old:
+                pd.testing.assert_frame_equal(new[k][old[k].columns], old[k], check_dtype=False)
+            del res
+            tensor = f"{t_tensor:9.2f} {m_tensor:10.1f}"
+        else:
+            tensor = f"{'-':>9s} {'-':>10s}"
+        print(f"{n:10d} {tensor} {t_stream:9.2f} {m_stream:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
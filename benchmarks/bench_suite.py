@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmark suite: dhondt, every stage, run_allocation, the batched engine and the reports on seeded synthetic elections.
+
+Each size (benchmarks/synthetic.py: marche, region, national, or a custom one from --provinces,
+--lists, --coalitions, --seats) is generated from --seed, so two runs with the same arguments time
+the same data; the content digest of every size is stored with the results. Each case is timed with
+timeit (autorange, then the best of --repeat) and reported per call; batched cases also report per
+scenario. --save writes the results and the environment (Python, NumPy, pandas, commit) as a JSON
+baseline; --compare prints the ratio against a baseline and exits with status 1 when a case on the
+same data is slower by more than --tolerance (batched cases are compared per scenario).
+
+Usage (from the repository root):
+    python benchmarks/bench_suite.py [--sizes marche region national] [--scenarios 1000] [--repeat 5]
+                                     [--cases run_allocation render] [--no-pdf]
+                                     [--save benchmarks/baselines/reference.json] [--compare FILE]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ERM import (ElectionData, ElectionModel, assign_residuals, build_report, coalitions_stage, dhondt,
+                 dhondt_batch, group_seats_stage, provincial_integers, render_heatmap, render_markdown, render_pdf,
+                 reserve_runner_up, run_allocation)
+from synthetic import SIZES, digest, scenario_votes, synthetic_election
+
+
+def cases(votes_df, seats_df, params, scenarios, seed, pdf, tmp):
+    # (nome, funzione, scenari per chiamata) sugli input intermedi di una run_allocation
+    p = params
+    stage_args = (p["total_list_seats"], p["pct19"], p["pct18"], p["seats19"], p["seats18"],
+                  p["coal_threshold"], p["list_threshold"])
+    coal_votes, coal_seats = coalitions_stage(votes_df, *stage_args)
+    admitted = coal_votes[coal_votes["admitted"]]["coalition"].tolist()
+    grp_seats = group_seats_stage(votes_df, coal_seats)
+    step, meta = provincial_integers(votes_df, seats_df, admitted)
+    alloc, order = assign_residuals(step, meta, grp_seats)
+    final, _ = reserve_runner_up(alloc, order, votes_df, coal_votes, coal_seats)
+    totals = dict(zip(coal_votes["coalition"], coal_votes["total_coal_votes"]))
+
+    data = ElectionData.from_frames(votes_df, seats_df)
+    model = ElectionModel(data, **params)
+    V = scenario_votes(data.votes, scenarios, seed=seed)
+    lc = data.list_coalition
+    coal_V = np.stack([V[:, :, lc == c].sum(axis=(1, 2)) for c in range(len(data.coalitions))], axis=1)
+    report = build_report(final, coal_seats, grp_seats, votes_df, seats_df)
+
+    out = [
+        ("dhondt", lambda: dhondt(totals, p["total_list_seats"]), 1),
+        ("dhondt_batch", lambda: dhondt_batch(coal_V, p["total_list_seats"]), scenarios),
+        ("coalitions_stage", lambda: coalitions_stage(votes_df, *stage_args), 1),
+        ("group_seats_stage", lambda: group_seats_stage(votes_df, coal_seats), 1),
+        ("provincial_integers", lambda: provincial_integers(votes_df, seats_df, admitted), 1),
+        ("assign_residuals", lambda: assign_residuals(step, meta, grp_seats), 1),
+        ("reserve_runner_up", lambda: reserve_runner_up(alloc, order, votes_df, coal_votes, coal_seats), 1),
+        ("run_allocation", lambda: run_allocation(votes_df, seats_df, **params), 1),
+        ("model.allocate", lambda: model.allocate(data.votes), 1),
+        ("model.allocate_batch", lambda: model.allocate_batch(V), scenarios),
+        ("build_report", lambda: build_report(final, coal_seats, grp_seats, votes_df, seats_df), 1),
+        ("render_markdown", lambda: render_markdown(report), 1),
+        ("render_heatmap", lambda: render_heatmap(report), 1),
+    ]
+    if pdf:
+        out.append(("render_pdf", lambda: render_pdf(report, os.path.join(tmp, "report.pdf")), 1))
+    return out
+
+
+def measure(fn, repeat):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    times = np.array(timer.repeat(repeat, number)) / number
+    return {"seconds":float(times.min()), "median":float(np.median(times)), "number":number, "repeat":repeat}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"created":datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "commit":commit, "python":platform.python_version(), "numpy":np.__version__,
+            "pandas":pd.__version__, "platform":platform.platform(), "cpus":os.cpu_count()}
+
+
+def compare(results, sizes, baseline, tolerance):
+    base = {(r["size"], r["case"]):r for r in baseline["results"]}
+    slower = 0
+    print(f"\n{'size':<10}{'case':<22}{'baseline':>12}{'now':>12}{'ratio':>8}")
+    for r in results:
+        b = base.get((r["size"], r["case"]))
+        if b is None:
+            continue
+        if baseline["sizes"].get(r["size"], {}).get("digest") != sizes[r["size"]]["digest"]:
+            print(f"{r['size']:<10}{r['case']:<22}{'different synthetic data, not compared':>32}")
+            continue
+        ratio = (r["seconds"] / r["items"]) / (b["seconds"] / b["items"])
+        flag = "  SLOWER" if ratio > 1 + tolerance else ""
+        slower += bool(flag)
+        print(f"{r['size']:<10}{r['case']:<22}{1e3*b['seconds']:>10.3f}ms{1e3*r['seconds']:>10.3f}ms{ratio:>8.2f}{flag}")
+    return slower
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES) + ["custom"])
+    ap.add_argument("--provinces", type=int, default=50, help="custom size")
+    ap.add_argument("--lists", type=int, default=40, help="custom size")
+    ap.add_argument("--coalitions", type=int, default=6, help="custom size")
+    ap.add_argument("--seats", type=int, default=200, help="custom size")
+    ap.add_argument("--scenarios", type=int, default=1000, help="vote vectors of the batched cases")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--cases", nargs="+", help="run only the cases whose name contains one of these strings")
+    ap.add_argument("--no-pdf", action="store_true", help="skip render_pdf")
+    ap.add_argument("--save", help="write the results as a JSON baseline")
+    ap.add_argument("--compare", help="JSON baseline to compare with")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a case is flagged")
+    args = ap.parse_args()
+
+    sizes, results = {}, []
+    custom = dict(provinces=args.provinces, lists=args.lists, coalitions=args.coalitions, seats=args.seats)
+    print(f"{'size':<10}{'case':<22}{'per call':>12}{'per scenario':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.sizes:
+            size = custom if name == "custom" else SIZES[name]
+            votes_df, seats_df, params = synthetic_election(**size, seed=args.seed)
+            sizes[name] = dict(size, seed=args.seed, scenarios=args.scenarios, rows=len(votes_df),
+                               digest=digest(votes_df, seats_df))
+            for case, fn, items in cases(votes_df, seats_df, params, args.scenarios, args.seed, not args.no_pdf, tmp):
+                if args.cases and not any(c in case for c in args.cases):
+                    continue
+                r = dict(size=name, case=case, items=items, **measure(fn, args.repeat))
+                results.append(r)
+                per_item = f"{1e6*r['seconds']/items:>12.2f}us" if items > 1 else ""
+                print(f"{name:<10}{case:<22}{1e3*r['seconds']:>10.3f}ms{per_item:>14}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"environment":environment(), "sizes":sizes, "results":results}, f, indent=1)
+        print(f"\nbaseline written to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            slower = compare(results, sizes, json.load(f), args.tolerance)
+        if slower:
+            print(f"\n{slower} case(s) slower than the baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
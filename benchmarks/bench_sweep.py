@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Scaling of the parameter sweep (sweep) with the number of worker processes.
+
+The grid crosses TOTAL_LIST_SEATS, the 19-seat bonus threshold (the 18-seat one 3 points below),
+the coalition admission threshold and three seats_per_province splits.
+
+Usage (from the repository root):
+    python benchmarks/bench_sweep.py [--points 10000] [--jobs 1 2 4 8]
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ERM import ElectionModel, sweep
+
+
+def make_grid(model, points):
+    base = model.data.province_seats
+    splits = [tuple(base), tuple(base + np.eye(len(base), dtype=int)[0] - np.eye(len(base), dtype=int)[-1]),
+              tuple(base - np.eye(len(base), dtype=int)[0] + np.eye(len(base), dtype=int)[-1])]
+    seats = range(24, 41)
+    coal = (0.04, 0.05, 0.06)
+    n19 = max(1, -(-points // (len(seats) * len(coal) * len(splits))))
+    grid = [dict(total_list_seats=t, pct19=p, pct18=p - 0.03, coal_threshold=c, province_seats=s)
+            for t, p, c, s in itertools.product(seats, np.linspace(0.35, 0.50, n19), coal, splits)]
+    return grid[:points]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--points", type=int, default=10000, help="grid points")
+    parser.add_argument("--jobs", type=int, nargs="+", default=None, help="worker counts to time (default 1..cores, doubling)")
+    args = parser.parse_args()
+
+    model = ElectionModel.from_csv(*(os.path.join(ROOT, f) for f in
+                                     ("votes_marche_2025_all_provinces.csv", "seats_per_province.csv", "params.csv")))
+    grid = make_grid(model, args.points)
+    cores = os.cpu_count() or 1
+    jobs = args.jobs or sorted({min(2**i, cores) for i in range(cores.bit_length() + 1)})
+
+    print(f"grid points: {len(grid)}, cores: {cores}")
+    print(f"{'jobs':>5}{'seconds':>10}{'points/s':>12}{'speed-up':>10}")
+    base = None
+    for j in jobs:
+        t0 = time.perf_counter()
+        table = sweep(model, grid, jobs=j)
+        dt = time.perf_counter() - t0
+        base = base or dt
+        print(f"{j:>5}{dt:>10.2f}{len(grid)/dt:>12,.0f}{base/dt:>9.1f}x")
+    print(f"\ntable rows: {len(table):,}")
+
+
+if __name__ == "__main__":
+    main()
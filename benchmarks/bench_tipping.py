@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Run time of the seat tipping-point analysis (tipping_points) on the sample region.
+
+Usage (from the repository root):
+    python benchmarks/bench_tipping.py [--repeat 5] [--top 10]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ERM import ElectionModel, tipping_points
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs (median reported)")
+    parser.add_argument("--top", type=int, default=10, help="fragile seats to print")
+    args = parser.parse_args()
+
+    model = ElectionModel.from_csv(*(os.path.join(ROOT, f) for f in
+                                     ("votes_marche_2025_all_provinces.csv", "seats_per_province.csv", "params.csv")))
+    times = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        table = tipping_points(model)
+        times.append(time.perf_counter() - t0)
+    print(table.head(args.top).to_string(index=False))
+    print(f"\n{len(table)} seat entries analysed in {np.median(times)*1e3:.0f} ms (median of {args.repeat})")
+
+
+if __name__ == "__main__":
+    main()
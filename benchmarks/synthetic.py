@@ -0,0 +1,93 @@
+"""
+Seeded synthetic elections for the benchmarks, from the Marche size up to national-scale sizes.
+
+The same (provinces, lists, coalitions, seats, seed) always gives the same tables, with the schema
+of votes_marche_2025_all_provinces.csv and seats_per_province.csv:
+- province electorates are log-normal around 120,000 votes; seats are one per province plus the
+  rest by largest remainder on the electorate;
+- coalition strengths are two large blocs and a tail of small coalitions; every coalition has at
+  least one list and one president;
+- province x list shares are a Dirichlet draw around the regional list shares, so that residuals
+  and group caps vary across provinces.
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+SIZES = {
+    "marche": dict(provinces=5, lists=18, coalitions=5, seats=30),
+    "region": dict(provinces=20, lists=30, coalitions=6, seats=80),
+    "national": dict(provinces=120, lists=50, coalitions=8, seats=600),
+}
+
+
+def province_seats(electorate, seats):
+    # un seggio per provincia, il resto con i resti piu' alti sull'elettorato
+    if seats < len(electorate):
+        raise ValueError(f"{seats} seats cannot give one to each of {len(electorate)} provinces")
+    quota = (seats - len(electorate)) * electorate / electorate.sum()
+    out = np.floor(quota).astype(np.int64)
+    extra = seats - len(electorate) - out.sum()
+    out[np.argsort(out - quota, kind="stable")[:extra]] += 1
+    return out + 1
+
+
+def synthetic_election(provinces=5, lists=18, coalitions=5, seats=30, seed=0, spread=200.0):
+    """
+    Builds one synthetic election.
+    Args:
+        provinces, lists, coalitions (int): sizes (lists >= coalitions)
+        seats (int): total list seats, split over the provinces (>= provinces)
+        seed (int): seed of the random generator
+        spread (float): Dirichlet concentration of the province shares (lower = more regional variation)
+    Returns:
+        tuple: (votes_df, seats_df, params) where params are the run_allocation keyword arguments, with the
+        19/18 bonus seats scaled to the seat total
+    """
+    if lists < coalitions:
+        raise ValueError("every coalition needs at least one list")
+    rng = np.random.default_rng(seed)
+    prov = [f"P{i:03d}" for i in range(provinces)]
+    names = [f"L{i:03d}" for i in range(lists)]
+    coal = [f"C{i:02d}" for i in range(coalitions)]
+    list_coal = np.r_[np.arange(coalitions), rng.integers(0, coalitions, lists - coalitions)]
+
+    coal_share = rng.dirichlet(np.r_[10.0, 9.0, np.full(max(coalitions - 2, 0), 1.2)][:coalitions])
+    list_share = np.empty(lists)
+    for c in range(coalitions):
+        members = np.flatnonzero(list_coal == c)
+        list_share[members] = coal_share[c] * rng.dirichlet(np.full(len(members), 1.5))
+    electorate = rng.lognormal(0.0, 0.5, provinces)
+    electorate = electorate / electorate.mean() * 120000
+    shares = rng.dirichlet(spread * list_share + 1e-3, provinces)
+    votes = np.round(electorate[:, None] * shares)
+
+    votes_df = pd.DataFrame({"province":np.repeat(prov, lists), "list":np.tile(names, provinces),
+                             "coalition":np.tile(np.array(coal, dtype=object)[list_coal], provinces),
+                             "president":np.tile(np.array([f"Presidente {c}" for c in coal],
+                                                          dtype=object)[list_coal], provinces),
+                             "votes":votes.ravel()})
+    seats_df = pd.DataFrame({"province":prov, "seats":province_seats(electorate, seats)})
+    params = dict(total_list_seats=seats, pct19=0.43, pct18=0.40, seats19=round(seats*19/30),
+                  seats18=round(seats*18/30), coal_threshold=0.05, list_threshold=0.03)
+    return votes_df, seats_df, params
+
+
+def scenario_votes(votes, n, noise=0.05, seed=0):
+    """
+    n perturbed copies of a (provinces, lists) vote matrix: each vote scaled by a log-normal factor
+    of spread `noise` and rounded. Returns an (n, provinces, lists) float array.
+    """
+    rng = np.random.default_rng(seed)
+    votes = np.asarray(votes, dtype=float)
+    return np.round(votes * rng.lognormal(0.0, noise, (n,) + votes.shape))
+
+
+def digest(*frames):
+    # impronta del contenuto, per confrontare solo misure fatte sugli stessi dati
+    h = hashlib.sha256()
+    for df in frames:
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()[:16]
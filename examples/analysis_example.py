@@ -9,15 +9,13 @@ This example demonstrates how to analyze election results:
 4. Group cap effects
 """
 
-import pandas as pd
 import sys
 import os
 
 # Add the parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from ERM import (run_allocation, coalitions_stage, group_seats_stage, 
-                 provincial_integers, assign_residuals, calculate_provincial_quota)
+from ERM import run_allocation, coalitions_stage, calculate_provincial_quota, load_inputs
 
 def analyze_provincial_quotas(votes_df, seats_df):
     """Analyze provincial quota calculations."""
@@ -120,13 +118,9 @@ def main():
     
     # Load data
     try:
-        votes_df = pd.read_csv("../votes_marche_2025_all_provinces.csv")
-        seats_df = pd.read_csv("../seats_per_province.csv")
-        params = pd.read_csv("../params.csv")
-        
-        total = int(params.loc[params["key"]=="TOTAL_LIST_SEATS", "value"].iloc[0])
-        pct19 = float(params.loc[params["key"]=="BONUS_TARGET_PCT_19", "value"].iloc[0])
-        pct18 = float(params.loc[params["key"]=="BONUS_TARGET_PCT_18", "value"].iloc[0])
+        votes_df, seats_df, params = load_inputs("../votes_marche_2025_all_provinces.csv",
+                                                 "../seats_per_province.csv", "../params.csv")
+        total, pct19, pct18 = params["total_list_seats"], params["pct19"], params["pct18"]
         
     except FileNotFoundError as e:
         print(f"Error loading data: {e}")
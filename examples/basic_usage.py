@@ -9,14 +9,13 @@ This example demonstrates the basic workflow:
 4. Generate reports
 """
 
-import pandas as pd
 import sys
 import os
 
 # Add the parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from ERM import run_allocation
+from ERM import run_allocation, load_inputs
 
 def main():
     """Run a basic election simulation."""
@@ -25,14 +24,9 @@ def main():
     
     # Load input data
     try:
-        votes_df = pd.read_csv("../votes_marche_2025_all_provinces.csv")
-        seats_df = pd.read_csv("../seats_per_province.csv") 
-        params = pd.read_csv("../params.csv")
-        
-        # Get parameters
-        total = int(params.loc[params["key"]=="TOTAL_LIST_SEATS", "value"].iloc[0])
-        pct19 = float(params.loc[params["key"]=="BONUS_TARGET_PCT_19", "value"].iloc[0])
-        pct18 = float(params.loc[params["key"]=="BONUS_TARGET_PCT_18", "value"].iloc[0])
+        votes_df, seats_df, params = load_inputs("../votes_marche_2025_all_provinces.csv",
+                                                 "../seats_per_province.csv", "../params.csv")
+        total, pct19, pct18 = params["total_list_seats"], params["pct19"], params["pct18"]
         
         print(f"Loaded data for {len(votes_df)} vote records across {votes_df['province'].nunique()} provinces")
         print(f"Parameters: {total} total seats, {pct19:.0%} threshold for 19 seats, {pct18:.0%} for 18 seats\n")
@@ -0,0 +1,199 @@
+"""
+Frozen copy of the 1.0.0 allocation (dhondt and stages A–E of ERM.py), the reference of the regression tests.
+
+Kept as released except for the documented behaviour changes since then:
+- the bonus seats are the seats19/seats18 arguments instead of the literals 19/18;
+- single-key rankings use a stable sort, so ties follow row order (the unstable default sort left them
+  unspecified; see CHANGELOG "Changed");
+- the reserve_runner_up fallback filters with isin (it raised TypeError on 'list in set');
+- float()/int() of one-element Series read the value with .iloc[0].
+Do not optimise this module: it is the "old" side of the comparison.
+"""
+
+from math import floor
+
+import pandas as pd
+
+
+def dhondt(values, seats):
+    # Art. 19, comma 1: D'Hondt method for proportional seat allocation
+    if seats <= 0 or sum(values.values()) <= 0:
+        return {k:0 for k in values}
+    qs=[]
+    for k,v in values.items():
+        for d in range(1,seats+1):
+            qs.append((k, v/d))
+    qs.sort(key=lambda x:x[1], reverse=True)
+    win=[k[0] for k in qs[:seats]]
+    return {k:win.count(k) for k in values}
+
+# ---------- A) coalizioni: soglia + seggi + premio minimo ----------
+def coalitions_stage(votes_df, total_list_seats, pct19, pct18, seats19=19, seats18=18):
+    list_reg = votes_df.groupby(["list","coalition"], as_index=False)["votes"].sum()
+    coal = list_reg.groupby("coalition", as_index=False)["votes"].sum().rename(columns={"votes":"list_votes"})
+    if "pres_votes" in votes_df.columns:
+        pres = votes_df.groupby("coalition", as_index=False)["pres_votes"].sum()
+        coal = coal.merge(pres, on="coalition", how="left").fillna({"pres_votes":0})
+    else:
+        coal["pres_votes"]=0
+    coal["total_coal_votes"]=coal["list_votes"]+coal["pres_votes"]
+
+    tot_coal = coal["total_coal_votes"].sum()
+    coal["coal_share"]=coal["total_coal_votes"]/tot_coal if tot_coal>0 else 0
+
+    tot_list = list_reg["votes"].sum()
+    mx = list_reg.assign(list_share=list_reg["votes"]/tot_list if tot_list>0 else 0)\
+                 .groupby("coalition")["list_share"].max().reset_index().rename(columns={"list_share":"max_list_share"})
+    coal = coal.merge(mx, on="coalition", how="left")
+    coal["admitted"] = (coal["coal_share"]>=0.05) | (coal["max_list_share"]>0.03)
+    coal.loc[coal["total_coal_votes"]<=0,"admitted"]=False
+
+    adm = coal[coal["admitted"]].copy()
+    base = dhondt(dict(zip(adm["coalition"], adm["total_coal_votes"])), total_list_seats)
+    coal_seats = pd.DataFrame({"coalition":list(base.keys()), "seats":list(base.values())})
+
+    # premio minimo 19/18
+    if not coal_seats.empty:
+        leader = adm.sort_values("total_coal_votes", ascending=False, kind="stable")["coalition"].iloc[0]
+        lshare = float(adm.loc[adm["coalition"]==leader,"coal_share"].iloc[0])
+        need = seats19 if lshare>=pct19 else (seats18 if lshare>=pct18 else 0)
+        got = int(coal_seats.loc[coal_seats["coalition"]==leader,"seats"].iloc[0])
+        if need>0 and got<need:
+            remaining = total_list_seats-need
+            others = adm[adm["coalition"]!=leader]
+            other_counts = dhondt(dict(zip(others["coalition"], others["total_coal_votes"])), remaining)
+            coal_seats = pd.concat([
+                pd.DataFrame({"coalition":[leader], "seats":[need]}),
+                pd.DataFrame({"coalition":list(other_counts.keys()), "seats":list(other_counts.values())})
+            ], ignore_index=True)
+    return coal, coal_seats
+
+# ---------- B) seggi ai gruppi di liste dentro le coalizioni ----------
+def group_seats_stage(votes_df, coal_seats_df):
+    reg = votes_df.groupby(["list","coalition"], as_index=False)["votes"].sum()
+    out=[]
+    for _,r in coal_seats_df.iterrows():
+        c, S = r["coalition"], int(r["seats"])
+        sub = reg[reg["coalition"]==c].copy()
+        if S<=0 or sub["votes"].sum()<=0:
+            out.append(sub.assign(group_seats=0)[["list","coalition","group_seats"]]); continue
+        q = floor(sub["votes"].sum()/(S+1))
+        if q<=0:
+            sub=sub.sort_values("votes", ascending=False, kind="stable").reset_index(drop=True)
+            sub["group_seats"]=0
+            for i in range(S): sub.loc[i%len(sub),"group_seats"]+=1
+            out.append(sub[["list","coalition","group_seats"]]); continue
+        sub["qi"]=(sub["votes"]//q).astype(int)
+        rem=S-sub["qi"].sum()
+        sub["group_seats"]=sub["qi"]
+        if rem>0:
+            sub["rem_abs"]=sub["votes"]-sub["qi"]*q
+            sub=sub.sort_values(["rem_abs","votes"], ascending=[False,False]).reset_index(drop=True)
+            for i in range(rem): sub.loc[i,"group_seats"]+=1
+        out.append(sub[["list","coalition","group_seats"]])
+    return pd.concat(out, ignore_index=True)
+
+# ---------- C) seggi interi provinciali + resti percentuali ----------
+def provincial_integers(votes_df, province_seats_df, admitted_coalitions):
+    v = votes_df[votes_df["coalition"].isin(admitted_coalitions)].copy()
+    prov = v.groupby("province", as_index=False)["votes"].sum().rename(columns={"votes":"prov_total"})
+    prov = prov.merge(province_seats_df, on="province", how="left")
+    prov["q_circ"] = (prov["prov_total"]//(prov["seats"]+1)).astype(int)
+    x = v.merge(prov[["province","seats","q_circ","prov_total"]], on="province", how="left")
+    x["int_seats"]=x.apply(lambda r: int(r["votes"]//r["q_circ"]) if r["q_circ"]>0 else 0, axis=1)
+    x["rest_pct"]=x.apply(lambda r: 100*(r["votes"]-r["int_seats"]*r["q_circ"])/r["prov_total"] if r["prov_total"]>0 else 0.0, axis=1)
+    return x, prov
+
+# ---------- D) applica tetti di gruppo + assegna resti in graduatoria unica ----------
+def assign_residuals(df_step, prov_meta, group_caps):
+    df=df_step.copy()
+    caps = dict(zip(group_caps["list"], group_caps["group_seats"]))
+    df["regional_rest_rank"] = df["rest_pct"].rank(method="min", ascending=False).astype(int)
+    df["rest"] = df["votes"] - df["int_seats"] * df["q_circ"]
+
+    # riduci eccedenze
+    current = df.groupby("list")["int_seats"].sum().to_dict()
+    df["final_seats"]=df["int_seats"].astype(int)
+    for lst,cap in caps.items():
+        overflow=max(0, current.get(lst,0)-int(cap))
+        if overflow<=0: continue
+        idxs = df[df["list"]==lst].sort_values(["int_seats","votes"], ascending=[False,True]).index
+        for i in idxs:
+            if overflow<=0: break
+            if df.at[i,"final_seats"]>0:
+                df.at[i,"final_seats"]-=1
+                overflow-=1
+    # capacità residua provincia e lista
+    prov_left = (prov_meta[["province","seats"]]
+                 .merge(df.groupby("province",as_index=False)["final_seats"].sum().rename(columns={"final_seats":"assigned"}),
+                        on="province", how="left").fillna({"assigned":0}))
+    prov_left["left"]=prov_left["seats"]-prov_left["assigned"]
+    prov_left=dict(zip(prov_left["province"], prov_left["left"]))
+    lst_left = group_caps.merge(df.groupby("list",as_index=False)["final_seats"].sum().rename(columns={"final_seats":"assigned"}),
+                                on="list", how="left").fillna({"assigned":0})
+    lst_left["left"]=lst_left["group_seats"]-lst_left["assigned"]
+    lst_left=dict(zip(lst_left["list"], lst_left["left"]))
+
+    order=[]
+    # graduatoria unica per resti percentuali
+    cand=df[["province","list","coalition","votes","rest_pct"]].sort_values("rest_pct", ascending=False, kind="stable")
+    for _,r in cand.iterrows():
+        p,l=r["province"], r["list"]
+        if prov_left.get(p,0)>0 and lst_left.get(l,0)>0:
+            i = df[(df["province"]==p)&(df["list"]==l)].index[0]
+            df.at[i,"final_seats"]+=1
+            prov_left[p]-=1; lst_left[l]-=1; order.append((p,l))
+    # se rimane capacità, usa voti assoluti
+    if any(v>0 for v in prov_left.values()) and any(v>0 for v in lst_left.values()):
+        pool=df.copy()
+        pool["prov_left"]=pool["province"].map(prov_left)
+        pool["lst_left"]=pool["list"].map(lst_left)
+        pool=pool[(pool["prov_left"]>0)&(pool["lst_left"]>0)].sort_values("votes", ascending=False, kind="stable")
+        for _,r in pool.iterrows():
+            p,l=r["province"], r["list"]
+            if prov_left[p]>0 and lst_left[l]>0:
+                i = df[(df["province"]==p)&(df["list"]==l)].index[0]
+                df.at[i,"final_seats"]+=1
+                prov_left[p]-=1; lst_left[l]-=1; order.append((p,l))
+            if all(v<=0 for v in prov_left.values()): break
+    return df, order
+
+# ---------- E) seggio riservato al 2° presidente ----------
+def reserve_runner_up(df_alloc, residual_order, votes_df, coal_votes, coal_seats):
+    adm = coal_seats["coalition"].tolist()
+    cv = coal_votes[coal_votes["coalition"].isin(adm)].sort_values("total_coal_votes", ascending=False, kind="stable")
+    if len(cv)<2: return df_alloc, None
+
+    second=cv.iloc[1]["coalition"]
+    lists_second=set(votes_df[votes_df["coalition"]==second]["list"].unique())
+
+    runner_up_seats = df_alloc[df_alloc["coalition"] == second]["final_seats"].sum()
+    if runner_up_seats > 0:
+        return df_alloc, {"reason": "runner_up_already_represented", "seats": int(runner_up_seats)}
+
+    out=df_alloc.copy()
+    # togli l'ultimo seggio assegnato via resti a una lista del secondo
+    for p,l in reversed(residual_order):
+        if l in lists_second:
+            m=(out["province"]==p)&(out["list"]==l)
+            out.loc[m,"final_seats"]=out.loc[m,"final_seats"]-1
+            return out, {"province":p,"list":l,"reason":"runner_up"}
+    # altrimenti togli alla lista del secondo con meno voti fra quelle con almeno 1 seggio
+    sub=out[out["list"].isin(lists_second)]
+    sub=sub[sub["final_seats"]>0]
+    if sub.empty: return out, None
+    v=sub.sort_values(["final_seats","votes"], ascending=[True,True]).iloc[0]
+    m=(out["province"]==v["province"])&(out["list"]==v["list"])
+    out.loc[m,"final_seats"]=out.loc[m,"final_seats"]-1
+    return out, {"province":v["province"],"list":v["list"],"reason":"runner_up_fallback"}
+
+# ---------- pipeline ----------
+def run_allocation(votes_df, province_seats_df, total_list_seats=30, pct19=0.43, pct18=0.40, seats19=19, seats18=18):
+    coal_votes, coal_seats = coalitions_stage(votes_df, total_list_seats, pct19, pct18, seats19, seats18)
+    admitted = coal_votes[coal_votes["admitted"]]["coalition"].tolist()
+    if not admitted: return (pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), None)
+    grp_seats = group_seats_stage(votes_df[votes_df["coalition"].isin(admitted)], coal_seats)
+    stepC, prov_meta = provincial_integers(votes_df[votes_df["coalition"].isin(admitted)], province_seats_df, admitted)
+    alloc, order = assign_residuals(stepC, prov_meta, grp_seats)
+    final, removed = reserve_runner_up(alloc, order, votes_df, coal_votes, coal_seats)
+    return final, coal_seats, grp_seats, removed
@@ -0,0 +1,96 @@
+"""
+Frozen copy of the 1.0.0 province seat reports (generate_province_seat_markdown and
+generate_province_seat_heatmap of ERM.py), the reference of the report tests.
+
+Kept as released except for the documented behaviour changes since then:
+- the reports are returned as strings instead of being written to output_path;
+- coalition and group seats are arguments instead of being read from coalition_seats.csv and group_seats.csv;
+- the quota uses the votes of the coalitions present in provincial_results_df (the admitted ones) instead of
+  the literals "Centrodestra" and "Centrosinistra";
+- the vote recaps use a stable sort, so ties follow the groupby order.
+Do not optimise this module: it is the "old" side of the comparison.
+"""
+
+import pandas as pd
+
+
+def calculate_provincial_quota(votes_df, seats_per_province_df):
+    total_votes = votes_df.groupby('province')['votes'].sum().reset_index()
+    merged = pd.merge(total_votes, seats_per_province_df, on='province')
+    merged['quota'] = merged['votes'] / (merged['seats'] + 1)
+    return merged[['province', 'quota']]
+
+
+def province_seat_heatmap(provincial_results_df):
+    pivot = provincial_results_df.pivot_table(index="province", columns="list", values="final_seats", fill_value=0)
+    md = "# Provincial Distribution of Seats (Heatmap)\n\n"
+    md += pivot.reset_index().to_markdown(index=False)
+    return md
+
+
+def province_seat_markdown(votes_df, provincial_results_df, seats_per_province_df, coal_seats=None, grp_seats=None):
+    quota_df = calculate_provincial_quota(votes_df, seats_per_province_df)
+    md = "# Provincial Seat Allocation Report\n\n"
+    # --- Spiegazione della ripartizione dei seggi regionale ---
+    if 'coalition' in votes_df.columns and 'votes' in votes_df.columns:
+        reg_votes = votes_df.groupby('coalition')['votes'].sum().reset_index()
+        total_reg_votes = reg_votes['votes'].sum()
+        md += "## Ripartizione seggi tra coalizioni (regionale)\n\n"
+        md += "| Coalizione | Voti | % |\n|---|---|---|\n"
+        for _, row in reg_votes.sort_values('votes', ascending=False, kind='stable').iterrows():
+            pct = 100 * row['votes'] / total_reg_votes if total_reg_votes > 0 else 0
+            md += f"| {row['coalition']} | {int(row['votes'])} | {pct:.2f}% |\n"
+        # Seggi assegnati (se disponibili)
+        if coal_seats is not None:
+            md += "\n| Coalizione | Seggi assegnati |\n|---|---|\n"
+            for _, row in coal_seats.iterrows():
+                md += f"| {row['coalition']} | {row['seats']} |\n"
+        # Ripartizione seggi tra liste
+        if grp_seats is not None:
+            md += "\n## Ripartizione seggi tra liste (regionale)\n\n"
+            md += "| Lista | Coalizione | Seggi assegnati |\n|---|---|---|\n"
+            for _, row in grp_seats.iterrows():
+                md += f"| {row['list']} | {row['coalition']} | {row['group_seats']} |\n"
+    # --- President recap ---
+    if 'president' in votes_df.columns:
+        pres_votes = votes_df.groupby('president')['votes'].sum().reset_index()
+        total_votes = pres_votes['votes'].sum()
+        md += "## Riepilogo percentuali Presidenti\n\n"
+        md += "| Presidente | Voti | % |\n|---|---|---|\n"
+        for _, row in pres_votes.sort_values('votes', ascending=False, kind='stable').iterrows():
+            pct = 100 * row['votes'] / total_votes if total_votes > 0 else 0
+            md += f"| {row['president']} | {int(row['votes'])} | {pct:.2f}% |\n"
+        md += "\n"
+        # --- Party recap ---
+        party_votes = votes_df.groupby('list')['votes'].sum().reset_index()
+        total_party_votes = party_votes['votes'].sum()
+        md += "## Riepilogo voti e percentuali per lista/partito\n\n"
+        md += "| Lista/Partito | Voti | % |\n|---|---|---|\n"
+        for _, row in party_votes.sort_values('votes', ascending=False, kind='stable').iterrows():
+            pct = 100 * row['votes'] / total_party_votes if total_party_votes > 0 else 0
+            md += f"| {row['list']} | {int(row['votes'])} | {pct:.2f}% |\n"
+        md += "\n"
+    admitted_coalitions = provincial_results_df["coalition"].unique().tolist()
+    for province in quota_df['province']:
+        # Use only admitted coalition votes for quota calculation
+        admitted_votes = votes_df[(votes_df["province"] == province) &
+                                 (votes_df["coalition"].isin(admitted_coalitions))]["votes"].sum()
+        row = seats_per_province_df.loc[seats_per_province_df["province"]==province, "seats"]
+        seats = int(row.iloc[0]) if not row.empty else 0
+        q_circ = admitted_votes // (seats + 1) if seats > 0 else 0
+        md += f"## {province}\n"
+        md += f"**Quota (votes per seat):** {q_circ} = {admitted_votes} voti / ({seats} + 1)\n\n"
+        # Get parties that elected at least one seat
+        elected = provincial_results_df[(provincial_results_df['province'] == province) & (provincial_results_df['final_seats'] > 0)]
+        if not elected.empty:
+            md += "| Party/List | Seats | Votes per Seat | Total Votes | Resto assoluto | Resto % | Rank regionale resti % |\n|---|---|---|---|---|---|---|\n"
+            for _, row in elected.iterrows():
+                votes_per_seat = row['votes'] / row['final_seats'] if row['final_seats'] > 0 else 0
+                rest_abs = int(row['votes'] - row['int_seats'] * q_circ) if q_circ > 0 else 0
+                rest_pct = row['rest_pct'] if 'rest_pct' in row else 0
+                rank = row['regional_rest_rank'] if 'regional_rest_rank' in row else ''
+                md += f"| {row['list']} | {row['final_seats']} | {votes_per_seat:.2f} | {row['votes']} | {rest_abs} | {rest_pct:.2f}% | {rank} |\n"
+        else:
+            md += "No seats elected in this province.\n"
+        md += "\n"
+    return md
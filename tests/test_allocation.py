@@ -0,0 +1,57 @@
+"""
+Regression tests of the allocation engines against the DataFrame stage pipeline (run_allocation).
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import ERM
+
+
+@pytest.fixture(scope="module")
+def sample():
+    return ERM.load_inputs(*(os.path.join(ROOT, f) for f in ("votes_marche_2025_all_provinces.csv",
+                                                           "seats_per_province.csv", "params.csv")), cache=False)
+
+
+def seats_table(final):
+    # seggi finali per (provincia, lista), indipendenti dall'ordine delle righe
+    return final.set_index(["province", "list"])["final_seats"].sort_index()
+
+
+def test_one_coalition(sample):
+    votes_df, seats_df, params = sample
+    one = votes_df[votes_df["coalition"] == "Centrodestra"].reset_index(drop=True)
+    final, coal_seats, _, removed = ERM.run_allocation(one, seats_df, **params)
+    assert removed is None and coal_seats["seats"].tolist() == [params["total_list_seats"]]
+
+    model = ERM.ElectionModel.from_frames(one, seats_df, **params)
+    res = model.allocate_batch(np.stack([one["votes"].to_numpy()] * 3))
+    assert (res.seats == model.allocate().seats).all()
+    assert (res.runner_up == ERM.RUNNER_UP_NONE).all()
+    pd.testing.assert_series_equal(seats_table(model.allocate().to_frames()[0]), seats_table(final), check_dtype=False)
+    sim = ERM.simulate(one, seats_df, n=20, seed=0, **params)
+    assert (sim.coalition_seats[:, 0] == params["total_list_seats"]).all()
+
+
+def test_province_seats_lookup(sample):
+    votes_df, seats_df, params = sample
+    with pytest.raises(ValueError, match="no seats for provinces: \\['Fermo'\\]"):
+        ERM.run_allocation(votes_df, seats_df[seats_df["province"] != "Fermo"], **params)
+    # province ripetute: vale l'ultima riga in ogni stadio, come in ElectionData
+    dup = pd.concat([seats_df.assign(seats=seats_df["seats"] + 1), seats_df], ignore_index=True)
+    pd.testing.assert_frame_equal(ERM.run_allocation(votes_df, dup, **params)[0],
+                                  ERM.run_allocation(votes_df, seats_df, **params)[0])
+    stepC, prov = ERM.provincial_integers(votes_df.assign(votes=votes_df["votes"].astype(np.int64)), seats_df,
+                                          ["Centrodestra", "Centrosinistra"])
+    assert stepC["prov_total"].dtype == np.int64 and prov["prov_total"].dtype == np.int64
@@ -0,0 +1,96 @@
+"""
+Tests of the allocation cache (AllocationCache): cached results equal run_allocation, LRU eviction and
+statistics, key canonicalisation and immutability of the results handed out by a hit.
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+
+import dataclasses
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import ERM
+
+
+@pytest.fixture(scope="module")
+def sample():
+    return ERM.load_inputs(*(os.path.join(ROOT, f) for f in ("votes_marche_2025_all_provinces.csv",
+                                                           "seats_per_province.csv", "params.csv")), cache=False)
+
+
+@pytest.fixture(scope="module")
+def model(sample):
+    votes_df, seats_df, params = sample
+    return ERM.ElectionModel.from_frames(votes_df, seats_df, **params)
+
+
+def assert_same_frames(a, b):
+    for x, y in zip(a[:3], b[:3]):
+        pd.testing.assert_frame_equal(x.reset_index(drop=True), y.reset_index(drop=True), check_dtype=False)
+    assert a[3] == b[3]
+
+
+def test_cached_frames_match_run_allocation(sample):
+    votes_df, seats_df, params = sample
+    cache = ERM.AllocationCache()
+    first = cache.allocate_frames(votes_df, seats_df, **params)
+    assert_same_frames(first.to_frames(), ERM.run_allocation(votes_df.copy(), seats_df, **params))
+    # stessi input (anche come copia): stesso oggetto; parametri diversi: nuova voce
+    assert cache.allocate_frames(votes_df.copy(), seats_df, **params) is first
+    other = cache.allocate_frames(votes_df, seats_df, **dict(params, total_list_seats=24))
+    assert other is not first and other.seats.sum() < first.seats.sum()
+    assert cache.info() == ERM.CacheInfo(1, 2, 0, 256, 2)
+
+
+def test_lru_eviction(model):
+    cache = ERM.AllocationCache(maxsize=3)
+    V = model.data.votes.astype(float)
+    scenarios = [V * (1 + 0.1 * i) for i in range(4)]
+    got = [cache.allocate(model, s) for s in scenarios[:3]]
+    assert cache.allocate(model, scenarios[0]) is got[0]  # 0 diventa il più recente
+    cache.allocate(model, scenarios[3])                     # esce 1, il meno recente
+    assert cache.info() == ERM.CacheInfo(1, 4, 1, 3, 3)
+    assert cache.allocate(model, scenarios[2]) is got[2] and cache.allocate(model, scenarios[0]) is got[0]
+    again = cache.allocate(model, scenarios[1])
+    assert again is not got[1] and np.array_equal(again.seats, got[1].seats)
+    assert cache.info() == ERM.CacheInfo(3, 5, 2, 3, 3) and len(cache) == 3
+
+    # chiave canonica: voti interi o float, -0.0 o 0.0, matrice o voti per riga
+    assert cache.key(model.data, V.astype(int), model.params) == cache.key(model.data, V, model.params)
+    assert cache.key(model.data, np.where(V == 0, -0.0, V), model.params) == cache.key(model.data, V, model.params)
+    assert cache.allocate(model) is cache.allocate(model, model.data.votes) is got[0]
+    assert cache.key(model.data, V, dict(model.params, pct19=0.44)) != cache.key(model.data, V, model.params)
+
+    cache.clear()
+    assert cache.info() == ERM.CacheInfo(0, 0, 0, 3, 0)
+    with pytest.raises(ValueError, match="maxsize"):
+        ERM.AllocationCache(maxsize=0)
+
+
+def test_results_are_immutable(model):
+    cache = ERM.AllocationCache()
+    alloc = cache.allocate(model)
+    for name in ("seats", "int_seats", "rest_pct", "group_seats", "coalition_seats", "admitted"):
+        with pytest.raises(ValueError):
+            getattr(alloc, name)[...] = 0
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        alloc.seats = None
+
+    # to_frames costruisce tabelle nuove: modificarle non cambia la voce in cache
+    frames = alloc.to_frames()
+    expected = [f.copy() for f in frames[:3]]
+    frames[0]["final_seats"] = 0
+    frames[1]["seats"] = 0
+    frames[2].drop(frames[2].index, inplace=True)
+    hit = cache.allocate(model)
+    assert hit is alloc and cache.hits == 1
+    for x, y in zip(hit.to_frames()[:3], expected):
+        pd.testing.assert_frame_equal(x, y)
@@ -0,0 +1,78 @@
+"""
+Tests of the command line (ERM.main): --details prints the quota, admitted votes and integer seats of the
+allocation, and an input file without a required column stops the run naming the file and the column.
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+
+import os
+import re
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "benchmarks"))
+
+import ERM
+from synthetic import synthetic_election
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    # elezione con coalizioni C00.. (non i nomi delle Marche), una delle quali non ammessa
+    votes_df, seats_df, params = synthetic_election(4, 10, 4, 30, seed=0)
+    paths = {name:str(tmp_path / f"{name}.csv") for name in ("votes", "seats", "params")}
+    votes_df.to_csv(paths["votes"], index=False)
+    seats_df.to_csv(paths["seats"], index=False)
+    pd.DataFrame({"key":list(ERM.PARAMS_KEYS), "value":[params[k] for k in ERM.PARAMS_KEYS.values()]})\
+        .to_csv(paths["params"], index=False)
+    return paths, (votes_df, seats_df, {k:params[k] for k in ERM.DEFAULT_PARAMS})
+
+
+def run(paths, *extra, output_dir):
+    return ERM.main(["allocate", paths["votes"], "--seats", paths["seats"], "--params", paths["params"],
+                     "--no-cache", "-o", output_dir, "--outputs", "provincial_results", *extra])
+
+
+def test_details_reads_the_allocation(inputs, tmp_path, capsys):
+    paths, (votes_df, seats_df, params) = inputs
+    final = ERM.run_allocation(votes_df.copy(), seats_df, **params)[0]
+    assert final["coalition"].nunique() < votes_df["coalition"].nunique()
+    results = ERM.build_report(final).results
+    for province in results["province"].unique():
+        assert run(paths, "--details", province, output_dir=str(tmp_path)) == 0
+        out = capsys.readouterr().out
+        rows = results[results["province"] == province]
+        q, total, seats = re.search(r"Quota provinciale: (\S+) = (\S+) voti / \((\d+) \+ 1\)", out).groups()
+        assert (float(q), float(total), int(seats)) == (rows["q_circ"].iloc[0], rows["prov_total"].iloc[0],
+                                                        rows["seats"].iloc[0])
+        # quota sui voti delle sole coalizioni ammesse
+        admitted = votes_df[(votes_df["province"] == province) & votes_df["coalition"].isin(final["coalition"])]
+        assert float(total) == admitted["votes"].sum()
+        printed = re.findall(r"Lista: (.+?), Voti: \S+, Seggi interi: (\d+), Seggi: (\d+),", out)
+        assert printed == [(l, str(i), str(f)) for l, i, f in zip(rows["list"], rows["int_seats"], rows["final_seats"])]
+
+    assert run(paths, "--details", "Nowhere", output_dir=str(tmp_path)) == 0
+    assert "Province not found in seats data." in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("name, column", [("votes", "coalition"), ("votes", "votes"), ("seats", "seats"),
+                                          ("seats", "province"), ("params", "value"), ("params", "key")])
+def test_missing_column_is_named(inputs, tmp_path, capsys, name, column):
+    paths, _ = inputs
+    pd.read_csv(paths[name]).drop(columns=column).to_csv(paths[name], index=False)
+    assert run(paths, output_dir=str(tmp_path)) == 1
+    err = capsys.readouterr().err
+    assert f"missing columns in {paths[name]}: ['{column}']" in err, err
+
+    # stesso messaggio per un file di seggi indicato nel manifest
+    if name == "seats":
+        manifest = tmp_path / "manifest.csv"
+        pd.DataFrame({"votes":[paths["votes"]], "seats":[paths["seats"]]}).to_csv(manifest, index=False)
+        assert ERM.main(["allocate", "--manifest", str(manifest), "--seats", paths["seats"], "--params",
+                         paths["params"], "--no-cache", "-o", str(tmp_path)]) == 1
+        assert f"['{column}']" in capsys.readouterr().err
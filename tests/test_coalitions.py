@@ -0,0 +1,52 @@
+"""
+Tests of the batched coalition stage: coalitions_batch against coalitions_stage, one scenario per row with its
+own parameters (seat totals, bonus thresholds and seats, admission thresholds).
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "benchmarks"))
+
+import ERM
+from synthetic import scenario_votes, synthetic_election
+
+
+def test_coalitions_batch_matches_stage():
+    votes_df, _, _ = synthetic_election(3, 12, 6, 30, seed=5)
+    rng = np.random.default_rng(0)
+    n = 200
+    V = scenario_votes(votes_df["votes"].to_numpy(), n, noise=0.6, seed=1)
+    V[::4] = rng.integers(0, 4, V[::4].shape) * 1000  # voti a parità fra coalizioni e liste
+    params = pd.DataFrame({"total_list_seats":rng.integers(5, 41, n), "pct19":rng.uniform(0.3, 0.5, n),
+                           "pct18":rng.uniform(0.2, 0.3, n), "coal_threshold":rng.choice([0.0, 0.05, 0.1, 0.2], n),
+                           "list_threshold":rng.choice([0.0, 0.03, 0.08], n)})
+    params["seats19"] = (params["total_list_seats"] * rng.uniform(0.4, 0.8, n)).astype(int)
+    params["seats18"] = (params["seats19"] * rng.uniform(0.7, 1.0, n)).astype(int)
+
+    stages = [ERM.coalitions_stage(votes_df.assign(votes=V[i]), **kw) for i, kw in enumerate(params.to_dict("records"))]
+    coals = stages[0][0]["coalition"].tolist()
+    cv = np.stack([s[0]["total_coal_votes"].to_numpy() for s in stages])
+    mx = np.stack([s[0]["max_list_share"].to_numpy() for s in stages])
+    res = ERM.coalitions_batch(cv, mx, **{k:params[k].to_numpy() for k in params})
+
+    for i, (coal, coal_seats) in enumerate(stages):
+        assert coal["coalition"].tolist() == coals
+        np.testing.assert_allclose(res["coal_share"][i], coal["coal_share"].to_numpy())
+        assert res["admitted"][i].tolist() == coal["admitted"].tolist(), i
+        seats = coal_seats.set_index("coalition")["seats"].reindex(coals, fill_value=0).to_numpy()
+        assert res["seats"][i].tolist() == seats.tolist(), i
+        if coal["admitted"].any():
+            # capolista: prima coalizione ammessa per voti (a parità l'ordine delle righe)
+            adm = coal[coal["admitted"]]
+            assert coals[res["leader"][i]] == adm.sort_values("total_coal_votes", ascending=False, kind="stable")["coalition"].iloc[0]
+        else:
+            assert res["leader"][i] == -1
@@ -0,0 +1,113 @@
+"""
+Tests of the live count: replay and correction semantics of the section records, snapshot cadence and the
+final snapshot against run_allocation on the same totals.
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+
+import asyncio
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import ERM
+
+
+@pytest.fixture(scope="module")
+def sample():
+    return ERM.load_inputs(*(os.path.join(ROOT, f) for f in ("votes_marche_2025_all_provinces.csv",
+                                                           "seats_per_province.csv", "params.csv")), cache=False)
+
+
+@pytest.fixture(scope="module")
+def model(sample):
+    votes_df, seats_df, params = sample
+    return ERM.ElectionModel.from_frames(votes_df, seats_df, **params)
+
+
+def section_records(votes_df, sections=3):
+    # voti di ogni riga divisi su `sections` sezioni (la prima prende il resto), come tuple
+    out = []
+    for r in votes_df.itertuples():
+        part = int(r.votes) // sections
+        for s in range(sections):
+            out.append((f"{r.province}-{s}", r.province, r.list, int(r.votes) - part * (sections - 1) if s == 0 else part))
+    return out
+
+
+def counted(snapshot):
+    # voti contati per (provincia, lista) nella fotografia
+    return snapshot.provincial_results.set_index(["province", "list"])["votes"].sort_index()
+
+
+def test_replay_and_corrections(sample, model):
+    votes_df, _, _ = sample
+    records = section_records(votes_df)
+    live = ERM.LiveCount(model, every=None)
+    first = list(live.ingest(records))[-1]
+    assert first.sections == len({r[0] for r in records})
+    expected = votes_df.set_index(["province", "list"])["votes"].sort_index()
+    # provincial_results ha solo le righe delle coalizioni ammesse
+    pd.testing.assert_series_equal(counted(first), expected.reindex(counted(first).index), check_dtype=False)
+
+    # secondo invio delle stesse sezioni: i valori sono sostituiti, i totali non cambiano
+    replay = list(live.ingest(records))[-1]
+    assert replay.records == 2 * len(records) and replay.sections == first.sections
+    pd.testing.assert_series_equal(counted(replay), counted(first))
+
+    # correzione di una sezione: conta solo il nuovo valore
+    section, province, lst, votes = records[0]
+    live.add({"section":section, "province":province, "list":lst, "votes":f"{votes + 1000:,}"})
+    assert counted(live.snapshot())[(province, lst)] == expected[(province, lst)] + 1000
+
+    # record senza sezione: si somma, anche se ripetuto
+    live.add({"province":province, "list":lst, "votes":5})
+    live.add({"province":province, "list":lst, "votes":5})
+    assert counted(live.snapshot())[(province, lst)] == expected[(province, lst)] + 1010
+
+    with pytest.raises(ValueError, match="unknown province or list"):
+        live.add(("s", province, "No such list", 1))
+
+
+def test_snapshot_cadence(sample, model, monkeypatch):
+    votes_df, _, _ = sample
+    records = section_records(votes_df)
+    every = 7
+    snaps = list(ERM.LiveCount(model, every=every).ingest(records))
+    expected = list(range(every, len(records) + 1, every))
+    if len(records) % every:
+        expected.append(len(records))
+    assert [s.records for s in snaps] == expected
+
+    # cadenza a tempo su un orologio finto che avanza di un secondo per lettura
+    clock = iter(range(10**6))
+    monkeypatch.setattr(ERM.time, "monotonic", lambda: float(next(clock)))
+    live = ERM.LiveCount(model, every=None, interval=5)
+    timed = [live.add(r) for r in records[:20]]
+    assert [i for i, s in enumerate(timed) if s is not None] == [4, 9, 14, 19]
+
+
+def test_final_snapshot_matches_run_allocation(sample, model):
+    votes_df, seats_df, params = sample
+    records = section_records(votes_df)
+
+    async def stream():
+        for r in records:
+            yield {"section":r[0], "province":r[1], "list":r[2], "votes":r[3]}
+
+    async def collect():
+        return [s async for s in ERM.LiveCount(model, every=50).aingest(stream())]
+
+    snap = asyncio.run(collect())[-1]
+    final, coal_seats, _, removed = ERM.run_allocation(votes_df.copy(), seats_df, **params)
+    pd.testing.assert_frame_equal(snap.provincial_results.reset_index(drop=True),
+                                  ERM._provincial_results(final).reset_index(drop=True), check_dtype=False)
+    pd.testing.assert_frame_equal(snap.coalition_seats.reset_index(drop=True), coal_seats.reset_index(drop=True),
+                                  check_dtype=False)
+    pd.testing.assert_frame_equal(snap.runnerup_reserved, pd.DataFrame([removed or {}]), check_dtype=False)
@@ -0,0 +1,74 @@
+"""
+Tests of the input loaders: chunked section-level reader and the binary cache of load_votes.
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import ERM
+
+VOTES = os.path.join(ROOT, "votes_marche_2025_all_provinces.csv")
+
+
+@pytest.fixture
+def section_file(tmp_path):
+    # file di sezione: ogni riga del file regionale divisa su 4 sezioni, righe mescolate, voti come
+    # " 1,234 " e colonne in più; una riga con voti non numerici (contati come 0)
+    base = ERM.load_votes(VOTES, cache=False)
+    rng = np.random.default_rng(0)
+    rows = []
+    for r in base.itertuples(index=False):
+        split = rng.multinomial(int(r.votes), [0.25] * 4)
+        for s, v in enumerate(split):
+            rows.append({"sezione":s, "comune":f"{r.province} {s}", "province":r.province, "list":r.list,
+                         "coalition":r.coalition, "president":r.president, " votes ":f" {v:,} "})
+    df = pd.DataFrame(rows).sample(frac=1.0, random_state=0).reset_index(drop=True)
+    df.loc[len(df) - 3, " votes "] = "n/a"
+    path = tmp_path / "sections.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_read_votes_chunked_matches_plain_load(section_file):
+    plain = pd.read_csv(section_file).rename(columns=lambda x: x.strip())
+    plain["votes"] = ERM._parse_votes(plain["votes"])
+    expected = plain.groupby(ERM.VOTES_KEYS, sort=False)["votes"].sum().reset_index()
+    for chunksize in (7, 100, 10**6):
+        got = ERM.read_votes_chunked(section_file, chunksize=chunksize)
+        pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+    with open(section_file) as f:
+        pd.testing.assert_frame_equal(ERM.read_votes_chunked(f, chunksize=50), expected, check_dtype=False)
+
+
+def test_load_votes_cache(tmp_path):
+    path = tmp_path / "votes.csv"
+    with open(VOTES) as f:
+        text = f.read()
+    # una lista senza presidente: valore mancante nella colonna
+    path.write_text(text + 'Fermo,Lista civica,Centrodestra,," 1,000 "\n')
+    plain = ERM.load_votes(str(path), cache=False)
+    assert pd.isna(plain["president"].iloc[-1])
+
+    first = ERM.load_votes(str(path))
+    assert os.path.exists(f"{path}.npz")
+    cached = ERM.load_votes(str(path))
+    for df in (first, cached):
+        pd.testing.assert_frame_equal(df, plain)
+        # stesso valore mancante del CSV (NaN, non None)
+        assert [type(x) for x in df["president"]] == [type(x) for x in plain["president"]]
+
+    # file modificato: la cache non vale più
+    path.write_text(text.replace('" 13,800 "', '" 13,900 "', 1))
+    changed = ERM.load_votes(str(path))
+    pd.testing.assert_frame_equal(changed, ERM.load_votes(str(path), cache=False))
+    assert changed["votes"].iloc[0] == 13900 and len(changed) == len(plain) - 1
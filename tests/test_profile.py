@@ -0,0 +1,74 @@
+"""
+Tests of the per-stage instrumentation (StageProfile): records, nesting, summary and exports.
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+
+import json
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import ERM
+
+STAGES = ["coalitions_stage", "group_seats_stage", "provincial_integers", "assign_residuals", "reserve_runner_up"]
+
+
+@pytest.fixture(scope="module")
+def sample():
+    return ERM.load_inputs(*(os.path.join(ROOT, f) for f in ("votes_marche_2025_all_provinces.csv",
+                                                           "seats_per_province.csv", "params.csv")), cache=False)
+
+
+def test_stage_records(sample):
+    votes_df, seats_df, params = sample
+    plain = ERM.run_allocation(votes_df.copy(), seats_df, **params)
+    seen = []
+    with ERM.StageProfile(callback=seen.append) as prof:
+        runs = [ERM.run_allocation(votes_df.copy(), seats_df, **params) for _ in range(2)]
+    ERM.run_allocation(votes_df.copy(), seats_df, **params)  # fuori dal profilo: non registrata
+    for out in runs:
+        pd.testing.assert_frame_equal(out[0], plain[0])
+
+    # per ogni corsa: i cinque stadi annidati, poi run_allocation che li contiene
+    assert seen == prof.records
+    assert [r.stage for r in prof.records] == (STAGES + ["run_allocation"]) * 2
+    assert [r.depth for r in prof.records] == ([1] * 5 + [0]) * 2
+    for run in (prof.records[:6], prof.records[6:]):
+        outer = run[-1]
+        for r in run[:-1]:
+            assert outer.start <= r.start and r.start + r.wall <= outer.start + outer.wall
+    rows = {r.stage:r.rows for r in prof.records}
+    assert rows["run_allocation"] == rows["assign_residuals"] == len(plain[0])
+    assert all(r.peak == -1 for r in prof.records)
+
+    summary = prof.summary()
+    assert summary["stage"].tolist() == ["run_allocation"] + STAGES  # ordine della prima chiamata
+    assert (summary["calls"] == 2).all() and summary["peak_mb"].isna().all()
+    doc = json.loads(prof.to_json())
+    assert len(doc["records"]) == 12 and [s["stage"] for s in doc["stages"]] == summary["stage"].tolist()
+    events = prof.to_chrome_trace()["traceEvents"]
+    assert [e["name"] for e in events] == [r.stage for r in prof.records]
+
+
+def test_memory_and_batched_engine(sample):
+    votes_df, seats_df, params = sample
+    with ERM.StageProfile(memory=True) as prof:
+        ERM.run_allocation(votes_df.copy(), seats_df, **params)
+        ERM.simulate(votes_df, seats_df, n=25, seed=0, batch_size=10, **params)
+    assert all(r.peak >= 0 for r in prof.records)
+    batches = [r for r in prof.records if r.stage == "allocate_batch"]
+    assert [r.rows for r in batches] == [10, 10, 5]
+    assert (prof.summary()["peak_mb"] >= 0).all()
+    # il profilo interno nasconde quello esterno e lo ripristina all'uscita
+    with ERM.StageProfile() as outer:
+        with ERM.StageProfile() as inner:
+            ERM.coalitions_stage(votes_df, **params)
+        ERM.coalitions_stage(votes_df, **params)
+    assert len(inner.records) == 1 and len(outer.records) == 1
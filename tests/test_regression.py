@@ -0,0 +1,127 @@
+"""
+Old-vs-new regression tests: the 1.0.0 allocation (tests/baseline_allocation.py) against run_allocation, and
+run_allocation against every engine built on it (D'Hondt core, batched engine, ElectionModel, incremental
+mode, sweep, service), on seeded random elections with tied votes and single-coalition regions.
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "benchmarks"))
+
+import ERM
+import baseline_allocation
+from synthetic import synthetic_election
+
+PARAMS = ("total_list_seats", "pct19", "pct18", "seats19", "seats18")
+
+
+def random_elections(n=16, seed=0):
+    # (nome, voti, seggi, parametri): elezioni casuali piccole, con meno seggi di lista che seggi provinciali
+    # (secondo spesso senza seggi), la loro variante con voti a parità (multipli di 100 fra 0 e 300) e
+    # ogni quattro una regione con una sola coalizione
+    rng = np.random.default_rng(seed)
+    out = []
+    for i in range(n):
+        provinces, lists = int(rng.integers(1, 6)), int(rng.integers(2, 12))
+        coalitions, seats = int(rng.integers(2, min(lists, 6) + 1)), int(rng.integers(5, 31))
+        votes_df, seats_df, params = synthetic_election(provinces, lists, coalitions, max(seats, provinces), seed=i)
+        params = {k:params[k] for k in PARAMS}
+        params["total_list_seats"] = int(rng.integers(2, params["total_list_seats"] + 1))
+        params["seats19"] = min(params["seats19"], params["total_list_seats"])
+        params["seats18"] = min(params["seats18"], params["seats19"])
+        out.append((f"random-{i}", votes_df, seats_df, params))
+        tied = votes_df.assign(votes=rng.integers(0, 4, len(votes_df)).astype(float) * 100)
+        out.append((f"ties-{i}", tied, seats_df, params))
+        if i % 4 == 0:
+            votes_df, seats_df, params = synthetic_election(provinces, lists, 1, seats, seed=i)
+            out.append((f"one-coalition-{i}", votes_df, seats_df, {k:params[k] for k in PARAMS}))
+    return out
+
+
+def tied_leaders():
+    # C2 e C3 a pari voti, con seggi finali diversi: il secondo è C3 (ordine delle righe)
+    lists = [("L0", "C0", 400), ("L1", "C1", 600), ("L2", "C2", 1500), ("L3", "C3", 750), ("L4", "C3", 750)]
+    votes_df = pd.DataFrame([{"province":p, "list":l, "coalition":c, "president":f"Presidente {c}", "votes":float(v)}
+                             for p in ("P0", "P1") for l, c, v in lists])
+    seats_df = pd.DataFrame({"province":["P0", "P1"], "seats":[7, 7]})
+    return [("tied-leaders", votes_df, seats_df, dict(total_list_seats=14, pct19=0.43, pct18=0.40))]
+
+
+ELECTIONS = random_elections() + tied_leaders()
+
+
+def seats_table(final):
+    # seggi finali per (provincia, lista), indipendenti dall'ordine delle righe
+    return final.set_index(["province", "list"])["final_seats"].astype(np.int64).sort_index()
+
+
+def assert_same_allocation(new, old):
+    final, coal_seats, grp_seats, removed = new
+    pd.testing.assert_series_equal(seats_table(final), seats_table(old[0]))
+    assert coal_seats["coalition"].tolist() == old[1]["coalition"].tolist()
+    assert coal_seats["seats"].tolist() == old[1]["seats"].tolist()
+    group = lambda g: g.set_index("list")["group_seats"].astype(np.int64).sort_index()
+    pd.testing.assert_series_equal(group(grp_seats), group(old[2]))
+    assert removed == old[3]
+
+
+def test_dhondt_matches_baseline():
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        k = int(rng.integers(1, 7))
+        # voti piccoli: molti quozienti uguali, anche sull'ultimo seggio
+        votes = rng.integers(0, 6, k) * int(rng.choice([1, 60]))
+        values = {f"P{j}":float(v) for j, v in enumerate(votes)}
+        seats = int(rng.integers(0, 25))
+        old = baseline_allocation.dhondt(values, seats)
+        assert ERM.dhondt(values, seats) == old
+        assert ERM.dhondt_batch(votes, seats)[0].tolist() == list(old.values())
+
+
+@pytest.mark.parametrize("name, votes_df, seats_df, params", ELECTIONS, ids=[e[0] for e in ELECTIONS])
+def test_run_allocation_matches_baseline(name, votes_df, seats_df, params):
+    old = baseline_allocation.run_allocation(votes_df.copy(), seats_df, **params)
+    assert_same_allocation(ERM.run_allocation(votes_df.copy(), seats_df, **params), old)
+
+
+@pytest.mark.parametrize("name, votes_df, seats_df, params", ELECTIONS, ids=[e[0] for e in ELECTIONS])
+def test_engines_match_run_allocation(name, votes_df, seats_df, params):
+    ref = ERM.run_allocation(votes_df.copy(), seats_df, **params)
+    model = ERM.ElectionModel.from_frames(votes_df, seats_df, **params)
+    d = model.data
+    alloc = model.allocate()
+    assert_same_allocation(alloc.to_frames(), ref)
+    cells = seats_table(ref[0]).reindex(pd.MultiIndex.from_product([d.provinces, d.lists]), fill_value=0)
+    expected = cells.to_numpy().reshape(d.votes.shape)
+
+    # motore vettoriale: stesso risultato in ogni scenario del blocco
+    batch = model.allocate_batch(np.stack([d.votes] * 3).astype(float))
+    assert (batch.seats == expected).all()
+
+    # modalità incrementale: dai voti dimezzati ai voti veri, una provincia alla volta
+    inc = ERM.IncrementalAllocation(model, np.floor(d.votes / 2))
+    for p, prov in enumerate(d.provinces):
+        res = inc.update({prov:d.votes[p]})
+    assert (res.seats == expected).all() and res.runner_up == alloc.runner_up
+
+    # sweep su un solo punto della griglia, nel processo corrente
+    swept = ERM.sweep(model, [{"total_list_seats":params["total_list_seats"]}], jobs=1)
+    assert (swept["seats"].to_numpy().reshape(d.votes.shape) == expected).all()
+
+    # servizio: risposta JSON dal blocco di richieste
+    reply = json.loads(ERM._service_task(d, model.params, d.votes[None].astype(float))[0])
+    served = pd.DataFrame(reply["provincial_results"])
+    if len(served):
+        pd.testing.assert_series_equal(seats_table(served), seats_table(ref[0]))
+    assert reply["runnerup_reserved"] == (ref[3] or {})
@@ -0,0 +1,102 @@
+"""
+Old-vs-new tests of the reports: the 1.0.0 Markdown and heatmap reports (tests/baseline_report.py) against
+build_report + render_*, from run_allocation and from ElectionModel, and the files of write_report,
+render_reports and the legacy generate_* wrappers.
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "benchmarks"))
+
+import ERM
+import baseline_report
+from synthetic import synthetic_election
+
+
+def elections():
+    yield "sample", ERM.load_inputs(*(os.path.join(ROOT, f) for f in (
+        "votes_marche_2025_all_provinces.csv", "seats_per_province.csv", "params.csv")), cache=False)
+    for seed in range(4):
+        yield f"synthetic-{seed}", synthetic_election(5, 10, 4, 30, seed=seed)
+
+
+ELECTIONS = list(elections())
+
+
+def allocate(votes_df, seats_df, params):
+    final, coal_seats, grp_seats, _ = ERM.run_allocation(votes_df.copy(), seats_df, **params)
+    return final, coal_seats, grp_seats
+
+
+@pytest.mark.parametrize("name, election", ELECTIONS, ids=[e[0] for e in ELECTIONS])
+def test_render_matches_baseline(name, election):
+    votes_df, seats_df, params = election
+    final, coal_seats, grp_seats = allocate(votes_df, seats_df, params)
+    results = ERM._provincial_results(final)
+    report = ERM.build_report(final, coal_seats, grp_seats, votes_df, seats_df)
+    assert ERM.render_markdown(report) == baseline_report.province_seat_markdown(votes_df, results, seats_df,
+                                                                                 coal_seats, grp_seats)
+    assert ERM.render_heatmap(report) == baseline_report.province_seat_heatmap(results)
+    # senza tabelle regionali né voti: solo le sezioni provinciali
+    bare = ERM.render_markdown(ERM.build_report(final, province_seats_df=seats_df))
+    assert "Coalizione" not in bare and "Presidenti" not in bare
+    assert bare.count("**Quota (votes per seat):**") == len(report.provinces)
+
+    # stesso report dall'Allocation di ElectionModel
+    model = ERM.ElectionModel.from_frames(votes_df, seats_df, **params)
+    other = ERM.ReportData.from_allocation(model.allocate())
+    assert ERM.render_markdown(other) == ERM.render_markdown(report)
+    assert ERM.render_heatmap(other) == ERM.render_heatmap(report)
+
+
+def test_report_files(tmp_path):
+    votes_df, seats_df, params = ELECTIONS[0][1]
+    final, coal_seats, grp_seats = allocate(votes_df, seats_df, params)
+    report = ERM.build_report(final, coal_seats, grp_seats, votes_df, seats_df)
+
+    paths = ERM.write_report(report, str(tmp_path / "out"), formats=("markdown", "heatmap"))
+    assert paths == {fmt:str(tmp_path / "out" / ERM.REPORT_FILES[fmt]) for fmt in ("markdown", "heatmap")}
+    with open(paths["markdown"], encoding="utf-8") as f:
+        assert f.read() == ERM.render_markdown(report)
+    with pytest.raises(ValueError, match="unknown report formats"):
+        ERM.write_report(report, str(tmp_path), formats=("markdown", "html"))
+
+    # funzioni storiche: stessi file dei render
+    results = ERM._provincial_results(final)
+    legacy_md, legacy_heat = tmp_path / "legacy.md", tmp_path / "heat.md"
+    ERM.generate_province_seat_markdown(votes_df, results, None, seats_df, str(legacy_md), coal_seats, grp_seats)
+    ERM.generate_province_seat_heatmap(results, str(legacy_heat))
+    assert legacy_md.read_text(encoding="utf-8") == ERM.render_markdown(report)
+    assert legacy_heat.read_text(encoding="utf-8") == ERM.render_heatmap(report)
+
+    model = ERM.ElectionModel.from_frames(votes_df, seats_df, **params)
+    out = ERM.render_reports([report, model.allocate()], str(tmp_path / "many"), formats=("markdown",))
+    assert list(out) == ["scenario_0", "scenario_1"]
+    texts = [open(p["markdown"], encoding="utf-8").read() for p in out.values()]
+    assert os.path.basename(out["scenario_1"]["markdown"]) == "scenario_1_" + ERM.REPORT_FILES["markdown"]
+    assert texts[0] == texts[1] == ERM.render_markdown(report)
+
+
+def test_render_pdf(tmp_path):
+    pytest.importorskip("reportlab")
+    votes_df, seats_df, params = ELECTIONS[0][1]
+    final, coal_seats, grp_seats = allocate(votes_df, seats_df, params)
+    report = ERM.build_report(final, coal_seats, grp_seats, votes_df, seats_df)
+    paths = ERM.write_report(report, str(tmp_path), formats=("pdf",))
+    legacy = tmp_path / "legacy.pdf"
+    ERM.generate_province_seat_pdf(ERM._provincial_results(final), str(legacy), seats_df, votes_df,
+                                   coal_seats, grp_seats)
+    for path in (paths["pdf"], str(legacy)):
+        with open(path, "rb") as f:
+            data = f.read()
+        assert data.startswith(b"%PDF") and data.rstrip().endswith(b"%%EOF")
+    # stesso documento a meno dei metadati (data di creazione, identificativo)
+    assert abs(os.path.getsize(paths["pdf"]) - os.path.getsize(legacy)) < 64
@@ -0,0 +1,132 @@
+"""
+Tests of the local allocation service (AllocationService): request validation (400 for unknown labels,
+parameters and votes that are not non-negative whole numbers) and POST /allocate over HTTP against
+run_allocation.
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import ERM
+
+
+@pytest.fixture(scope="module")
+def sample():
+    return ERM.load_inputs(*(os.path.join(ROOT, f) for f in ("votes_marche_2025_all_provinces.csv",
+                                                           "seats_per_province.csv", "params.csv")), cache=False)
+
+
+@pytest.fixture
+def service(sample):
+    votes_df, seats_df, params = sample
+    service = ERM.AllocationService(ERM.ElectionModel.from_frames(votes_df, seats_df, **params))
+    yield service
+    service.close()
+
+
+def records(votes_df, **row0):
+    # voti come record del CSV, con la prima riga modificata
+    out = votes_df.to_dict("records")
+    out[0] = dict(out[0], **row0)
+    return out
+
+
+def bad_requests(votes_df):
+    row = votes_df.iloc[0]
+    return {
+        "no votes": ({"params":{}}, "'votes'"),
+        "unknown province": ({"votes":{"Nowhere":{row["list"]:1}}}, "unknown province: Nowhere"),
+        "unknown list": ({"votes":{row["province"]:{"No such list":1}}}, "not on the ballot"),
+        "unknown params": ({"votes":{}, "params":{"seats20":20}}, r"unknown params: \['seats20'\]"),
+        "bad param value": ({"votes":{}, "params":{"seats19":"many"}}, "invalid literal"),
+        "fractional votes": ({"votes":{row["province"]:{row["list"]:1.5}}}, "whole numbers"),
+        "negative votes": ({"votes":{row["province"]:{row["list"]:-1}}}, "whole numbers"),
+        "fractional record": ({"votes":records(votes_df, votes=12.5)}, "whole numbers"),
+        "non-numeric record": ({"votes":records(votes_df, votes="abc")}, "whole numbers"),
+        "negative record": ({"votes":records(votes_df, votes=-5)}, "whole numbers"),
+        "record without seats": ({"votes":records(votes_df, province="Nowhere")}, "no seats for provinces"),
+        "record columns": ({"votes":[{"province":row["province"], "votes":1}]}, "need the columns"),
+    }
+
+
+def test_parse_rejects_bad_requests(sample, service):
+    votes_df, _, _ = sample
+    cases = bad_requests(votes_df)
+    for name, (request, message) in cases.items():
+        with pytest.raises(ValueError, match=message):
+            service.parse(request)
+
+    async def route_all():
+        return [await service._route("POST", "/allocate", json.dumps(r).encode()) for r, _ in cases.values()]
+
+    replies = asyncio.run(route_all())
+    assert [status for status, _ in replies] == [400] * len(cases)
+    assert all("error" in json.loads(body) for _, body in replies)
+    assert service.errors == len(cases) and service.requests == 0
+
+    # voti validi nelle due forme: stessa struttura calda, stessa chiave del blocco
+    row = votes_df.iloc[0]
+    key, data, _, _ = service.parse({"votes":records(votes_df, votes=f"{int(row['votes']):,}")})
+    assert data is None and key == service.parse({"votes":{row["province"]:{row["list"]:7}}})[0]
+
+
+async def http(port, method, path, payload=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = b"" if payload is None else json.dumps(payload).encode()
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    text = await reader.read()
+    writer.close()
+    return int(head.split(b" ")[1]), json.loads(text)
+
+
+def test_http_allocate_matches_run_allocation(sample, service):
+    votes_df, seats_df, params = sample
+    final, coal_seats, grp_seats, removed = ERM.run_allocation(votes_df.copy(), seats_df, **params)
+    other = dict(params, total_list_seats=24)
+    final24 = ERM.run_allocation(votes_df.copy(), seats_df, **other)[0]
+
+    async def session():
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            by_cells = {p:dict(zip(g["list"], g["votes"])) for p, g in votes_df.groupby("province")}
+            return await asyncio.gather(
+                http(port, "POST", "/allocate", {"votes":by_cells}),
+                http(port, "POST", "/allocate", {"votes":votes_df.to_dict("records")}),
+                http(port, "POST", "/allocate/batch", {"scenarios":[{"votes":by_cells, "params":{"total_list_seats":24}}]}),
+                http(port, "POST", "/allocate", {"votes":{"Nowhere":{}}}),
+                http(port, "GET", "/allocate"),
+                http(port, "GET", "/nothing"),
+            ), await http(port, "GET", "/health")
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    replies, health = asyncio.run(session())
+    assert [status for status, _ in replies] == [200, 200, 200, 400, 405, 404]
+    expected = ERM._provincial_results(final).reset_index(drop=True)
+    for _, reply in replies[:2]:
+        got = pd.DataFrame(reply["provincial_results"])
+        assert list(got.columns) == list(expected.columns)
+        pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+        pd.testing.assert_frame_equal(pd.DataFrame(reply["coalition_seats"]), coal_seats.reset_index(drop=True),
+                                      check_dtype=False)
+        pd.testing.assert_frame_equal(pd.DataFrame(reply["group_seats"]), grp_seats.reset_index(drop=True),
+                                      check_dtype=False)
+        assert reply["runnerup_reserved"] == (removed or {})
+    batch = pd.DataFrame(replies[2][1]["results"][0]["provincial_results"])
+    pd.testing.assert_frame_equal(batch, ERM._provincial_results(final24).reset_index(drop=True), check_dtype=False)
+    assert health == (200, {"status":"ok", "requests":3, "batches":health[1]["batches"], "errors":1, "jobs":0})
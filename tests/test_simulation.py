@@ -0,0 +1,73 @@
+"""
+Tests of the Monte Carlo outputs: streaming SeatAccumulator summaries against the seat tensor.
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import ERM
+
+
+def over_quota():
+    # province da 2 seggi: con il quoziente prov_total // (seats+1) negli scenari perturbati una lista può
+    # avere più seggi della provincia e, in tutto, più seggi di total_list_seats
+    votes_df = pd.DataFrame({"province":["A", "A", "B", "B"], "list":["L1", "L2", "L1", "L2"],
+                             "coalition":["C1", "C2", "C1", "C2"], "president":["P1", "P2", "P1", "P2"],
+                             "votes":[1000.0, 10.0, 500.0, 500.0]})
+    seats_df = pd.DataFrame({"province":["A", "B"], "seats":[2, 2]})
+    return votes_df, seats_df, dict(total_list_seats=4, seats19=4, seats18=4)
+
+
+def assert_same_summary(acc, tensor):
+    new, old = acc.summary(), tensor.summary()
+    for k in old:
+        pd.testing.assert_frame_equal(new[k][old[k].columns], old[k], check_dtype=False)
+
+
+def test_accumulator_over_quota_province():
+    votes_df, seats_df, params = over_quota()
+    run = lambda **kw: ERM.simulate(votes_df, seats_df, n=300, noise=0.3, seed=0, batch_size=64, **params, **kw)
+    acc, tensor = run(accumulate=True), run()
+    assert tensor.seats.max() > seats_df["seats"].max() and tensor.seats.sum(axis=1).max() > params["total_list_seats"]
+    assert_same_summary(acc, tensor)
+    summary = acc.summary()
+    assert summary["lists"]["p_seat"].between(0, 1).all() and summary["cells"]["p_seat"].between(0, 1).all()
+
+    # due metà unite: stessi conteggi di un'unica corsa, anche con istogrammi di lunghezze diverse
+    data = ERM.ElectionData.from_frames(votes_df, seats_df)
+    model = ERM.ElectionModel(data, **params)
+    V = np.stack([data.votes * f for f in (1.0, 0.5, 2.0)] + [data.votes[::-1] * 1.0]).astype(float)
+    whole = model.allocate_batch(V, accumulate=True)
+    half = model.allocate_batch(V[-1:], accumulate=True).merge(model.allocate_batch(V[:-1], accumulate=True))
+    assert_same_summary(half, model.allocate_batch(V))
+    for k in ("coalitions", "lists", "cells"):
+        pd.testing.assert_frame_equal(half.summary()[k], whole.summary()[k])
+
+
+def test_forecast_over_quota_province():
+    votes_df, seats_df, params = over_quota()
+    polls = pd.DataFrame({"list":["L1", "L2"], "share":[0.6, 0.4], "sample_size":200})
+    res = ERM.forecast(polls, votes_df, seats_df, n=2000, seed=0, noise=0.3, batch_size=300, **params)
+    cells, lists = res.province_seats, res.list_seats
+    assert cells["seats"].max() > seats_df["seats"].max()
+
+    # distribuzioni complete per ogni voce, medie coerenti fra celle, liste e tabella riassuntiva
+    np.testing.assert_allclose(cells.groupby(["province", "list"])["probability"].sum(), 1.0)
+    np.testing.assert_allclose(lists.groupby("list")["probability"].sum(), 1.0)
+    mean = lambda t, key: (t["seats"] * t["probability"]).groupby(t[key]).sum()
+    np.testing.assert_allclose(mean(cells, "list"), res.lists.set_index("list")["mean_seats"])
+    np.testing.assert_allclose(mean(lists, "list"), res.lists.set_index("list")["mean_seats"])
+
+    prob = pd.concat([res.coalitions.filter(like="p_"), res.lists[["p_seat"]], cells[["probability"]],
+                      lists[["probability"]]])
+    assert ((prob >= 0) | prob.isna()).all().all() and ((prob <= 1) | prob.isna()).all().all()
+    assert 0 <= res.p_reserved <= 1
@@ -0,0 +1,56 @@
+"""
+Tests of the seat tipping-point analysis: every reported shift flips the seat, one vote less does not.
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "benchmarks"))
+
+import ERM
+from synthetic import synthetic_election
+
+
+def models():
+    votes_df, seats_df, params = ERM.load_inputs(*(os.path.join(ROOT, f) for f in (
+        "votes_marche_2025_all_provinces.csv", "seats_per_province.csv", "params.csv")), cache=False)
+    yield "sample", ERM.ElectionModel.from_frames(votes_df, seats_df, **params)
+    votes_df, seats_df, params = synthetic_election(4, 9, 3, 24, seed=3)
+    yield "synthetic", ERM.ElectionModel.from_frames(votes_df, seats_df, **params)
+
+
+MODELS = list(models())
+
+
+@pytest.mark.parametrize("name, model", MODELS, ids=[m[0] for m in MODELS])
+def test_shift_flips_the_seat(name, model):
+    d = model.data
+    base = model.allocate().seats
+    tips = ERM.tipping_points(model)
+    assert len(tips) == (base > 0).sum() and tips["votes_to_flip"].notna().any()
+    assert tips["votes_to_flip"].dropna().is_monotonic_increasing
+
+    def moved(row, k):
+        V = d.votes.astype(float)
+        p, l = d.provinces.index(row.province), d.lists.index(row.list)
+        V[p, l] -= k
+        V[d.provinces.index(row.to_province), d.lists.index(row.to_list)] += k
+        return model.allocate(V).seats, p, l
+
+    for row in tips.dropna(subset=["votes_to_flip"]).itertuples():
+        k = int(row.votes_to_flip)
+        seats, p, l = moved(row, k)
+        assert seats[p, l] < base[p, l], row
+        assert seats[d.provinces.index(row.gained_province), d.lists.index(row.gained_list)] > \
+            base[d.provinces.index(row.gained_province), d.lists.index(row.gained_list)]
+        # la bisezione si ferma sul confine: un voto in meno non basta
+        assert moved(row, k - 1)[0][p, l] == base[p, l], row
+
+    assert len(ERM.tipping_points(model, top=3)) == min(3, len(tips))
@@ -0,0 +1,100 @@
+"""
+Tests of the decision log (DecisionTrace): the traced events rebuild the allocation, explain() returns the
+decisions of one seat cell and tracing leaves the results unchanged.
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+
+import json
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "benchmarks"))
+
+import ERM
+from synthetic import synthetic_election
+
+
+def elections():
+    yield "sample", ERM.load_inputs(*(os.path.join(ROOT, f) for f in (
+        "votes_marche_2025_all_provinces.csv", "seats_per_province.csv", "params.csv")), cache=False)
+    for seed in range(3):
+        yield f"synthetic-{seed}", synthetic_election(4, 9, 3, 24, seed=seed)
+
+
+ELECTIONS = list(elections())
+
+
+@pytest.mark.parametrize("name, election", ELECTIONS, ids=[e[0] for e in ELECTIONS])
+def test_events_rebuild_the_allocation(name, election):
+    votes_df, seats_df, params = election
+    plain = ERM.run_allocation(votes_df.copy(), seats_df, **params)
+    with ERM.DecisionTrace() as trace:
+        traced = ERM.run_allocation(votes_df.copy(), seats_df, **params)
+    assert ERM._TRACE is None
+    for a, b in zip(plain[:2], traced[:2]):
+        pd.testing.assert_frame_equal(a, b)
+    assert plain[3] == traced[3]
+
+    final, coal_seats = traced[0], traced[1]
+    key = ["province", "list"]
+    # seggi per coalizione e seggi interi per riga come nelle tabelle di run_allocation
+    pd.testing.assert_series_equal(trace.frame("coalition_seats").set_index("coalition")["seats"].sort_index(),
+                                   coal_seats.set_index("coalition")["seats"].sort_index(), check_dtype=False,
+                                   check_names=False)
+    ints = trace.frame("integer_seats").set_index(key)
+    rows = final.set_index(key).loc[ints.index]
+    assert ints["int_seats"].tolist() == rows["int_seats"].tolist()
+    pd.testing.assert_series_equal(ints["rest_pct"], rows["rest_pct"], check_dtype=False)
+
+    # seggi finali = interi - tagli + resti - seggio tolto per il secondo presidente
+    seats = ints["int_seats"].astype(int).copy()
+    seats = seats.sub(trace.frame("cap_trim").groupby(key).size(), fill_value=0)
+    seats = seats.add(trace.frame("residual_seat").groupby(key).size(), fill_value=0)
+    runner = trace.frame("runner_up")
+    assert len(runner) <= 1
+    removed = runner[runner["status"].str.endswith("removed")]
+    for r in removed.itertuples():
+        seats[(r.province, r.list)] -= 1
+    assert seats.reindex(ints.index).astype(int).tolist() == rows["final_seats"].tolist()
+    positions = trace.frame("residual_seat")["position"].tolist()
+    assert positions == list(range(1, len(positions) + 1))
+
+
+def test_explain_and_export(tmp_path):
+    votes_df, seats_df, params = ELECTIONS[0][1]
+    with ERM.DecisionTrace() as trace:
+        ERM.run_allocation(votes_df.copy(), seats_df, **params)
+        ERM.run_allocation(votes_df.copy(), seats_df, **params)
+    assert trace.runs == 2
+    assert (trace.events().groupby("run").size() == len(trace.events(run=1))).all()
+
+    row = votes_df[(votes_df["province"] == "Fermo") & (votes_df["coalition"] == "Centrodestra")].iloc[0]
+    out = trace.explain(row["province"], row["list"])
+    assert (out["run"] == 2).all() and out["seq"].is_monotonic_increasing
+    cell = out[out["list"].notna() & (out["event"] != "runner_up")]
+    assert (cell["list"] == row["list"]).all() and {"group_seats", "integer_seats"} <= set(cell["event"])
+    assert cell["province"].dropna().eq(row["province"]).all()
+    # righe a livello di coalizione: solo la coalizione della lista
+    level = out[out["list"].isna() & (out["event"] != "runner_up")]
+    assert set(level["event"]) >= {"admission", "coalition_seats"}
+    assert (level["coalition"] == row["coalition"]).all()
+    assert (out["event"] == "runner_up").sum() == 1
+    first = trace.explain(row["province"], row["list"], run=1)
+    assert (first["run"] == 1).all()
+    assert first.drop(columns=["seq", "run"]).reset_index(drop=True).equals(
+        out.drop(columns=["seq", "run"]).reset_index(drop=True))
+
+    path = tmp_path / "trace.json"
+    text = trace.to_json(str(path))
+    assert path.read_text(encoding="utf-8") == text
+    doc = json.loads(text)
+    assert len(doc) == len(trace.events()) and {d["event"] for d in doc} <= set(ERM.TRACE_EVENTS)
+    with pytest.raises(ValueError, match="unknown trace event"):
+        trace.frame("no_such_event")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Decision trace of one allocation run: why each coalition was admitted, whether the bonus applied,
+how coalition seats were split among lists, which residual seats were granted or skipped (and what
+blocked them) and the runner-up outcome, followed by the seats-per-province check.
+
+Replaces the old debug_*.py scripts, which copied pieces of ERM.py: every figure comes from the
+engine's own DecisionTrace.
+
+Usage (from the repository root):
+    python tools/trace_allocation.py [--event bonus residual_skipped] [--province Fermo] [--list LIST]
+                                     [--explain PROVINCE LIST] [--json trace.json]
+"""
+
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ERM import TRACE_EVENTS, DecisionTrace, load_inputs, run_allocation
+
+DEFAULT_EVENTS = ["admission", "bonus", "coalition_seats", "group_seats", "residual_seat", "runner_up"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--votes", default=os.path.join(ROOT, "votes_marche_2025_all_provinces.csv"))
+    parser.add_argument("--seats", default=os.path.join(ROOT, "seats_per_province.csv"))
+    parser.add_argument("--params", default=os.path.join(ROOT, "params.csv"))
+    parser.add_argument("--event", nargs="+", choices=list(TRACE_EVENTS), help="event kinds to print")
+    parser.add_argument("--province", help="only events of this province")
+    parser.add_argument("--list", dest="list_name", help="only events of this list")
+    parser.add_argument("--explain", nargs=2, metavar=("PROVINCE", "LIST"), help="every decision behind one seat cell")
+    parser.add_argument("--json", help="write the whole log to this file")
+    args = parser.parse_args()
+
+    votes_df, seats_df, params = load_inputs(args.votes, args.seats, args.params)
+    with DecisionTrace() as trace:
+        final, coal_seats, grp_seats, removed = run_allocation(votes_df, seats_df, **params)
+
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_columns", 20)
+    print("Parameters: " + ", ".join(f"{k}={v}" for k, v in params.items()))
+    if args.explain:
+        print(f"\n=== {args.explain[1]} in {args.explain[0]} ===")
+        for _, row in trace.explain(*args.explain).iterrows():
+            fields = ", ".join(f"{k}={v}" for k, v in row.drop(["seq", "run", "stage", "event"]).dropna().items())
+            print(f"{row['event']:<17} {fields}")
+    else:
+        where = {k:v for k, v in (("province", args.province), ("list", args.list_name)) if v}
+        for event in args.event or DEFAULT_EVENTS:
+            log = trace.frame(event)
+            for col, value in where.items():
+                if col in log.columns:
+                    log = log[log[col] == value]
+            print(f"\n=== {event} ({len(log)}) ===")
+            print(log.drop(columns=["run", "stage"]).to_string(index=False) if len(log) else "(none)")
+
+    print("\n=== seats per province ===")
+    if final.empty:
+        print("no coalition admitted")
+    else:
+        actual = final.groupby("province")["final_seats"].sum()
+        for province, required in seats_df.set_index("province")["seats"].items():
+            got = int(actual.get(province, 0))
+            print(f"{province}: {got}/{required} {'ok' if got == required else 'MISMATCH'}")
+    if args.json:
+        trace.to_json(args.json)
+        print(f"\nTrace written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()